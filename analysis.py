@@ -0,0 +1,278 @@
+"""Análisis de contenido para ajustar los puntos de corte (cambios de escena y silencios).
+
+Una única pasada de ffmpeg decodifica el fichero y entrega por tuberías:
+- vídeo en escala de grises reducido (por defecto 64x36 a 10 fps) como `rawvideo`,
+- audio mono PCM s16le a baja frecuencia de muestreo (8 kHz).
+
+Con NumPy se calculan de forma vectorizada:
+- `scene_scores`: diferencia absoluta media entre fotogramas consecutivos (0..1),
+- `audio_db`: nivel RMS en dBFS por ventanas de `window_ms`.
+
+El resultado se guarda en caché (`.npz`) por fichero de entrada y parámetros, así que
+repetir el corte del mismo fichero no vuelve a decodificarlo. `snap_segments` usa el
+análisis para mover cada corte nominal al cambio de escena o silencio más cercano
+dentro de una tolerancia.
+
+NumPy es opcional para el resto de la aplicación; sólo se importa al analizar.
+"""
+import os
+import bisect
+import hashlib
+import logging
+import subprocess
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from governor import get_governor
+
+
+ANALYSIS_VERSION = 1
+
+
+def default_cache_dir() -> str:
+    return os.path.join(os.path.expanduser('~'), '.pyvideoplayer_analysis')
+
+
+def _import_numpy():
+    try:
+        import numpy as np
+        return np
+    except Exception as e:
+        raise RuntimeError("El análisis de contenido necesita NumPy (python -m pip install numpy).") from e
+
+
+def _cache_key(input_path: str, params: tuple) -> str:
+    st = os.stat(input_path)
+    raw = repr((os.path.abspath(input_path), st.st_size, st.st_mtime_ns, ANALYSIS_VERSION) + params)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _read_exact(stream, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = stream.read(n - len(buf))
+        if not chunk:
+            break
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def _scene_scores_from_pipe(stream, width: int, height: int, chunk_frames: int = 256):
+    """Lee fotogramas gris `width`x`height` de `stream` y devuelve las puntuaciones de cambio de escena."""
+    np = _import_numpy()
+    frame_size = width * height
+    scores = []
+    prev = None
+    while True:
+        data = _read_exact(stream, frame_size * chunk_frames)
+        n = len(data) // frame_size
+        if n == 0:
+            break
+        frames = np.frombuffer(data[:n * frame_size], dtype=np.uint8).reshape(n, frame_size).astype(np.int16)
+        if prev is not None:
+            frames_with_prev = np.concatenate([prev[None, :], frames])
+        else:
+            frames_with_prev = frames
+        diffs = np.abs(np.diff(frames_with_prev, axis=0)).mean(axis=1) / 255.0
+        if prev is None:
+            diffs = np.concatenate([[0.0], diffs])
+        scores.append(diffs.astype(np.float32))
+        prev = frames[-1]
+        if len(data) < frame_size * chunk_frames:
+            break
+    return np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32)
+
+
+def _audio_db_from_pipe(stream, sample_rate: int, window_ms: int, out: dict) -> None:
+    """Lee PCM s16le mono de `stream` y guarda en `out['audio_db']` el nivel RMS por ventana."""
+    np = _import_numpy()
+    win = max(1, sample_rate * window_ms // 1000)
+    chunk_bytes = win * 2 * 200
+    levels = []
+    rest = b''
+    try:
+        while True:
+            data = stream.read(chunk_bytes)
+            if not data:
+                break
+            data = rest + data
+            usable = (len(data) // (win * 2)) * win * 2
+            rest = data[usable:]
+            if usable == 0:
+                continue
+            samples = np.frombuffer(data[:usable], dtype='<i2').astype(np.float32).reshape(-1, win) / 32768.0
+            rms = np.sqrt((samples * samples).mean(axis=1))
+            levels.append(20.0 * np.log10(np.maximum(rms, 1e-6)))
+    finally:
+        out['audio_db'] = np.concatenate(levels).astype(np.float32) if levels else np.zeros(0, dtype=np.float32)
+
+
+def analyze_media(input_path: str, ffmpeg_exe: Optional[str] = None, width: int = 64, height: int = 36,
+                  fps: float = 10.0, sample_rate: int = 8000, window_ms: int = 50,
+                  cache_dir: Optional[str] = None, use_cache: bool = True) -> Dict:
+    """Analiza `input_path` y devuelve un dict con arrays NumPy:
+
+    - `scene_scores` (float32, uno por fotograma de análisis; el fotograma i está en i/fps s)
+    - `audio_db` (float32, uno por ventana de `window_ms`)
+    - `fps`, `window_ms`
+    """
+    np = _import_numpy()
+    logger = logging.getLogger(__name__)
+    params = (width, height, float(fps), sample_rate, window_ms)
+    cache_dir = cache_dir or default_cache_dir()
+    cache_path = None
+    if use_cache:
+        try:
+            cache_path = os.path.join(cache_dir, _cache_key(input_path, params) + '.npz')
+            if os.path.exists(cache_path):
+                with np.load(cache_path) as data:
+                    logger.debug("analysis: usando caché %s", cache_path)
+                    return {'scene_scores': data['scene_scores'], 'audio_db': data['audio_db'],
+                            'fps': float(fps), 'window_ms': window_ms}
+        except Exception:
+            logger.debug("analysis: caché no disponible", exc_info=True)
+            cache_path = None
+
+    if not ffmpeg_exe:
+        import splitter
+        ffmpeg_exe = splitter._find_ffmpeg_executable()
+    if not ffmpeg_exe:
+        raise RuntimeError('No se encontró ffmpeg para analizar el vídeo.')
+
+    video_args = ['-map', '0:v:0', '-vf', f'fps={fps},scale={width}:{height},format=gray',
+                  '-f', 'rawvideo', '-pix_fmt', 'gray']
+    audio_args = ['-map', '0:a:0?', '-ac', '1', '-ar', str(sample_rate), '-f', 's16le']
+    audio_out: dict = {}
+
+    if os.name == 'posix':
+        # Una sola decodificación: vídeo por stdout y audio por un descriptor heredado
+        r_fd, w_fd = os.pipe()
+        cmd = [ffmpeg_exe, '-v', 'error', '-nostdin', '-i', input_path] + video_args + ['pipe:1'] + audio_args + [f'pipe:{w_fd}']
+        try:
+            proc = get_governor().popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, pass_fds=(w_fd,))
+        finally:
+            os.close(w_fd)
+        audio_stream = os.fdopen(r_fd, 'rb')
+        reader = threading.Thread(target=_audio_db_from_pipe, args=(audio_stream, sample_rate, window_ms, audio_out), daemon=True)
+        reader.start()
+        stderr_chunks = []
+        err_reader = threading.Thread(target=lambda: stderr_chunks.append(proc.stderr.read()), daemon=True)
+        err_reader.start()
+        scene = _scene_scores_from_pipe(proc.stdout, width, height)
+        proc.wait()
+        reader.join()
+        err_reader.join()
+        audio_stream.close()
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg falló al analizar {input_path}: {b''.join(stderr_chunks).decode('utf-8', 'replace')[-2000:]}")
+    else:
+        # Sin pass_fds (Windows): vídeo y audio en dos procesos concurrentes
+        vproc = get_governor().popen([ffmpeg_exe, '-v', 'error', '-nostdin', '-i', input_path] + video_args + ['pipe:1'],
+                                 stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        aproc = get_governor().popen([ffmpeg_exe, '-v', 'error', '-nostdin', '-i', input_path] + audio_args + ['pipe:1'],
+                                 stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        reader = threading.Thread(target=_audio_db_from_pipe, args=(aproc.stdout, sample_rate, window_ms, audio_out), daemon=True)
+        reader.start()
+        scene = _scene_scores_from_pipe(vproc.stdout, width, height)
+        vproc.wait()
+        aproc.wait()
+        reader.join()
+        if vproc.returncode != 0:
+            raise RuntimeError(f"ffmpeg falló al analizar {input_path}")
+
+    audio_db = audio_out.get('audio_db', np.zeros(0, dtype=np.float32))
+    if cache_path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = cache_path + '.tmp.npz'
+            np.savez_compressed(tmp, scene_scores=scene, audio_db=audio_db)
+            os.replace(tmp, cache_path)
+        except Exception:
+            logger.debug("analysis: no se pudo guardar la caché", exc_info=True)
+    return {'scene_scores': scene, 'audio_db': audio_db, 'fps': float(fps), 'window_ms': window_ms}
+
+
+def scene_changes_ms(analysis: Dict, threshold: Optional[float] = None) -> List[int]:
+    """Instantes (ms) de cambio de escena.
+
+    Si no se da `threshold`, se usa uno adaptativo: media + 4 desviaciones típicas, con un
+    mínimo de 0.08 (8% de diferencia media de luminancia).
+    """
+    np = _import_numpy()
+    scores = analysis['scene_scores']
+    if len(scores) < 2:
+        return []
+    if threshold is None:
+        threshold = max(0.08, float(scores.mean() + 4.0 * scores.std()))
+    idx = np.nonzero(scores >= threshold)[0]
+    return [int(round(i * 1000.0 / analysis['fps'])) for i in idx if i > 0]
+
+
+def silence_windows_ms(analysis: Dict, threshold_db: float = -40.0, min_silence_ms: int = 300) -> List[Tuple[int, int]]:
+    """Intervalos `(start_ms, end_ms)` con nivel por debajo de `threshold_db` durante al menos `min_silence_ms`."""
+    np = _import_numpy()
+    db = analysis['audio_db']
+    if len(db) == 0:
+        return []
+    win = analysis['window_ms']
+    quiet = (db < threshold_db).astype(np.int8)
+    # bordes de las rachas de ventanas silenciosas
+    edges = np.diff(np.concatenate([[0], quiet, [0]]))
+    starts = np.nonzero(edges == 1)[0]
+    ends = np.nonzero(edges == -1)[0]
+    out = []
+    for s, e in zip(starts, ends):
+        if (e - s) * win >= min_silence_ms:
+            out.append((int(s * win), int(e * win)))
+    return out
+
+
+def snap_segments(segments: List[Tuple[int, int]], analysis: Dict, tolerance_ms: int,
+                  scene_threshold: Optional[float] = None, silence_db: float = -40.0,
+                  min_silence_ms: int = 300) -> List[Tuple[int, int]]:
+    """Mueve los cortes interiores de `segments` al cambio de escena o silencio más cercano.
+
+    Cada corte se mueve como mucho `tolerance_ms`; si no hay candidato se queda donde
+    estaba. Los segmentos siguen siendo contiguos y de duración > 0.
+    """
+    if len(segments) < 2 or tolerance_ms <= 0:
+        return list(segments)
+    scenes = scene_changes_ms(analysis, scene_threshold)
+    silences = silence_windows_ms(analysis, silence_db, min_silence_ms)
+    sil_starts = [s for s, _ in silences]
+
+    def nearest(cut: int) -> Optional[int]:
+        best = None
+        # silencio: si el corte cae dentro de uno, distancia 0
+        i = bisect.bisect_right(sil_starts, cut)
+        for j in (i - 1, i):
+            if 0 <= j < len(silences):
+                s, e = silences[j]
+                cand = min(max(cut, s), e)
+                if best is None or abs(cand - cut) < abs(best - cut):
+                    best = cand
+        i = bisect.bisect_left(scenes, cut)
+        for j in (i - 1, i):
+            if 0 <= j < len(scenes):
+                cand = scenes[j]
+                if best is None or abs(cand - cut) < abs(best - cut):
+                    best = cand
+        if best is not None and abs(best - cut) <= tolerance_ms:
+            return best
+        return None
+
+    total_end = segments[-1][1]
+    cuts = []
+    prev = segments[0][0]
+    for _, nominal in segments[:-1]:
+        snapped = nearest(nominal)
+        cut = snapped if snapped is not None else nominal
+        # mantener orden estricto y no pisar el final
+        if cut <= prev or cut >= total_end:
+            cut = nominal if prev < nominal < total_end else None
+        if cut is None:
+            continue
+        cuts.append(cut)
+        prev = cut
+    bounds = [segments[0][0]] + cuts + [total_end]
+    return [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
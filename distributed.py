@@ -0,0 +1,459 @@
+"""Corte distribuido entre varias máquinas mediante una cola de trabajos en un directorio compartido.
+
+Un solo equipo limita el ritmo de corte aunque use todos sus núcleos. Aquí el corte se
+reparte: el coordinador planifica los segmentos (rangos en ms, ajustados al contenido si
+se pide, igual que `split_video`) y los deja como trabajos en una cola; cualquier número
+de workers sin interfaz los reclaman, generan cada parte y anotan el resultado; el
+coordinador espera, verifica las partes y escribe `manifest.json`.
+
+- Cola: un fichero SQLite (`queue.sqlite`) en el directorio compartido, que hace de
+  broker. Se usa el diario clásico (no WAL, que necesita memoria compartida entre
+  procesos del mismo equipo) y cada reclamación va en una transacción `BEGIN IMMEDIATE`,
+  así dos workers nunca se llevan el mismo trabajo. En NFS hace falta que el bloqueo de
+  ficheros funcione (`lockd`); SMB y los sistemas de ficheros locales lo tienen.
+- Leases: un trabajo reclamado tiene un plazo (`lease_s`) que el worker renueva mientras
+  ffmpeg trabaja. Si un worker muere, al vencer el plazo el trabajo vuelve a la cola (hasta
+  `max_attempts` intentos; después queda como fallido). Cada parte se escribe en un
+  temporal propio del worker y se renombra al terminar, así un trabajo repetido por un
+  lease vencido nunca deja una parte a medias.
+- Rutas: la entrada y la carpeta de salida se guardan como rutas absolutas y los workers
+  deben verlas en el mismo sitio (montaje compartido con la misma ruta en todos los nodos).
+
+Sólo genera partes MP4 (ni perfiles de salida ni HLS, que dependen de una sola pasada de
+ffmpeg sobre todo el fichero). Uso desde la línea de comandos::
+
+    python distributed.py worker /mnt/cola                 # en cada nodo
+    python distributed.py split /mnt/cola video.mp4 /mnt/salida 60
+    python distributed.py split /mnt/cola video.mp4 /tmp/salida 60 --local-workers 4
+    python distributed.py status /mnt/cola
+
+`--local-workers N` lanza N procesos worker en la misma máquina (útil para probar el
+modo distribuido en un solo equipo). `PYVID_DEBUG=1` activa los logs DEBUG.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+import subprocess
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import splitter
+
+
+QUEUE_FILENAME = 'queue.sqlite'
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS runs (id TEXT PRIMARY KEY, input TEXT, output_dir TEXT, segment_length REAL, '
+    'options TEXT, max_attempts INTEGER, created REAL, status TEXT)',
+    'CREATE TABLE IF NOT EXISTS jobs (run_id TEXT, idx INTEGER, start_ms INTEGER, end_ms INTEGER, out_path TEXT, '
+    'state TEXT, worker TEXT, lease_until REAL, attempts INTEGER DEFAULT 0, result TEXT, error TEXT, '
+    'PRIMARY KEY (run_id, idx))',
+    'CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, lease_until)',
+)
+
+
+class JobQueue:
+    """Cola de trabajos de corte en `queue_dir/queue.sqlite`. Segura entre hilos y procesos."""
+
+    def __init__(self, queue_dir: str, busy_timeout_s: float = 30.0):
+        self.queue_dir = os.path.abspath(queue_dir)
+        self.path = os.path.join(self.queue_dir, QUEUE_FILENAME)
+        self.busy_timeout_s = busy_timeout_s
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(self.queue_dir, exist_ok=True)
+            # autocommit: las transacciones se abren a mano con BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_s, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=DELETE')
+            for stmt in _SCHEMA:
+                conn.execute(stmt)
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        conn = self._conn()
+        return _Immediate(conn)
+
+    # --- coordinador ---
+    def add_run(self, input_path: str, output_dir: str, segment_length: float, segments: List[Tuple[int, int]],
+                options: Optional[Dict[str, Any]] = None, max_attempts: int = 3) -> str:
+        """Encolar un corte: un trabajo por segmento. Devuelve el id de la ejecución."""
+        run_id = uuid.uuid4().hex[:12]
+        with self._transaction() as conn:
+            conn.execute('INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                         (run_id, os.path.abspath(input_path), os.path.abspath(output_dir), float(segment_length),
+                          json.dumps(options or {}), int(max_attempts), time.time(), 'running'))
+            conn.executemany(
+                "INSERT INTO jobs (run_id, idx, start_ms, end_ms, out_path, state) VALUES (?, ?, ?, ?, ?, 'pending')",
+                [(run_id, n, s, e, os.path.join(os.path.abspath(output_dir), f"VID-{n:04d}.mp4"))
+                 for n, (s, e) in enumerate(segments, start=1)])
+        return run_id
+
+    def run_info(self, run_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute('SELECT * FROM runs WHERE id = ?', (run_id,)).fetchone()
+        if row is None:
+            return None
+        info = dict(row)
+        info['options'] = json.loads(info['options'] or '{}')
+        return info
+
+    def runs(self) -> List[Dict[str, Any]]:
+        return [dict(r) for r in self._conn().execute('SELECT * FROM runs ORDER BY created')]
+
+    def jobs(self, run_id: str) -> List[Dict[str, Any]]:
+        rows = self._conn().execute('SELECT * FROM jobs WHERE run_id = ? ORDER BY idx', (run_id,))
+        return [dict(r) for r in rows]
+
+    def counts(self, run_id: str) -> Dict[str, int]:
+        rows = self._conn().execute('SELECT state, COUNT(*) FROM jobs WHERE run_id = ? GROUP BY state', (run_id,))
+        return {state: n for state, n in rows}
+
+    def set_run_status(self, run_id: str, status: str) -> None:
+        with self._transaction() as conn:
+            conn.execute('UPDATE runs SET status = ? WHERE id = ?', (status, run_id))
+
+    def cancel_run(self, run_id: str) -> None:
+        """Retirar de la cola los trabajos pendientes de `run_id` (los que están en marcha terminan)."""
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET state = 'failed', error = 'cancelado' WHERE run_id = ? AND state = 'pending'",
+                         (run_id,))
+            conn.execute("UPDATE runs SET status = 'cancelled' WHERE id = ?", (run_id,))
+
+    # --- workers ---
+    @staticmethod
+    def _expire_leases(conn: sqlite3.Connection, now: float) -> None:
+        # un lease vencido es un worker muerto o colgado: reintentar o dar el trabajo por fallido
+        conn.execute(
+            "UPDATE jobs SET state = CASE WHEN attempts >= "
+            "(SELECT max_attempts FROM runs WHERE runs.id = jobs.run_id) THEN 'failed' ELSE 'pending' END, "
+            "error = 'lease vencido (' || COALESCE(worker, '?') || ')', worker = NULL "
+            "WHERE state = 'leased' AND lease_until < ?", (now,))
+
+    def expire_leases(self) -> None:
+        with self._transaction() as conn:
+            self._expire_leases(conn, time.time())
+
+    def claim(self, worker_id: str, lease_s: float) -> Optional[Dict[str, Any]]:
+        """Reclamar el siguiente trabajo pendiente (el más antiguo primero). None si no hay ninguno."""
+        now = time.time()
+        with self._transaction() as conn:
+            self._expire_leases(conn, now)
+            row = conn.execute(
+                "SELECT jobs.*, runs.input, runs.options FROM jobs JOIN runs ON runs.id = jobs.run_id "
+                "WHERE jobs.state = 'pending' AND runs.status = 'running' "
+                "ORDER BY runs.created, jobs.idx LIMIT 1").fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE jobs SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 "
+                         "WHERE run_id = ? AND idx = ?", (worker_id, now + lease_s, row['run_id'], row['idx']))
+        job = dict(row)
+        job['options'] = json.loads(job['options'] or '{}')
+        job['attempts'] += 1
+        return job
+
+    def renew(self, job: Dict[str, Any], worker_id: str, lease_s: float) -> bool:
+        """Prolongar el lease de `job`. False si ya no es de este worker."""
+        with self._transaction() as conn:
+            cur = conn.execute("UPDATE jobs SET lease_until = ? WHERE run_id = ? AND idx = ? AND worker = ? "
+                               "AND state = 'leased'", (time.time() + lease_s, job['run_id'], job['idx'], worker_id))
+            return cur.rowcount == 1
+
+    def complete(self, job: Dict[str, Any], worker_id: str, result: Dict[str, Any]) -> bool:
+        with self._transaction() as conn:
+            # si el lease venció pero la parte está escrita, el resultado sigue valiendo
+            cur = conn.execute("UPDATE jobs SET state = 'done', worker = ?, result = ?, error = NULL "
+                               "WHERE run_id = ? AND idx = ? AND state != 'done'",
+                               (worker_id, json.dumps(result), job['run_id'], job['idx']))
+            return cur.rowcount == 1
+
+    def fail(self, job: Dict[str, Any], worker_id: str, error: str) -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = CASE WHEN attempts >= "
+                "(SELECT max_attempts FROM runs WHERE runs.id = jobs.run_id) THEN 'failed' ELSE 'pending' END, "
+                "error = ?, worker = NULL WHERE run_id = ? AND idx = ? AND worker = ? AND state = 'leased'",
+                (error[-2000:], job['run_id'], job['idx'], worker_id))
+
+
+class _Immediate:
+    """`with`: transacción `BEGIN IMMEDIATE` (toma el bloqueo de escritura al empezar)."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class Worker:
+    """Worker sin interfaz: reclama trabajos de la cola, genera cada parte y anota el resultado."""
+
+    def __init__(self, queue_dir: str, worker_id: Optional[str] = None, lease_s: float = 60.0,
+                 ffmpeg_exe: Optional[str] = None, tolerance_ms: int = 80):
+        self.queue = JobQueue(queue_dir)
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_s = float(lease_s)
+        self.tolerance_ms = tolerance_ms
+        self.ffmpeg_exe = ffmpeg_exe or splitter._find_ffmpeg_executable()
+        self.processed = 0
+        self.failed = 0
+
+    def process(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """Generar la parte de `job` y devolver su resultado (ruta, duración en ms y si se recodificó)."""
+        if not self.ffmpeg_exe:
+            raise RuntimeError('No se encontró ffmpeg en este nodo.')
+        out_path = job['out_path']
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        # temporal propio de este worker: otro que repita el trabajo no lo pisa
+        tmp = f"{out_path}.{self.worker_id.replace(':', '_').replace(os.sep, '_')}.part.mp4"
+        start_ms, end_ms = job['start_ms'], job['end_ms']
+        start_s, dur_s = splitter._ms_to_seconds(start_ms), splitter._ms_to_seconds(end_ms - start_ms)
+        started = time.monotonic()
+        recoded = False
+        try:
+            splitter._run_sync(splitter._run_ffmpeg_segment(self.ffmpeg_exe, job['input'], start_s, dur_s, tmp,
+                                                            precise=job['options'].get('precise')))
+            # la copia de streams empieza en el keyframe anterior: la misma comprobación que
+            # verify_segments_async, pero aquí, para que la recodificación también se reparta
+            real_ms = splitter._seconds_to_ms(splitter._run_sync(splitter._probe_duration_async(self.ffmpeg_exe, tmp)))
+            if real_ms > end_ms - start_ms + self.tolerance_ms:
+                splitter._run_sync(splitter._recode_precise_segment(self.ffmpeg_exe, job['input'], start_s, dur_s, tmp))
+                recoded = True
+            os.replace(tmp, out_path)
+        finally:
+            if os.path.exists(tmp):
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+        return {'path': out_path, 'ms': end_ms - start_ms, 'recoded': recoded,
+                'elapsed_s': round(time.monotonic() - started, 3)}
+
+    def _keep_lease(self, job: Dict[str, Any], done: threading.Event) -> None:
+        while not done.wait(self.lease_s / 3.0):
+            try:
+                if not self.queue.renew(job, self.worker_id, self.lease_s):
+                    logging.getLogger(__name__).warning("Lease perdido para %s/%d", job['run_id'], job['idx'])
+                    return
+            except sqlite3.Error:
+                logging.getLogger(__name__).debug("No se pudo renovar el lease", exc_info=True)
+
+    def run_one(self) -> bool:
+        """Procesar un trabajo si lo hay. Devuelve False si la cola estaba vacía."""
+        logger = logging.getLogger(__name__)
+        job = self.queue.claim(self.worker_id, self.lease_s)
+        if job is None:
+            return False
+        logger.info("[%s] parte %d de %s (%d-%d ms, intento %d)", self.worker_id, job['idx'], job['run_id'],
+                    job['start_ms'], job['end_ms'], job['attempts'])
+        done = threading.Event()
+        keeper = threading.Thread(target=self._keep_lease, args=(job, done), daemon=True)
+        keeper.start()
+        try:
+            result = self.process(job)
+        except Exception as e:
+            done.set()
+            self.failed += 1
+            logger.warning("[%s] parte %d de %s falló: %s", self.worker_id, job['idx'], job['run_id'], e)
+            self.queue.fail(job, self.worker_id, f"{self.worker_id}: {e}")
+        else:
+            done.set()
+            self.processed += 1
+            self.queue.complete(job, self.worker_id, result)
+        keeper.join()
+        return True
+
+    def run(self, poll_s: float = 1.0, exit_when_idle: bool = False,
+            should_stop: Optional[Callable[[], bool]] = None) -> None:
+        """Bucle del worker. Con `exit_when_idle` termina en cuanto la cola queda vacía."""
+        while should_stop is None or not should_stop():
+            try:
+                worked = self.run_one()
+            except sqlite3.Error:
+                logging.getLogger(__name__).warning("Cola no disponible; reintentando", exc_info=True)
+                worked = False
+            if not worked:
+                if exit_when_idle:
+                    return
+                time.sleep(poll_s)
+
+
+class Coordinator:
+    """Planifica cortes en la cola, espera a los workers, verifica y escribe el manifiesto."""
+
+    def __init__(self, queue_dir: str, max_attempts: int = 3):
+        self.queue = JobQueue(queue_dir)
+        self.max_attempts = max_attempts
+
+    def plan(self, input_path: str, output_dir: str, segment_length: float,
+             snap_tolerance: Optional[float] = None, precise: Optional[bool] = None) -> str:
+        """Calcular los segmentos de `input_path` y encolarlos. Devuelve el id de la ejecución."""
+        if segment_length <= 0:
+            raise ValueError("segment_length debe ser > 0")
+        ffmpeg_exe = splitter._find_ffmpeg_executable()
+        if not ffmpeg_exe:
+            raise RuntimeError('El corte distribuido necesita ffmpeg y no se encontró en el sistema.')
+        duration = splitter._run_sync(splitter._probe_duration_async(ffmpeg_exe, input_path))
+        segments = splitter._plan_split(input_path, duration, segment_length, snap_tolerance, ffmpeg_exe)
+        os.makedirs(output_dir, exist_ok=True)
+        if precise is None:
+            precise = splitter._force_precise_enabled()
+        run_id = self.queue.add_run(input_path, output_dir, segment_length, segments,
+                                    {'precise': bool(precise), 'snap_tolerance': snap_tolerance}, self.max_attempts)
+        logging.getLogger(__name__).info("Corte %s: %d trabajos en %s", run_id, len(segments), self.queue.path)
+        return run_id
+
+    def wait(self, run_id: str, poll_s: float = 1.0, timeout_s: Optional[float] = None,
+             progress_cb=None, should_stop: Optional[Callable[[], bool]] = None) -> Dict[str, int]:
+        """Esperar a que no queden trabajos pendientes ni en marcha. Devuelve el recuento por estado.
+
+        `progress_cb(hechos_ms, total_ms)` recibe los ms de las partes terminadas.
+        """
+        deadline = time.monotonic() + timeout_s if timeout_s else None
+        while True:
+            self.queue.expire_leases()
+            jobs = self.queue.jobs(run_id)
+            if progress_cb is not None and jobs:
+                done_ms = sum(j['end_ms'] - j['start_ms'] for j in jobs if j['state'] == 'done')
+                progress_cb(done_ms, jobs[-1]['end_ms'] - jobs[0]['start_ms'])
+            counts: Dict[str, int] = {}
+            for j in jobs:
+                counts[j['state']] = counts.get(j['state'], 0) + 1
+            if not counts.get('pending') and not counts.get('leased'):
+                return counts
+            if should_stop is not None and should_stop():
+                self.queue.cancel_run(run_id)
+                raise InterruptedError('corte distribuido cancelado')
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f'el corte {run_id} no terminó a tiempo: {counts}')
+            time.sleep(poll_s)
+
+    def finish(self, run_id: str) -> List[str]:
+        """Verificar las partes (reextrayendo las que no cuadren) y escribir `manifest.json`."""
+        logger = logging.getLogger(__name__)
+        run = self.queue.run_info(run_id)
+        if run is None:
+            raise ValueError(f'no existe el corte {run_id}')
+        jobs = self.queue.jobs(run_id)
+        failed = [j for j in jobs if j['state'] != 'done']
+        if failed:
+            self.queue.set_run_status(run_id, 'failed')
+            details = '; '.join(f"parte {j['idx']}: {j['error'] or j['state']}" for j in failed[:5])
+            raise RuntimeError(f"{len(failed)} partes del corte {run_id} fallaron: {details}")
+        segments = [(j['start_ms'], j['end_ms']) for j in jobs]
+        outputs = [j['out_path'] for j in jobs]
+        try:
+            outputs = splitter._run_sync(splitter.verify_segments_async(
+                run['input'], outputs, run['segment_length'], segments=segments))
+        except Exception:
+            logger.exception('Error en verificación post-corte (distribuido)')
+        workers: Dict[str, int] = {}
+        for j in jobs:
+            workers[j['worker'] or '?'] = workers.get(j['worker'] or '?', 0) + 1
+        logger.info("Corte %s terminado; partes por worker: %s", run_id, workers)
+        splitter._write_manifest(run['output_dir'], run['input'], segments, {'main': outputs})
+        self.queue.set_run_status(run_id, 'done')
+        return outputs
+
+
+def spawn_local_workers(queue_dir: str, count: int, lease_s: float = 60.0) -> List[subprocess.Popen]:
+    """Lanzar `count` procesos worker en esta máquina que terminan al vaciarse la cola."""
+    cmd = [sys.executable, os.path.abspath(__file__), 'worker', queue_dir, '--exit-when-idle', '--lease', str(lease_s)]
+    return [subprocess.Popen(cmd + ['--id', f"{socket.gethostname()}:local{n}"]) for n in range(1, count + 1)]
+
+
+def split_distributed(input_path: str, output_dir: str, segment_length: float, queue_dir: str,
+                      snap_tolerance: Optional[float] = None, local_workers: int = 0,
+                      timeout_s: Optional[float] = None, progress_cb=None) -> List[str]:
+    """Como `splitter.split_video`, pero repartiendo las partes entre los workers de `queue_dir`.
+
+    Con `local_workers` > 0 se lanzan además esos workers en esta máquina.
+    """
+    coordinator = Coordinator(queue_dir)
+    run_id = coordinator.plan(input_path, output_dir, segment_length, snap_tolerance)
+    procs = spawn_local_workers(queue_dir, local_workers) if local_workers > 0 else []
+    try:
+        coordinator.wait(run_id, timeout_s=timeout_s, progress_cb=progress_cb)
+    finally:
+        for p in procs:
+            try:
+                p.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                p.kill()
+    return coordinator.finish(run_id)
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='distributed.py', description='Corte distribuido de PyVideoPlayer')
+    sub = parser.add_subparsers(dest='command', required=True)
+    w = sub.add_parser('worker', help='procesar trabajos de la cola')
+    w.add_argument('queue_dir', help='directorio compartido de la cola')
+    w.add_argument('--id', help='identificador del worker (por defecto host:pid)')
+    w.add_argument('--lease', type=float, default=60.0, metavar='SEGUNDOS', help='plazo del lease (se renueva mientras trabaja)')
+    w.add_argument('--poll', type=float, default=1.0, metavar='SEGUNDOS', help='espera entre consultas con la cola vacía')
+    w.add_argument('--exit-when-idle', action='store_true', help='terminar cuando la cola quede vacía')
+    s = sub.add_parser('split', help='planificar un corte, esperar a los workers y escribir el manifiesto')
+    s.add_argument('queue_dir')
+    s.add_argument('input')
+    s.add_argument('output_dir')
+    s.add_argument('segment_length', type=float, metavar='SEGUNDOS')
+    s.add_argument('--snap', type=float, metavar='SEGUNDOS', help='ajustar los cortes al contenido con esta tolerancia')
+    s.add_argument('--local-workers', type=int, default=0, metavar='N', help='lanzar N workers en esta máquina')
+    s.add_argument('--timeout', type=float, metavar='SEGUNDOS')
+    st = sub.add_parser('status', help='estado de los cortes de la cola')
+    st.add_argument('queue_dir')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    level = logging.DEBUG if os.environ.get('PYVID_DEBUG', '').lower() in ('1', 'true', 'yes') else logging.INFO
+    logging.basicConfig(level=level, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    if args.command == 'worker':
+        worker = Worker(args.queue_dir, worker_id=args.id, lease_s=args.lease)
+        try:
+            worker.run(poll_s=args.poll, exit_when_idle=args.exit_when_idle)
+        except KeyboardInterrupt:
+            pass
+        print(f"{worker.worker_id}: {worker.processed} partes, {worker.failed} fallos")
+        return 0
+    if args.command == 'split':
+        try:
+            outputs = split_distributed(args.input, args.output_dir, args.segment_length, args.queue_dir,
+                                        snap_tolerance=args.snap, local_workers=args.local_workers,
+                                        timeout_s=args.timeout)
+        except (RuntimeError, ValueError, TimeoutError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 1
+        for path in outputs:
+            print(path)
+        return 0
+    queue = JobQueue(args.queue_dir)
+    for run in queue.runs():
+        counts = queue.counts(run['id'])
+        summary = ', '.join(f"{k}={v}" for k, v in sorted(counts.items()))
+        print(f"{run['id']}  {run['status']:<9}  {summary}  {run['input']} -> {run['output_dir']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""Lectura de listas de rangos (entrada/salida) desde CSV o EDL (CMX3600).
+
+- CSV: una fila por rango con dos columnas `in,out`. Los valores enteros son
+  milisegundos; también se aceptan `HH:MM:SS(.mmm)`. Las filas que no se pueden
+  interpretar (cabeceras, comentarios con '#') se ignoran.
+- EDL CMX3600: se usan los timecodes de origen (source in/out) de cada evento,
+  `HH:MM:SS:FF` (o `;FF` en drop-frame) convertidos a ms con `fps`.
+
+Devuelve siempre una lista de tuplas `(start_ms, end_ms)` en el orden del fichero.
+"""
+import csv
+import re
+from typing import List, Tuple
+
+
+_TC_RE = r'\d{1,2}:\d{2}:\d{2}[:;]\d{2,3}'
+_EDL_EVENT_RE = re.compile(r'^\s*\d+\s+\S+\s+\S+\s+\S+(?:\s+\d+)?\s+(' + _TC_RE + r')\s+(' + _TC_RE + r')\s+' + _TC_RE + r'\s+' + _TC_RE)
+
+
+def timecode_to_ms(tc: str, fps: float = 25.0) -> int:
+    """Convierte `HH:MM:SS:FF` (timecode de EDL) a milisegundos."""
+    parts = re.split(r'[:;]', tc.strip())
+    if len(parts) != 4:
+        raise ValueError(f"Timecode no válido: {tc}")
+    h, m, s, f = (int(p) for p in parts)
+    return (h * 3600 + m * 60 + s) * 1000 + int(round(f * 1000.0 / fps))
+
+
+def _parse_time_ms(value: str) -> int:
+    value = value.strip()
+    if ':' in value:
+        parts = value.split(':')
+        secs = 0.0
+        for p in parts:
+            secs = secs * 60 + float(p)
+        return int(round(secs * 1000.0))
+    return int(value)
+
+
+def parse_csv_ranges(path: str) -> List[Tuple[int, int]]:
+    ranges = []
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        for row in csv.reader(f, dialect):
+            if len(row) < 2 or row[0].lstrip().startswith('#'):
+                continue
+            try:
+                start, end = _parse_time_ms(row[0]), _parse_time_ms(row[1])
+            except ValueError:
+                continue
+            ranges.append((start, end))
+    return ranges
+
+
+def parse_edl_ranges(path: str, fps: float = 25.0) -> List[Tuple[int, int]]:
+    ranges = []
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            m = _EDL_EVENT_RE.match(line)
+            if m:
+                ranges.append((timecode_to_ms(m.group(1), fps), timecode_to_ms(m.group(2), fps)))
+    return ranges
+
+
+def parse_ranges_file(path: str, fps: float = 25.0) -> List[Tuple[int, int]]:
+    """Lee `path` como EDL (extensión .edl) o CSV y devuelve los rangos en ms."""
+    if path.lower().endswith('.edl'):
+        return parse_edl_ranges(path, fps)
+    return parse_csv_ranges(path)
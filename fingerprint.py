@@ -0,0 +1,52 @@
+"""Huellas de contenido rápidas por muestreo, para detectar el mismo vídeo con rutas distintas.
+
+Un fichero de varios GB no se lee entero: se proyecta en memoria (`mmap`) y se hashean
+el tamaño y unos pocos bloques repartidos por el fichero (siempre el primero y el
+último, donde los contenedores guardan las cabeceras y el índice `moov`). Dos ficheros
+con la misma huella se tratan como el mismo contenido; el muestreo no distingue ficheros
+del mismo tamaño que sólo difieran entre bloques, algo que en vídeo real no ocurre.
+
+La huella no incluye la ruta ni la fecha, así que dos copias del mismo clip coinciden.
+Se guarda en la caché de metadatos (clave `fingerprint`), que la invalida si cambian el
+tamaño o el mtime del fichero.
+"""
+import os
+import mmap
+import hashlib
+from typing import Optional
+
+from mediainfo import MediaInfoCache, get_cache
+
+
+FINGERPRINT_VERSION = 1
+
+
+def fingerprint_file(path: str, blocks: int = 16, block_size: int = 64 * 1024) -> str:
+    """Huella `v1:tamaño:hash` de `path` a partir de `blocks` bloques de `block_size` bytes."""
+    size = os.path.getsize(path)
+    h = hashlib.blake2b(str(size).encode('ascii'), digest_size=16)
+    if size:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            with memoryview(m) as view:
+                if size <= blocks * block_size:
+                    h.update(view)
+                else:
+                    step = (size - block_size) // (blocks - 1)
+                    for i in range(blocks):
+                        h.update(view[i * step:i * step + block_size])
+    return f"v{FINGERPRINT_VERSION}:{size:x}:{h.hexdigest()}"
+
+
+def get_fingerprint(path: str, cache: Optional[MediaInfoCache] = None) -> str:
+    """Huella de `path`, desde la caché de metadatos si sigue siendo válida."""
+    cache = cache or get_cache()
+    info = cache.get(path)
+    fp = info.get('fingerprint') if info else None
+    if fp and fp.startswith(f"v{FINGERPRINT_VERSION}:"):
+        return fp
+    fp = fingerprint_file(path)
+    try:
+        cache.update(path, fingerprint=fp)
+    except OSError:
+        pass
+    return fp
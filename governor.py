@@ -0,0 +1,250 @@
+"""Gobernador de recursos para los procesos hijos (ffmpeg/ffprobe).
+
+Todos los subprocesos del splitter (y del análisis y los proxies) se lanzan con
+`get_governor().popen(...)` / `.create_subprocess_exec(...)` (directamente o a través de
+`runner.run_captured[_async]`), que aplican:
+
+- prioridad de CPU (`nice`, por defecto 10) y clase de E/S (`ionice`, por defecto
+  best-effort baja; `idle` si se pide) para que la reproducción tenga preferencia;
+- afinidad de CPU opcional (conjunto de núcleos permitidos);
+- un presupuesto global de hilos repartido entre los ffmpeg que corren a la vez: a cada
+  salida se le añade `-threads N` (libx264 usa por defecto 1.5 hilos por núcleo);
+- estrangulamiento automático mientras el reproductor está en PlayingState: los hijos en
+  marcha pasan a `playback_nice` (19) y a los núcleos que no se reservan para la
+  reproducción, y los nuevos trabajos reciben menos hilos.
+
+Configuración (prioridad: variables de entorno > `~/.pyvideoplayer.json` clave `governor`):
+PYVID_NICE, PYVID_IONICE (idle | best-effort | none), PYVID_CPU_AFFINITY ("0-3,6"),
+PYVID_THREADS (presupuesto total de hilos) y PYVID_PLAYBACK_RESERVE (núcleos reservados).
+En Windows sólo se aplica la clase de prioridad del proceso y el presupuesto de hilos.
+"""
+import os
+import shutil
+import logging
+import threading
+import subprocess
+import weakref
+from typing import Iterable, List, Optional
+
+
+# Opciones de ffmpeg que no llevan valor (para localizar las salidas en la línea de comandos)
+_FFMPEG_FLAGS = {'-y', '-n', '-nostdin', '-hide_banner', '-an', '-vn', '-sn', '-dn', '-shortest',
+                 '-stats', '-nostats', '-copyts', '-re', '-accurate_seek', '-noaccurate_seek'}
+
+
+def parse_cpu_list(text: str) -> List[int]:
+    """'0-3,6' -> [0, 1, 2, 3, 6]."""
+    cpus = []
+    for part in str(text).split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            a, b = part.split('-', 1)
+            cpus.extend(range(int(a), int(b) + 1))
+        else:
+            cpus.append(int(part))
+    return sorted(set(cpus))
+
+
+def ffmpeg_output_positions(cmd: List[str]) -> List[int]:
+    """Índices de `cmd` que son ficheros de salida de ffmpeg (argumentos sin opción delante)."""
+    positions = []
+    i = 1
+    while i < len(cmd):
+        tok = cmd[i]
+        if tok in _FFMPEG_FLAGS:
+            i += 1
+        elif tok.startswith('-') and len(tok) > 1:
+            i += 2
+        else:
+            positions.append(i)
+            i += 1
+    return positions
+
+
+def with_thread_limit(cmd: List[str], threads: int) -> List[str]:
+    """Copia de `cmd` con `-threads N` delante de cada salida que no lo indique ya."""
+    if threads <= 0 or not cmd or 'ffmpeg' not in os.path.basename(cmd[0]).lower() or '-threads' in cmd:
+        return list(cmd)
+    out = list(cmd)
+    for pos in reversed(ffmpeg_output_positions(cmd)):
+        out[pos:pos] = ['-threads', str(threads)]
+    return out
+
+
+class ResourceGovernor:
+    """Aplica prioridad, afinidad y presupuesto de hilos a los procesos hijos."""
+
+    def __init__(self, nice: int = 10, ionice: Optional[str] = 'best-effort', affinity: Optional[Iterable[int]] = None,
+                 thread_budget: Optional[int] = None, playback_nice: int = 19, playback_reserve: int = 2):
+        self.nice = int(nice)
+        self.ionice = ionice if ionice not in ('', 'none', None) else None
+        self.affinity = sorted(set(affinity)) if affinity else None
+        self.thread_budget = int(thread_budget) if thread_budget else (os.cpu_count() or 2)
+        self.playback_nice = int(playback_nice)
+        self.playback_reserve = max(0, int(playback_reserve))
+        self.playback_active = False
+        self._procs = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._ionice_exe = shutil.which('ionice') if os.name == 'posix' else None
+        self._ionice_ok = None
+
+    @classmethod
+    def from_settings(cls, settings: Optional[dict] = None) -> 'ResourceGovernor':
+        """Construir a partir de un dict de ajustes (clave `governor`) y las variables PYVID_*."""
+        s = dict(settings or {})
+        env = os.environ
+        if env.get('PYVID_NICE'):
+            s['nice'] = int(env['PYVID_NICE'])
+        if env.get('PYVID_IONICE'):
+            s['ionice'] = env['PYVID_IONICE']
+        if env.get('PYVID_CPU_AFFINITY'):
+            s['affinity'] = env['PYVID_CPU_AFFINITY']
+        if env.get('PYVID_THREADS'):
+            s['thread_budget'] = int(env['PYVID_THREADS'])
+        if env.get('PYVID_PLAYBACK_RESERVE'):
+            s['playback_reserve'] = int(env['PYVID_PLAYBACK_RESERVE'])
+        affinity = s.get('affinity')
+        if isinstance(affinity, str):
+            affinity = parse_cpu_list(affinity)
+        return cls(nice=s.get('nice', 10), ionice=s.get('ionice', 'best-effort'), affinity=affinity,
+                   thread_budget=s.get('thread_budget'), playback_nice=s.get('playback_nice', 19),
+                   playback_reserve=s.get('playback_reserve', 2))
+
+    # ----------------- Reparto -----------------
+    def _allowed_cpus(self) -> Optional[List[int]]:
+        """Núcleos para los hijos: la afinidad configurada menos los reservados al reproducir."""
+        cpus = self.affinity
+        if cpus is None and hasattr(os, 'sched_getaffinity'):
+            try:
+                cpus = sorted(os.sched_getaffinity(0))
+            except OSError:
+                cpus = None
+        if cpus and self.playback_active and self.playback_reserve:
+            # dejar libres los primeros núcleos para la decodificación del reproductor
+            reduced = cpus[self.playback_reserve:]
+            cpus = reduced or cpus[-1:]
+        return cpus
+
+    def _live(self) -> list:
+        # Popen (poll) o asyncio.subprocess.Process (returncode)
+        return [p for p in list(self._procs) if (p.poll() if hasattr(p, 'poll') else p.returncode) is None]
+
+    def threads_for_new_job(self) -> int:
+        """Hilos para un trabajo nuevo: presupuesto entre los trabajos activos (incluido éste)."""
+        budget = self.thread_budget
+        if self.playback_active:
+            budget = max(1, budget - self.playback_reserve)
+        cpus = self._allowed_cpus()
+        if cpus:
+            budget = min(budget, len(cpus))
+        return max(1, budget // (len(self._live()) + 1))
+
+    # ----------------- Lanzamiento -----------------
+    def prepare(self, cmd: List[str]) -> List[str]:
+        """Línea de comandos final: límite de hilos y prefijo `ionice` si procede."""
+        cmd = with_thread_limit(list(cmd), self.threads_for_new_job())
+        cls_arg = self._ionice_args()
+        if cls_arg:
+            cmd = [self._ionice_exe] + cls_arg + cmd
+        return cmd
+
+    def _ionice_args(self) -> Optional[List[str]]:
+        cls_arg = {'idle': ['-c', '3'], 'best-effort': ['-c', '2', '-n', '7']}.get(self.ionice or '')
+        if not cls_arg or not self._ionice_exe:
+            return None
+        if self._ionice_ok is None:
+            # en algunos contenedores ioprio_set está bloqueado y ionice no llegaría a lanzar ffmpeg
+            try:
+                self._ionice_ok = subprocess.run([self._ionice_exe] + cls_arg + ['true'],
+                                                 capture_output=True).returncode == 0
+            except OSError:
+                self._ionice_ok = False
+        return cls_arg if self._ionice_ok else None
+
+    def popen(self, cmd: List[str], **kwargs) -> subprocess.Popen:
+        """Como subprocess.Popen, con las restricciones del gobernador aplicadas."""
+        if os.name == 'nt':
+            flag = getattr(subprocess, 'IDLE_PRIORITY_CLASS' if self.nice >= 15 else 'BELOW_NORMAL_PRIORITY_CLASS', 0)
+            kwargs['creationflags'] = kwargs.get('creationflags', 0) | flag
+        with self._lock:
+            proc = subprocess.Popen(self.prepare(cmd), **kwargs)
+            self._procs.add(proc)
+        self._apply(proc.pid, self.playback_nice if self.playback_active else self.nice, self._allowed_cpus())
+        return proc
+
+    async def create_subprocess_exec(self, cmd: List[str], **kwargs):
+        """Como asyncio.create_subprocess_exec, con las restricciones del gobernador aplicadas."""
+        import asyncio
+        if os.name == 'nt':
+            flag = getattr(subprocess, 'IDLE_PRIORITY_CLASS' if self.nice >= 15 else 'BELOW_NORMAL_PRIORITY_CLASS', 0)
+            kwargs['creationflags'] = kwargs.get('creationflags', 0) | flag
+        proc = await asyncio.create_subprocess_exec(*self.prepare(cmd), **kwargs)
+        with self._lock:
+            self._procs.add(proc)
+        self._apply(proc.pid, self.playback_nice if self.playback_active else self.nice, self._allowed_cpus())
+        return proc
+
+    # ----------------- Estrangulamiento -----------------
+    def set_playback_active(self, active: bool) -> None:
+        """Llamar al cambiar el estado del reproductor; re-prioriza los hijos en marcha."""
+        active = bool(active)
+        if active == self.playback_active:
+            return
+        self.playback_active = active
+        nice = self.playback_nice if active else self.nice
+        cpus = self._allowed_cpus()
+        for proc in self._live():
+            self._apply(proc.pid, nice, cpus)
+
+    @staticmethod
+    def _thread_ids(pid: int) -> List[int]:
+        # En Linux nice y afinidad son por hilo: aplicarlos a todos los hilos de ffmpeg
+        try:
+            return [int(t) for t in os.listdir(f'/proc/{pid}/task')]
+        except OSError:
+            return [pid]
+
+    def _apply(self, pid: int, nice: int, cpus: Optional[List[int]]) -> None:
+        if os.name != 'posix':
+            return
+        for tid in self._thread_ids(pid):
+            try:
+                # sólo se puede bajar la prioridad (sin privilegios no se vuelve a subir)
+                current = os.getpriority(os.PRIO_PROCESS, tid)
+                if nice > current:
+                    os.setpriority(os.PRIO_PROCESS, tid, nice)
+            except (OSError, AttributeError):
+                pass
+            if cpus and hasattr(os, 'sched_setaffinity'):
+                try:
+                    os.sched_setaffinity(tid, cpus)
+                except OSError:
+                    pass
+        logging.getLogger(__name__).debug("governor: pid=%s nice=%s cpus=%s", pid, nice, cpus)
+
+
+_governor: Optional[ResourceGovernor] = None
+_governor_lock = threading.Lock()
+
+
+def get_governor() -> ResourceGovernor:
+    """Gobernador compartido del proceso (creado bajo demanda con las variables PYVID_*)."""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = ResourceGovernor.from_settings()
+        return _governor
+
+
+def configure(settings: Optional[dict] = None) -> ResourceGovernor:
+    """Reemplazar el gobernador compartido (p. ej. con la clave `governor` de los ajustes)."""
+    global _governor
+    with _governor_lock:
+        previous = _governor
+        _governor = ResourceGovernor.from_settings(settings)
+        if previous is not None:
+            _governor._procs = previous._procs
+            _governor.set_playback_active(previous.playback_active)
+        return _governor
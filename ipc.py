@@ -0,0 +1,205 @@
+"""Instancia única y control del reproductor en marcha por IPC local.
+
+La primera instancia escucha en un `QLocalServer` (socket de dominio Unix o tubería con
+nombre en Windows, accesible sólo para el usuario). Un segundo lanzamiento de `main.py`
+se conecta con `QLocalSocket`, entrega sus argumentos como comandos y termina enseguida,
+sin importar QtWidgets, QtMultimedia ni construir otra ventana.
+
+Protocolo: una línea JSON por comando (`{"cmd": "...", ...}`) y una línea JSON de
+respuesta por comando (`{"ok": true, ...}` o `{"ok": false, "error": "..."}`), en orden.
+Se pueden enviar varios comandos por conexión. Comandos (ver `VideoPlayer.handle_ipc_command`):
+
+- `ping`, `status`, `raise`
+- `open {"files": [...]}`: añade a la cola y reproduce el primero; `enqueue {"files": [...]}` sólo añade
+- `play`, `pause`, `toggle`, `stop`, `next`, `prev`, `seek {"position_ms": N}`
+- `split {"segment_length": s, "output_dir": dir, "file": ruta opcional}`
+- `quit`
+
+Desde la línea de comandos: `python main.py --cmd '{"cmd": "status"}'`, o
+`send_commands([...])` desde Python. El nombre del servidor es por usuario
+(`PYVID_INSTANCE` lo cambia) y `PYVID_SINGLE_INSTANCE=0` desactiva el modo.
+
+El arranque se serializa con un `QLockFile` (`startup_lock`) en la carpeta de ejecución
+del usuario: un "abrir con" de varios ficheros lanza N procesos a la vez y sólo el
+primero construye la ventana; los demás esperan al cerrojo y le entregan sus ficheros.
+"""
+import os
+import json
+import getpass
+import logging
+import tempfile
+from typing import Callable, List, Optional
+
+from PySide6.QtCore import QLockFile, QObject, QStandardPaths
+from PySide6.QtNetwork import QAbstractSocket, QLocalServer, QLocalSocket
+
+
+MAX_LINE_BYTES = 1024 * 1024
+STARTUP_LOCK_TIMEOUT_MS = 15000
+
+
+def server_name() -> str:
+    """Nombre del servidor local: `pyvideoplayer-<usuario>` o PYVID_INSTANCE."""
+    name = os.environ.get('PYVID_INSTANCE')
+    if name:
+        return name
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = 'user'
+    return f"pyvideoplayer-{user}"
+
+
+def single_instance_enabled() -> bool:
+    return os.environ.get('PYVID_SINGLE_INSTANCE', '').lower() not in ('0', 'false', 'no')
+
+
+def startup_lock(name: Optional[str] = None, timeout_ms: int = STARTUP_LOCK_TIMEOUT_MS) -> Optional[QLockFile]:
+    """Tomar el cerrojo de arranque de la instancia `name`.
+
+    Se mantiene desde que se comprueba si hay otra instancia hasta que el servidor escucha,
+    de modo que dos lanzamientos simultáneos no crean dos ventanas. Devuelve el cerrojo
+    (hay que llamar a `unlock()`) o None si no se pudo tomar a tiempo.
+    """
+    directory = QStandardPaths.writableLocation(QStandardPaths.RuntimeLocation) or tempfile.gettempdir()
+    lock = QLockFile(os.path.join(directory, f"{name or server_name()}.lock"))
+    # sólo se da por caducado si el proceso que lo tiene ya no existe (construir la
+    # ventana puede tardar)
+    lock.setStaleLockTime(0)
+    if lock.tryLock(timeout_ms):
+        return lock
+    logging.getLogger(__name__).warning("No se pudo tomar el cerrojo de arranque %s", lock.fileName())
+    return None
+
+
+def instance_alive(name: Optional[str] = None, timeout_ms: int = 500) -> bool:
+    """True si hay un servidor aceptando conexiones en `name`."""
+    sock = QLocalSocket()
+    sock.connectToServer(name or server_name())
+    if not sock.waitForConnected(timeout_ms):
+        return False
+    sock.disconnectFromServer()
+    return True
+
+
+def send_commands(commands: List[dict], timeout_ms: int = 2000, name: Optional[str] = None) -> Optional[List[dict]]:
+    """Enviar `commands` a la instancia en marcha y devolver sus respuestas.
+
+    Devuelve None si no hay ninguna instancia escuchando.
+    """
+    sock = QLocalSocket()
+    sock.connectToServer(name or server_name())
+    if not sock.waitForConnected(timeout_ms):
+        return None
+    payload = b''.join(json.dumps(c, ensure_ascii=False).encode('utf-8') + b'\n' for c in commands)
+    sock.write(payload)
+    sock.waitForBytesWritten(timeout_ms)
+    replies = []
+    while len(replies) < len(commands):
+        if not sock.canReadLine() and not sock.waitForReadyRead(timeout_ms):
+            break
+        while sock.canReadLine() and len(replies) < len(commands):
+            try:
+                replies.append(json.loads(bytes(sock.readLine()).decode('utf-8')))
+            except ValueError:
+                replies.append({'ok': False, 'error': 'respuesta no válida'})
+    sock.disconnectFromServer()
+    while len(replies) < len(commands):
+        replies.append({'ok': False, 'error': 'sin respuesta'})
+    return replies
+
+
+class CommandServer(QObject):
+    """Servidor de comandos de la instancia principal; `handler(cmd) -> dict` los atiende."""
+
+    def __init__(self, handler: Callable[[dict], dict], name: Optional[str] = None, parent=None):
+        super().__init__(parent)
+        self.handler = handler
+        self.name = name or server_name()
+        self._server = QLocalServer(self)
+        self._server.setSocketOptions(QLocalServer.UserAccessOption)
+        self._server.newConnection.connect(self._on_new_connection)
+        self._clients = set()
+
+    def listen(self) -> bool:
+        """Empezar a escuchar. Si queda un socket huérfano de una instancia caída se elimina.
+
+        Si otra instancia responde en el mismo nombre no se le quita el socket: en Unix, con
+        `UserAccessOption`, `listen()` lo reemplaza sin dar AddressInUseError, así que se
+        comprueba conectando antes de escuchar.
+        """
+        if instance_alive(self.name):
+            logging.getLogger(__name__).warning("Ya hay otra instancia escuchando en %s", self.name)
+            return False
+        if self._server.listen(self.name):
+            return True
+        if self._server.serverError() == QAbstractSocket.AddressInUseError:
+            # nadie responde al conectar: socket huérfano de una instancia caída
+            QLocalServer.removeServer(self.name)
+            if self._server.listen(self.name):
+                return True
+        logging.getLogger(__name__).warning("No se pudo escuchar en %s: %s", self.name, self._server.errorString())
+        return False
+
+    def close(self) -> None:
+        self._server.close()
+
+    def _on_new_connection(self):
+        while self._server.hasPendingConnections():
+            sock = self._server.nextPendingConnection()
+            self._clients.add(sock)
+            sock.readyRead.connect(lambda s=sock: self._on_ready_read(s))
+            sock.disconnected.connect(lambda s=sock: self._on_disconnected(s))
+
+    def _on_disconnected(self, sock):
+        self._clients.discard(sock)
+        sock.deleteLater()
+
+    def _on_ready_read(self, sock):
+        while sock.canReadLine():
+            line = bytes(sock.readLine()).strip()
+            if line:
+                sock.write(json.dumps(self._dispatch(line), ensure_ascii=False).encode('utf-8') + b'\n')
+        if sock.bytesAvailable() > MAX_LINE_BYTES:
+            sock.write(b'{"ok": false, "error": "comando demasiado largo"}\n')
+            sock.disconnectFromServer()
+
+    def _dispatch(self, line: bytes) -> dict:
+        try:
+            cmd = json.loads(line.decode('utf-8'))
+            if not isinstance(cmd, dict) or not isinstance(cmd.get('cmd'), str):
+                raise ValueError('se esperaba {"cmd": ...}')
+        except ValueError as e:
+            return {'ok': False, 'error': f'comando no válido: {e}'}
+        try:
+            reply = self.handler(cmd)
+        except Exception as e:
+            logging.getLogger(__name__).exception('Error atendiendo el comando %s', cmd.get('cmd'))
+            return {'ok': False, 'error': str(e)}
+        return reply if isinstance(reply, dict) else {'ok': True}
+
+
+def commands_from_args(args) -> List[dict]:
+    """Traducir los argumentos de `main.py` (ver `main.build_arg_parser`) a comandos."""
+    commands = []
+    files = [os.path.abspath(f) for f in (args.files or [])]
+    if args.split is not None:
+        if not args.output_dir:
+            raise ValueError('--split necesita --output-dir')
+        if len(files) > 1:
+            raise ValueError('--split admite un solo fichero')
+        cmd = {'cmd': 'split', 'segment_length': args.split, 'output_dir': os.path.abspath(args.output_dir)}
+        if files:
+            cmd['file'] = files[0]
+        commands.append(cmd)
+    elif files:
+        commands.append({'cmd': 'enqueue' if args.enqueue else 'open', 'files': files})
+    for raw in args.cmd or []:
+        try:
+            cmd = json.loads(raw)
+        except ValueError:
+            cmd = None
+        if not isinstance(cmd, dict) or 'cmd' not in cmd:
+            raise ValueError(f'--cmd espera un objeto JSON con "cmd": {raw}')
+        commands.append(cmd)
+    return commands
@@ -0,0 +1,156 @@
+"""Índice de keyframes por fichero, para buscar deprisa al arrastrar la barra de posición.
+
+Una búsqueda exacta obliga al decodificador a empezar en el keyframe anterior y
+decodificar hasta el instante pedido; con GOPs largos (vídeo de cámara, capturas de
+pantalla) son cientos de frames por búsqueda. Buscar justo en un keyframe no decodifica
+nada de más, así que durante un arrastre se busca al keyframe más cercano y sólo al
+soltar se hace la búsqueda exacta (ver scrubber.py).
+
+El índice se obtiene sin decodificar: `ffmpeg -c copy -f framecrc` lista los paquetes del
+primer stream de vídeo con su pts, su duración y sus flags (los que no son keyframe
+llevan `F=0x0`). Se procesa línea a línea, guardando sólo los instantes de los
+keyframes y una muestra de duraciones para estimar la duración de un frame, y se guarda
+en la caché de metadatos (clave `keyframes`), que lo invalida si cambia el fichero. Los
+códecs sólo-intra (todo son keyframes: ProRes, MJPEG, ...) se marcan como tales sin
+guardar la lista: en ellos cualquier búsqueda es ya barata.
+"""
+import bisect
+import logging
+from typing import Callable, Dict, List, Optional
+
+from mediainfo import MediaInfoCache, get_cache
+from runner import run_captured
+
+
+KEYFRAMES_VERSION = 1
+_DURATION_SAMPLES = 512
+
+
+class KeyframeIndex:
+    """Instantes (ms, desde el inicio del stream) de los keyframes de un fichero y duración de frame."""
+
+    def __init__(self, keyframes_ms: List[int], frame_ms: float = 40.0, intra: bool = False):
+        self.keyframes_ms = [] if intra else sorted(keyframes_ms)
+        self.frame_ms = frame_ms if frame_ms and frame_ms > 0 else 40.0
+        self.intra = intra
+
+    def __len__(self) -> int:
+        return len(self.keyframes_ms)
+
+    def before(self, position_ms: int) -> Optional[int]:
+        """Último keyframe en o antes de `position_ms`."""
+        if self.intra:
+            return max(0, position_ms)
+        i = bisect.bisect_right(self.keyframes_ms, position_ms)
+        return self.keyframes_ms[i - 1] if i else None
+
+    def after(self, position_ms: int) -> Optional[int]:
+        """Primer keyframe estrictamente después de `position_ms`."""
+        if self.intra:
+            return position_ms + int(round(self.frame_ms))
+        i = bisect.bisect_right(self.keyframes_ms, position_ms)
+        return self.keyframes_ms[i] if i < len(self.keyframes_ms) else None
+
+    def nearest(self, position_ms: int) -> int:
+        """Keyframe más cercano a `position_ms` (o la propia posición si el índice está vacío)."""
+        if self.intra:
+            return position_ms
+        prev, nxt = self.before(position_ms), self.after(position_ms)
+        if prev is None:
+            return nxt if nxt is not None else position_ms
+        if nxt is None or position_ms - prev <= nxt - position_ms:
+            return prev
+        return nxt
+
+    def to_dict(self) -> Dict:
+        return {'v': KEYFRAMES_VERSION, 'kf': self.keyframes_ms, 'frame_ms': round(self.frame_ms, 3), 'intra': self.intra}
+
+    @classmethod
+    def from_dict(cls, data) -> Optional['KeyframeIndex']:
+        if not isinstance(data, dict) or data.get('v') != KEYFRAMES_VERSION:
+            return None
+        return cls(list(data.get('kf') or []), float(data.get('frame_ms') or 40.0), bool(data.get('intra')))
+
+
+class FramecrcParser:
+    """Parser incremental de la salida de `-f framecrc` (una línea por paquete)."""
+
+    def __init__(self):
+        self.timebase = None
+        self._keyframe_pts: List[int] = []
+        self._min_pts = None
+        self._durations: List[int] = []
+        self._packets = 0
+
+    def feed(self, line: str) -> None:
+        if line.startswith('#'):
+            # `#tb 0: 1/12800`
+            if line.startswith('#tb 0:'):
+                num, _, den = line.split(':', 1)[1].strip().partition('/')
+                try:
+                    self.timebase = int(num) / int(den)
+                except (ValueError, ZeroDivisionError):
+                    pass
+            return
+        fields = [f.strip() for f in line.split(',')]
+        if len(fields) < 6 or fields[0] != '0':
+            return
+        try:
+            pts, duration = int(fields[2]), int(fields[3])
+        except ValueError:
+            return
+        self._packets += 1
+        if self._min_pts is None or pts < self._min_pts:
+            self._min_pts = pts
+        if len(self._durations) < _DURATION_SAMPLES and duration > 0:
+            self._durations.append(duration)
+        # framecrc sólo escribe `F=0x..` cuando los flags no son exactamente KEY, y detrás
+        # puede venir `S=n` con los datos laterales: sin `F=` es keyframe, con él, bit 0
+        flags = next((f for f in fields[6:] if f.startswith('F=')), None)
+        try:
+            key = flags is None or bool(int(flags[2:], 16) & 1)
+        except ValueError:
+            key = False
+        if key:
+            self._keyframe_pts.append(pts)
+
+    def result(self) -> Optional[KeyframeIndex]:
+        if self.timebase is None or self._min_pts is None:
+            return None
+        tb_ms = self.timebase * 1000.0
+        keyframes = sorted({int(round((pts - self._min_pts) * tb_ms)) for pts in self._keyframe_pts})
+        frame_ms = 0.0
+        if self._durations:
+            durations = sorted(self._durations)
+            frame_ms = durations[len(durations) // 2] * tb_ms
+        return KeyframeIndex(keyframes, frame_ms, intra=len(self._keyframe_pts) == self._packets > 1)
+
+
+def probe_keyframes(path: str, ffmpeg_exe: str, should_stop: Optional[Callable[[], bool]] = None) -> Optional[KeyframeIndex]:
+    """Leer los keyframes de `path` con ffmpeg (sin decodificar). None si no tiene vídeo o se canceló."""
+    parser = FramecrcParser()
+    cmd = [ffmpeg_exe, '-hide_banner', '-nostdin', '-i', path, '-map', '0:v:0', '-c', 'copy', '-f', 'framecrc', '-']
+    # stdout se procesa por líneas: no hace falta guardarlo
+    proc = run_captured(cmd, stdout_limit=0, tail_bytes=4096, should_stop=should_stop, stdout_line_cb=parser.feed)
+    if proc.returncode != 0:
+        logging.getLogger(__name__).debug("keyframes: ffmpeg terminó con %s para %s: %s",
+                                          proc.returncode, path, proc.stderr[-500:])
+        return None
+    return parser.result()
+
+
+def get_keyframe_index(path: str, ffmpeg_exe: str, cache: Optional[MediaInfoCache] = None,
+                       should_stop: Optional[Callable[[], bool]] = None) -> Optional[KeyframeIndex]:
+    """Índice de keyframes de `path`, desde la caché de metadatos si sigue siendo válido."""
+    cache = cache or get_cache()
+    info = cache.get(path)
+    index = KeyframeIndex.from_dict(info.get('keyframes')) if info else None
+    if index is not None:
+        return index
+    index = probe_keyframes(path, ffmpeg_exe, should_stop=should_stop)
+    if index is not None:
+        try:
+            cache.update(path, keyframes=index.to_dict())
+        except OSError:
+            pass
+    return index
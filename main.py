@@ -1,9 +1,19 @@
-from PySide6.QtWidgets import QApplication
 import sys
+import json
 import logging
+import argparse
 import os
 
-from player import VideoPlayer
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='main.py', description='PyVideoPlayer')
+    parser.add_argument('files', nargs='*', help='vídeos a abrir (se añaden a la cola y se reproduce el primero)')
+    parser.add_argument('--enqueue', action='store_true', help='añadir los vídeos a la cola sin reproducirlos')
+    parser.add_argument('--split', type=float, metavar='SEGUNDOS', help='cortar el vídeo (o el actual) en partes de SEGUNDOS')
+    parser.add_argument('--output-dir', metavar='DIR', help='carpeta de salida de --split')
+    parser.add_argument('--cmd', action='append', metavar='JSON', help='comando JSON para la instancia en marcha (ver ipc.py); repetible')
+    parser.add_argument('--new-instance', action='store_true', help='abrir otra ventana aunque ya haya una instancia')
+    return parser
 
 
 def main(argv=None):
@@ -16,9 +26,51 @@ def main(argv=None):
         # marcar variable global para compatibilidad con splitter
         globals()['__split_debug'] = True
 
-    app = QApplication(argv)
+    args, _qt_args = build_arg_parser().parse_known_args(argv[1:])
+    import ipc
+    try:
+        commands = ipc.commands_from_args(args)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    # Instancia única: si ya hay un reproductor en marcha, entregarle los argumentos y salir
+    # (sin importar QtWidgets/QtMultimedia ni construir la ventana). El cerrojo de arranque
+    # se mantiene hasta que este proceso escucha, así los lanzamientos simultáneos esperan
+    # y acaban entregando sus argumentos a la primera instancia.
+    single_instance = ipc.single_instance_enabled() and not args.new_instance
+    lock = None
+    if single_instance:
+        lock = ipc.startup_lock()
+        replies = ipc.send_commands(commands or [{'cmd': 'raise'}])
+        if replies is not None:
+            if lock is not None:
+                lock.unlock()
+            if args.cmd:
+                for reply in replies:
+                    print(json.dumps(reply, ensure_ascii=False))
+            return 0 if all(r.get('ok') for r in replies) else 1
+    if args.cmd and not (args.files or args.split is not None):
+        if lock is not None:
+            lock.unlock()
+        print("Error: no hay ninguna instancia del reproductor en marcha.", file=sys.stderr)
+        return 1
+
+    from PySide6.QtWidgets import QApplication
+    from player import VideoPlayer
+
+    app = QApplication(argv[:1] + _qt_args)
     player = VideoPlayer()
     player.show()
+    if single_instance:
+        player.ipc_server = ipc.CommandServer(player.handle_ipc_command, parent=player)
+        player.ipc_server.listen()
+    if lock is not None:
+        lock.unlock()
+    for cmd in commands:
+        reply = player.handle_ipc_command(cmd)
+        if not reply.get('ok'):
+            logging.getLogger(__name__).warning("Comando %s: %s", cmd.get('cmd'), reply.get('error'))
     return app.exec()
 
 
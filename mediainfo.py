@@ -0,0 +1,312 @@
+"""Caché persistente de metadatos de medios (duración, etc.).
+
+Los metadatos se guardan en SQLite indexados por ruta y se invalidan cuando cambia
+el tamaño o la fecha de modificación del fichero. Así la lista de reproducción no
+tiene que volver a lanzar ffprobe por cada entrada en cada reconstrucción.
+
+`get_stream_info` añade un sondeo completo de los streams (códec, resolución, SAR,
+timebase, audio, bitrate total) con ffprobe o, si no existe, parseando la salida de
+`ffmpeg -i`; el resultado se guarda en la misma caché bajo la clave `streams`.
+"""
+import os
+import re
+import json
+import shutil
+import sqlite3
+import threading
+import logging
+from typing import Any, Dict, Optional
+
+from runner import run_captured, run_captured_async
+
+
+CACHE_FILENAME = '.pyvideoplayer_cache.sqlite'
+
+
+def default_cache_path() -> str:
+    """Ruta por defecto de la caché de metadatos (en el directorio del usuario)."""
+    return os.path.join(os.path.expanduser('~'), CACHE_FILENAME)
+
+
+class MediaInfoCache:
+    """Caché de metadatos `ruta -> dict`, validada por tamaño y mtime.
+
+    Mantiene una copia en memoria de lo leído/escrito para que las consultas repetidas
+    (por ejemplo al redibujar la lista) no toquen disco. Es segura entre hilos: cada
+    hilo usa su propia conexión SQLite.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or default_cache_path()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._memory: Dict[str, tuple] = {}
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS media (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, info TEXT)')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _stat_key(path: str):
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+
+    def _lookup(self, path: str):
+        with self._lock:
+            hit = self._memory.get(path)
+        if hit is not None:
+            return hit
+        try:
+            row = self._conn().execute('SELECT size, mtime_ns, info FROM media WHERE path = ?', (path,)).fetchone()
+        except sqlite3.Error:
+            logging.getLogger(__name__).debug("MediaInfoCache: error leyendo %s", path, exc_info=True)
+            return None
+        if row is None:
+            return None
+        try:
+            entry = (row[0], row[1], json.loads(row[2]))
+        except ValueError:
+            return None
+        with self._lock:
+            self._memory[path] = entry
+        return entry
+
+    def get(self, path: str, validate: bool = True) -> Optional[Dict[str, Any]]:
+        """Devuelve los metadatos de `path` o None si no hay entrada válida.
+
+        Con `validate=False` no se hace `stat` del fichero: útil en la GUI, donde un dato
+        quizá obsoleto es preferible a bloquear; la revalidación se hace en segundo plano.
+        """
+        entry = self._lookup(path)
+        if entry is None:
+            return None
+        if validate:
+            try:
+                if self._stat_key(path) != (entry[0], entry[1]):
+                    return None
+            except OSError:
+                return None
+        return dict(entry[2])
+
+    def update(self, path: str, **fields: Any) -> Dict[str, Any]:
+        """Añade/actualiza campos de `path` y devuelve el dict resultante.
+
+        Si el fichero cambió desde la última escritura se descartan los campos anteriores.
+        """
+        size, mtime_ns = self._stat_key(path)
+        entry = self._lookup(path)
+        info: Dict[str, Any] = {}
+        if entry is not None and (entry[0], entry[1]) == (size, mtime_ns):
+            info = dict(entry[2])
+        info.update(fields)
+        with self._lock:
+            self._memory[path] = (size, mtime_ns, info)
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO media (path, size, mtime_ns, info) VALUES (?, ?, ?, ?)',
+                             (path, size, mtime_ns, json.dumps(info)))
+        except sqlite3.Error:
+            logging.getLogger(__name__).debug("MediaInfoCache: error escribiendo %s", path, exc_info=True)
+        return dict(info)
+
+
+_default_cache: Optional[MediaInfoCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_cache() -> MediaInfoCache:
+    """Devuelve la caché compartida del proceso (creada bajo demanda)."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = MediaInfoCache()
+        return _default_cache
+
+
+def _ffprobe_for(ffmpeg_exe: Optional[str]) -> Optional[str]:
+    """ffprobe junto a `ffmpeg_exe` o en PATH."""
+    if ffmpeg_exe:
+        candidate = os.path.join(os.path.dirname(ffmpeg_exe), 'ffprobe.exe' if os.name == 'nt' else 'ffprobe')
+        if os.path.exists(candidate):
+            return candidate
+    return shutil.which('ffprobe')
+
+
+def _ratio(value: Optional[str]) -> Optional[str]:
+    """Normaliza '1:1', '1/1', '0/1' o 'N/A' a 'a:b' (None si no se conoce)."""
+    if not value:
+        return None
+    m = re.match(r'^\s*(\d+)[:/](\d+)\s*$', str(value))
+    if not m or int(m.group(1)) == 0 or int(m.group(2)) == 0:
+        return None
+    return f"{m.group(1)}:{m.group(2)}"
+
+
+def _parse_ffprobe_json(data: Dict[str, Any]) -> Dict[str, Any]:
+    info: Dict[str, Any] = {'video': None, 'audio': None}
+    try:
+        info['duration'] = float(data.get('format', {}).get('duration'))
+    except (TypeError, ValueError):
+        info['duration'] = None
+    try:
+        info['bitrate'] = int(data.get('format', {}).get('bit_rate'))
+    except (TypeError, ValueError):
+        info['bitrate'] = None
+    for st in data.get('streams', []):
+        kind = st.get('codec_type')
+        if kind == 'video' and info['video'] is None:
+            tb = st.get('time_base') or ''
+            info['video'] = {
+                'codec': st.get('codec_name'),
+                'width': st.get('width'),
+                'height': st.get('height'),
+                'sar': _ratio(st.get('sample_aspect_ratio')) or '1:1',
+                'timebase': int(tb.split('/')[1]) if tb.startswith('1/') else None,
+                'fps': st.get('avg_frame_rate') or st.get('r_frame_rate'),
+                'pix_fmt': st.get('pix_fmt'),
+            }
+        elif kind == 'audio' and info['audio'] is None:
+            info['audio'] = {
+                'codec': st.get('codec_name'),
+                'sample_rate': int(st['sample_rate']) if st.get('sample_rate') else None,
+                'channels': st.get('channels'),
+            }
+    return info
+
+
+def parse_ffmpeg_info(stderr: str) -> Dict[str, Any]:
+    """Extrae duración y el primer stream de vídeo/audio de la salida de `ffmpeg -i`."""
+    info: Dict[str, Any] = {'duration': None, 'video': None, 'audio': None, 'bitrate': None}
+    m = re.search(r'Duration:\s*(\d+):(\d+):(\d+\.?\d*)', stderr)
+    if m:
+        h, mm, ss = m.groups()
+        info['duration'] = int(h) * 3600 + int(mm) * 60 + float(ss)
+    m = re.search(r'Duration:.*?bitrate:\s*(\d+) kb/s', stderr)
+    if m:
+        info['bitrate'] = int(m.group(1)) * 1000
+    for line in stderr.splitlines():
+        if 'Stream #' not in line:
+            continue
+        if info['video'] is None and 'Video:' in line:
+            desc = line.split('Video:', 1)[1]
+            codec = re.match(r'\s*(\w+)', desc)
+            size = re.search(r'[ ,](\d{2,5})x(\d{2,5})', desc)
+            sar = re.search(r'SAR (\d+:\d+)', desc)
+            tbn = re.search(r'([\d.]+)(k?) tbn', desc)
+            fps = re.search(r'([\d.]+) fps', desc)
+            pix = re.search(r'\),\s*(\w+)[(,]', desc) or re.search(r',\s*(yuv\w+|rgb\w+|nv\d+|gray\w*)', desc)
+            timebase = None
+            if tbn:
+                timebase = int(round(float(tbn.group(1)) * (1000 if tbn.group(2) else 1)))
+            info['video'] = {
+                'codec': codec.group(1) if codec else None,
+                'width': int(size.group(1)) if size else None,
+                'height': int(size.group(2)) if size else None,
+                'sar': _ratio(sar.group(1)) if sar else '1:1',
+                'timebase': timebase,
+                'fps': fps.group(1) if fps else None,
+                'pix_fmt': pix.group(1) if pix else None,
+            }
+        elif info['audio'] is None and 'Audio:' in line:
+            desc = line.split('Audio:', 1)[1]
+            codec = re.match(r'\s*(\w+)', desc)
+            rate = re.search(r'(\d+) Hz', desc)
+            layout = re.search(r'Hz,\s*([^,]+)', desc)
+            channels = None
+            if layout:
+                lay = layout.group(1).strip()
+                channels = {'mono': 1, 'stereo': 2}.get(lay)
+                if channels is None:
+                    ch = re.match(r'(\d+)(?:\.(\d+))?', lay)
+                    channels = (int(ch.group(1)) + int(ch.group(2) or 0)) if ch else None
+            info['audio'] = {
+                'codec': codec.group(1) if codec else None,
+                'sample_rate': int(rate.group(1)) if rate else None,
+                'channels': channels,
+            }
+    return info
+
+
+def _probe_commands(path: str, ffmpeg_exe: Optional[str]):
+    """Comandos de sondeo por orden de preferencia: `(cmd, es_ffprobe)`."""
+    ffprobe = _ffprobe_for(ffmpeg_exe)
+    if ffprobe:
+        yield [ffprobe, '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', path], True
+    ffmpeg = ffmpeg_exe or shutil.which('ffmpeg')
+    if not ffmpeg:
+        raise RuntimeError('No se encontró ffprobe ni ffmpeg para analizar el archivo.')
+    yield [ffmpeg, '-hide_banner', '-i', path], False
+
+
+def _parse_probe(path: str, proc, is_ffprobe: bool) -> Optional[Dict[str, Any]]:
+    if is_ffprobe:
+        if proc.returncode != 0:
+            return None
+        try:
+            return _parse_ffprobe_json(json.loads(proc.stdout))
+        except ValueError:
+            logging.getLogger(__name__).debug("ffprobe devolvió JSON no válido para %s", path)
+            return None
+    info = parse_ffmpeg_info(proc.stderr)
+    if info['video'] is None and info['audio'] is None:
+        raise RuntimeError(f"No se pudieron leer los streams de {path}")
+    return info
+
+
+def probe_streams(path: str, ffmpeg_exe: Optional[str] = None) -> Dict[str, Any]:
+    """Sondea `path` (ffprobe JSON o `ffmpeg -i`) y devuelve `{duration, bitrate, video, audio}`.
+
+    Lanza RuntimeError si no hay herramienta disponible o no se reconoce ningún stream.
+    """
+    for cmd, is_ffprobe in _probe_commands(path, ffmpeg_exe):
+        info = _parse_probe(path, run_captured(cmd), is_ffprobe)
+        if info is not None:
+            return info
+    raise RuntimeError(f"No se pudieron leer los streams de {path}")
+
+
+async def probe_streams_async(path: str, ffmpeg_exe: Optional[str] = None) -> Dict[str, Any]:
+    """Versión asyncio de `probe_streams`."""
+    for cmd, is_ffprobe in _probe_commands(path, ffmpeg_exe):
+        info = _parse_probe(path, await run_captured_async(cmd), is_ffprobe)
+        if info is not None:
+            return info
+    raise RuntimeError(f"No se pudieron leer los streams de {path}")
+
+
+def get_stream_info(path: str, ffmpeg_exe: Optional[str] = None,
+                    cache: Optional[MediaInfoCache] = None) -> Dict[str, Any]:
+    """Como `probe_streams`, pero usando/actualizando la caché de metadatos."""
+    cache = cache or get_cache()
+    info = cache.get(path)
+    if info and info.get('streams'):
+        return info['streams']
+    return _store_streams(cache, path, probe_streams(path, ffmpeg_exe))
+
+
+async def get_stream_info_async(path: str, ffmpeg_exe: Optional[str] = None,
+                                cache: Optional[MediaInfoCache] = None) -> Dict[str, Any]:
+    """Versión asyncio de `get_stream_info`."""
+    cache = cache or get_cache()
+    info = cache.get(path)
+    if info and info.get('streams'):
+        return info['streams']
+    return _store_streams(cache, path, await probe_streams_async(path, ffmpeg_exe))
+
+
+def _store_streams(cache: MediaInfoCache, path: str, streams: Dict[str, Any]) -> Dict[str, Any]:
+    fields: Dict[str, Any] = {'streams': streams}
+    if streams.get('duration'):
+        fields['duration'] = streams['duration']
+    try:
+        cache.update(path, **fields)
+    except OSError:
+        pass
+    return streams
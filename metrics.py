@@ -0,0 +1,133 @@
+"""Instrumentación ligera del reproductor: tiempos de eventos con histogramas móviles.
+
+Uso típico:
+
+    metrics = Metrics()
+    with metrics.timer('update_playlist_view'):
+        ...
+    metrics.start('source_to_first_frame')       # al llamar a setSource
+    metrics.stop('source_to_first_frame')        # al recibir el primer frame
+
+Cada métrica guarda las últimas `window` muestras (ms) y expone n, media, p50, p95 y
+máximo. Si se indica `export_path` (o la variable de entorno PYVID_METRICS_FILE), cada
+muestra se añade además como una línea JSON a ese fichero, para seguir regresiones
+de arranque y cortes entre versiones.
+"""
+import os
+import json
+import time
+import threading
+import logging
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+class RollingHistogram:
+    """Últimas `window` muestras de una métrica, con estadísticas bajo demanda."""
+
+    def __init__(self, window: int = 256):
+        self.samples = deque(maxlen=window)
+        self.total_count = 0
+
+    def add(self, value: float) -> None:
+        self.samples.append(value)
+        self.total_count += 1
+
+    def stats(self) -> Dict[str, float]:
+        if not self.samples:
+            return {'n': self.total_count}
+        ordered = sorted(self.samples)
+        n = len(ordered)
+        return {
+            'n': self.total_count,
+            'last': self.samples[-1],
+            'mean': sum(ordered) / n,
+            'p50': ordered[n // 2],
+            'p95': ordered[min(n - 1, int(n * 0.95))],
+            'max': ordered[-1],
+        }
+
+
+class Metrics:
+    """Registro de métricas con histogramas móviles y exportación JSONL opcional."""
+
+    def __init__(self, window: int = 256, export_path: Optional[str] = None):
+        self.window = window
+        self.export_path = export_path if export_path is not None else os.environ.get('PYVID_METRICS_FILE') or None
+        self._hists: Dict[str, RollingHistogram] = {}
+        self._open: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        self._export_file = None
+
+    def record(self, name: str, value_ms: float, **extra) -> None:
+        """Añadir una muestra (ms) a la métrica `name`."""
+        with self._lock:
+            hist = self._hists.get(name)
+            if hist is None:
+                hist = self._hists[name] = RollingHistogram(self.window)
+            hist.add(value_ms)
+            if self.export_path:
+                self._export(name, value_ms, extra)
+
+    def _export(self, name: str, value_ms: float, extra: dict) -> None:
+        try:
+            if self._export_file is None:
+                self._export_file = open(self.export_path, 'a', encoding='utf-8')
+            rec = {'ts': round(time.time(), 3), 'metric': name, 'ms': round(value_ms, 3)}
+            rec.update(extra)
+            self._export_file.write(json.dumps(rec, ensure_ascii=False) + '\n')
+            self._export_file.flush()
+        except Exception:
+            logging.getLogger(__name__).debug("No se pudo exportar la métrica %s", name, exc_info=True)
+            self.export_path = None
+
+    @contextmanager
+    def timer(self, name: str, **extra):
+        """Medir el bloque `with` y registrarlo como `name`."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - t0) * 1000.0, **extra)
+
+    def start(self, name: str, key=None) -> None:
+        """Abrir un intervalo que se cerrará con `stop` (p. ej. entre dos señales de Qt)."""
+        self._open[(name, key)] = time.perf_counter()
+
+    def is_open(self, name: str, key=None) -> bool:
+        return (name, key) in self._open
+
+    def stop(self, name: str, key=None, **extra) -> Optional[float]:
+        """Cerrar el intervalo abierto con `start`; devuelve su duración (ms) o None."""
+        t0 = self._open.pop((name, key), None)
+        if t0 is None:
+            return None
+        elapsed = (time.perf_counter() - t0) * 1000.0
+        self.record(name, elapsed, **extra)
+        return elapsed
+
+    def cancel(self, name: str, key=None) -> None:
+        self._open.pop((name, key), None)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {name: h.stats() for name, h in self._hists.items()}
+
+    def summary_lines(self) -> List[str]:
+        """Líneas de texto legibles (para el overlay o logs)."""
+        lines = []
+        for name, st in sorted(self.snapshot().items()):
+            if 'last' not in st:
+                continue
+            lines.append(f"{name}: last={st['last']:.1f} p50={st['p50']:.1f} p95={st['p95']:.1f} max={st['max']:.1f} ms (n={st['n']})")
+        return lines
+
+    def close(self) -> None:
+        with self._lock:
+            if self._export_file is not None:
+                try:
+                    self._export_file.close()
+                except Exception:
+                    pass
+                self._export_file = None
@@ -1,14 +1,479 @@
-from PySide6.QtCore import Qt, QUrl, QThread, Signal, QObject, QEvent
+from PySide6.QtCore import Qt, QUrl, QThread, Signal, QObject, QEvent, QTimer
 from PySide6.QtWidgets import (
     QWidget, QPushButton, QSlider, QLabel,
-    QHBoxLayout, QVBoxLayout, QFileDialog, QStyle, QInputDialog, QMessageBox, QProgressDialog, QCheckBox, QListWidget, QMenu, QAbstractItemView, QSizePolicy
+    QHBoxLayout, QVBoxLayout, QFileDialog, QStyle, QInputDialog, QMessageBox, QProgressDialog, QCheckBox, QListWidget, QMenu, QAbstractItemView, QSizePolicy,
+    QLineEdit
 )
 from PySide6.QtMultimedia import QMediaPlayer, QAudioOutput
 from PySide6.QtMultimediaWidgets import QVideoWidget
 from PySide6.QtGui import QGuiApplication, QShortcut, QKeySequence
 import os
 import logging
-import random
+import queue
+import asyncio
+import threading
+import time
+
+from session import SessionStore, SessionWriter, find_missing
+from scanner import scan_media
+from mediainfo import get_cache
+from fingerprint import get_fingerprint, FINGERPRINT_VERSION
+from shuffle import ShuffleOrder
+from playlist import Playlist
+from metrics import Metrics
+from proxy import ProxyCache, to_original_ms, to_proxy_ms
+import governor
+import splitcache
+import playlistio
+import profiling
+from searchindex import SearchIndex
+from keyframes import get_keyframe_index
+from scrubber import ScrubController
+from waveform import WaveformStore
+from waveformview import WaveformView
+
+
+class ScanWorker(QObject):
+    """Escanea una carpeta (recursivamente) y emite los vídeos encontrados por lotes."""
+    batch = Signal(list)
+    finished = Signal(int, bool)  # total encontrado, cancelado
+
+    def __init__(self, folder, include=None, exclude=None, recursive=True, sniff=True):
+        super().__init__()
+        self.folder = folder
+        self.include = include
+        self.exclude = exclude
+        self.recursive = recursive
+        self.sniff = sniff
+        self._stop = False
+
+    def stop(self):
+        self._stop = True
+
+    @profiling.profiled('folder_scan')
+    def run(self):
+        total = 0
+        try:
+            for files in scan_media(self.folder, include=self.include, exclude=self.exclude,
+                                    recursive=self.recursive, sniff=self.sniff,
+                                    should_stop=lambda: self._stop):
+                if self._stop:
+                    break
+                total += len(files)
+                self.batch.emit(files)
+        except Exception:
+            logging.getLogger(__name__).exception('Error escaneando %s', self.folder)
+        self.finished.emit(total, self._stop)
+
+
+class PlaylistImportWorker(QObject):
+    """Lee una lista (JSON, JSON Lines, M3U/M3U8) en streaming y emite por lotes las rutas que existen.
+
+    Como mucho `max_pending` lotes esperan a la GUI: el worker se bloquea hasta que ésta
+    confirma cada lote con `ack()`, así la memoria no crece aunque la lista sea enorme.
+    """
+    batch = Signal(list)
+    finished = Signal(int, int, bool, str)  # importadas, no encontradas, cancelado, error
+
+    def __init__(self, path, batch_size=2000, max_pending=2):
+        super().__init__()
+        self.path = path
+        self.batch_size = batch_size
+        self._pending = threading.Semaphore(max_pending)
+        self._stop = False
+
+    def stop(self):
+        self._stop = True
+        self._pending.release()
+
+    def ack(self):
+        self._pending.release()
+
+    @profiling.profiled('playlist_import_read')
+    def run(self):
+        added = missing = 0
+        error = ''
+        try:
+            for entries in playlistio.iter_playlist_batches(self.path, self.batch_size,
+                                                            should_stop=lambda: self._stop):
+                files = [p for p, _dur in entries if os.path.isfile(p)]
+                missing += len(entries) - len(files)
+                if not files:
+                    continue
+                self._pending.acquire()
+                if self._stop:
+                    break
+                added += len(files)
+                self.batch.emit(files)
+        except Exception as e:
+            logging.getLogger(__name__).exception('Error importando %s', self.path)
+            error = str(e)
+        self.finished.emit(added, missing, self._stop, error)
+
+
+class PlaylistExportWorker(QObject):
+    """Escribe la cola en streaming (ver playlistio.write_playlist) con las duraciones de la caché."""
+    finished = Signal(int, str)  # entradas escritas, error
+
+    def __init__(self, path, paths, cache):
+        super().__init__()
+        self.path = path
+        self.paths = paths
+        self.cache = cache
+        self._stop = False
+
+    def stop(self):
+        self._stop = True
+
+    def _duration_of(self, path):
+        info = self.cache.get(path, validate=False)
+        return info.get('duration') if info else None
+
+    def run(self):
+        try:
+            count = playlistio.write_playlist(self.path, self.paths, duration_of=self._duration_of,
+                                              should_stop=lambda: self._stop)
+            self.finished.emit(count, '')
+        except InterruptedError:
+            self.finished.emit(0, 'cancelado')
+        except Exception as e:
+            logging.getLogger(__name__).exception('Error exportando %s', self.path)
+            self.finished.emit(0, str(e))
+
+
+class DurationProbeWorker(QObject):
+    """Sondea duraciones en segundo plano y las guarda en la caché de metadatos.
+
+    Los trabajos se encolan desde el hilo de la GUI con `enqueue` y los resultados se
+    emiten por lotes `[(path, duration_s), ...]` para no saturar el bucle de eventos.
+    """
+    probed = Signal(list)
+
+    def __init__(self, cache):
+        super().__init__()
+        self.cache = cache
+        self._queue = queue.Queue()
+
+    def enqueue(self, paths):
+        for p in paths:
+            self._queue.put(p)
+
+    def stop(self):
+        self._queue.put(None)
+
+    def run(self):
+        import splitter
+        ff = splitter._find_ffmpeg_executable()
+        results = []
+        last_emit = time.monotonic()
+        while True:
+            try:
+                path = self._queue.get(timeout=0.25)
+            except queue.Empty:
+                path = ''
+            if path is None:
+                break
+            if path:
+                dur = None
+                try:
+                    info = self.cache.get(path)
+                    if info and info.get('duration') is not None:
+                        dur = info['duration']
+                    elif ff:
+                        dur = splitter._probe_duration_with_ffprobe(ff, path)
+                        self.cache.update(path, duration=dur)
+                except Exception:
+                    dur = None
+                if dur is not None:
+                    results.append((path, dur))
+            if results and (len(results) >= 100 or time.monotonic() - last_emit > 0.25):
+                self.probed.emit(results)
+                results = []
+                last_emit = time.monotonic()
+        if results:
+            self.probed.emit(results)
+
+
+class FingerprintWorker(QObject):
+    """Calcula huellas de contenido (fingerprint.py) en segundo plano y las guarda en la caché.
+
+    Mismo esquema que DurationProbeWorker: `enqueue` desde la GUI y resultados por lotes
+    `[(path, huella), ...]`.
+    """
+    fingerprinted = Signal(list)
+
+    def __init__(self, cache):
+        super().__init__()
+        self.cache = cache
+        self._queue = queue.Queue()
+
+    def enqueue(self, paths):
+        for p in paths:
+            self._queue.put(p)
+
+    def stop(self):
+        self._queue.put(None)
+
+    def run(self):
+        results = []
+        last_emit = time.monotonic()
+        while True:
+            try:
+                path = self._queue.get(timeout=0.25)
+            except queue.Empty:
+                path = ''
+            if path is None:
+                break
+            if path:
+                try:
+                    results.append((path, get_fingerprint(path, self.cache)))
+                except (OSError, ValueError):
+                    # fichero inexistente, vacío o ilegible: se compara sólo por ruta
+                    pass
+            if results and (len(results) >= 200 or time.monotonic() - last_emit > 0.25):
+                self.fingerprinted.emit(results)
+                results = []
+                last_emit = time.monotonic()
+        if results:
+            self.fingerprinted.emit(results)
+
+
+class KeyframeWorker(QObject):
+    """Obtiene en segundo plano el índice de keyframes del fichero en reproducción (ver keyframes.py).
+
+    Sólo importa el último fichero pedido con `request`: una petición nueva cancela el
+    ffmpeg de la anterior. Emite `indexed(ruta, KeyframeIndex o None)`.
+    """
+    indexed = Signal(str, object)
+
+    def __init__(self, cache):
+        super().__init__()
+        self.cache = cache
+        self._path = None
+        self._cond = threading.Condition()
+        self._stop = False
+
+    def request(self, path):
+        with self._cond:
+            self._path = path
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+
+    def _superseded(self, path):
+        return self._stop or self._path != path
+
+    def run(self):
+        import splitter
+        ff = splitter._find_ffmpeg_executable()
+        while True:
+            with self._cond:
+                while self._path is None and not self._stop:
+                    self._cond.wait()
+                if self._stop:
+                    break
+                path = self._path
+            index = None
+            if ff:
+                try:
+                    index = get_keyframe_index(path, ff, cache=self.cache, should_stop=lambda: self._superseded(path))
+                except Exception:
+                    logging.getLogger(__name__).debug("No se pudo indexar los keyframes de %s", path, exc_info=True)
+            with self._cond:
+                current = self._path == path
+                if current:
+                    self._path = None
+            # si se pidió otro fichero mientras tanto, el bucle sigue con ése
+            if current and not self._stop:
+                self.indexed.emit(path, index)
+
+
+class WaveformWorker(QObject):
+    """Obtiene en segundo plano la forma de onda del fichero en reproducción (ver waveform.py).
+
+    Como KeyframeWorker: sólo importa el último fichero pedido y una petición nueva
+    cancela la decodificación de la anterior. Emite `ready(ruta, Waveform o None)`.
+    """
+    ready = Signal(str, object)
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        self._path = None
+        self._cond = threading.Condition()
+        self._stop = False
+
+    def request(self, path):
+        with self._cond:
+            self._path = path
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+
+    def _superseded(self, path):
+        return self._stop or self._path != path
+
+    def run(self):
+        import splitter
+        ff = splitter._find_ffmpeg_executable()
+        while True:
+            with self._cond:
+                while self._path is None and not self._stop:
+                    self._cond.wait()
+                if self._stop:
+                    break
+                path = self._path
+            waveform = None
+            if ff:
+                try:
+                    waveform = self.store.get(path, ff, should_stop=lambda: self._superseded(path))
+                except Exception:
+                    logging.getLogger(__name__).debug("No se pudo calcular la forma de onda de %s", path, exc_info=True)
+            with self._cond:
+                current = self._path == path
+                if current:
+                    self._path = None
+            if current and not self._stop:
+                self.ready.emit(path, waveform)
+
+
+class ProxyWorker(QObject):
+    """Genera proxies de reproducción en segundo plano, de uno en uno.
+
+    `enqueue(paths, front=True)` adelanta una ruta (p. ej. la pista que se va a reproducir).
+    Emite `ready(original, proxy)` cuando un proxy está disponible.
+    """
+    ready = Signal(str, str)
+
+    def __init__(self, proxies):
+        super().__init__()
+        self.proxies = proxies
+        self._pending = []
+        self._cond = threading.Condition()
+        self._stop = False
+
+    def enqueue(self, paths, front=False):
+        with self._cond:
+            for p in paths:
+                if p in self._pending:
+                    if not front:
+                        continue
+                    self._pending.remove(p)
+                if front:
+                    self._pending.insert(0, p)
+                else:
+                    self._pending.append(p)
+            self._cond.notify()
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+
+    def run(self):
+        import splitter
+        ff = splitter._find_ffmpeg_executable()
+        while True:
+            with self._cond:
+                while not self._pending and not self._stop:
+                    self._cond.wait()
+                if self._stop:
+                    break
+                path = self._pending.pop(0)
+            if not ff:
+                continue
+            try:
+                proxy = self.proxies.ensure(path, ff, should_stop=lambda: self._stop)
+            except Exception:
+                logging.getLogger(__name__).debug("No se pudo generar el proxy de %s", path, exc_info=True)
+                proxy = None
+            if proxy:
+                self.ready.emit(path, proxy)
+
+
+class SplitWorker(QObject):
+    """Ejecuta una operación del splitter (split_video_async, extract_ranges_async, ...) en un QThread.
+
+    Las corrutinas corren en un bucle asyncio propio del hilo; `cancel()` (llamable desde
+    el hilo de la GUI) cancela la tarea y mata los ffmpeg en marcha. Las funciones
+    síncronas se llaman tal cual. Emite `finished(outputs, error_str)` (`error_str` vacío
+    si todo fue bien, `CANCELLED` si se canceló) y `progress(hechos, total)` si la
+    operación acepta `progress_cb`.
+    """
+    CANCELLED = 'cancelled'
+
+    finished = Signal(list, str)
+    progress = Signal(int, int)
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self._loop = None
+        self._task = None
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+        loop, task = self._loop, self._task
+        if loop is not None and task is not None:
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass  # el bucle ya terminó
+
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.ensure_future(self.fn(*self.args, **self.kwargs))
+        if self._cancelled:
+            self._task.cancel()
+        return await self._task
+
+    def run(self):
+        import inspect
+        try:
+            if 'progress_cb' in inspect.signature(self.fn).parameters:
+                self.kwargs.setdefault('progress_cb', lambda done, total: self.progress.emit(int(done), int(total)))
+        except (TypeError, ValueError):
+            pass
+        try:
+            if inspect.iscoroutinefunction(self.fn):
+                outputs = asyncio.run(self._main())
+            else:
+                outputs = self.fn(*self.args, **self.kwargs)
+            self.finished.emit(list(outputs), "")
+        except asyncio.CancelledError:
+            self.finished.emit([], self.CANCELLED)
+        except Exception as exc:
+            self.finished.emit([], str(exc))
+
+
+class MissingFilesWorker(QObject):
+    """Comprueba en segundo plano qué rutas de la cola no existen."""
+    finished = Signal(list)
+
+    def __init__(self, paths):
+        super().__init__()
+        self.paths = list(paths)
+        self._stop = False
+
+    def stop(self):
+        self._stop = True
+
+    def run(self):
+        try:
+            missing = find_missing(self.paths, should_stop=lambda: self._stop)
+        except Exception:
+            logging.getLogger(__name__).exception('Error comprobando ficheros de la sesión')
+            missing = []
+        self.finished.emit(missing)
 
 
 class VideoPlayer(QWidget):
@@ -24,14 +489,22 @@ class VideoPlayer(QWidget):
         self.resize(900, 640)
 
         # Estado de la cola/reproducción
-        self.playlist = []  # list[str]
-        self.current_index = -1
+        # La cola guarda ids estables por entrada; la pista actual se sigue por id
+        # (current_index se deriva de él, ver la propiedad)
+        self.playlist = Playlist()
+        self.current_id = None
         self.loop = False
         self.shuffle = False
+        # Orden aleatorio (permutación perezosa + historial); claves = ids de la cola
+        self._shuffle_order = ShuffleOrder()
 
         # Guardar ruta del archivo actual
         self.current_file = None
 
+        # Instrumentación (tiempos de arranque, cortes de buffer, deriva, vista de la cola)
+        self.metrics = Metrics()
+        self._drift_ref = None
+
         # Player multimedia
         self.player = QMediaPlayer()
         self.audio_output = QAudioOutput()
@@ -111,6 +584,9 @@ class VideoPlayer(QWidget):
         self.split_btn = QPushButton("Cortar")
         self.split_btn.setEnabled(False)
         self.split_btn.clicked.connect(self.request_split)
+        # Clic derecho: vaciar la caché de cortes (splitcache.py)
+        self.split_btn.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.split_btn.customContextMenuRequested.connect(self.show_split_context_menu)
 
         # Opciones como botones toggle (compactos con iconos)
         # Forzar cortes precisos
@@ -122,6 +598,21 @@ class VideoPlayer(QWidget):
             pass
         self.btn_force_precise.setToolTip('Forzar cortes precisos: recodifica cada segmento para cortes exactos (más lento)')
 
+        # Ajustar cortes a cambios de escena / silencios
+        self.smart_cut_tolerance = 2.0
+        # Perfil de salida del corte (profiles.py); None = sólo las partes
+        self.split_profile = None
+        self.split_profiles = {}
+        # Formato de las partes: 'mp4', 'hls-ts' o 'hls-fmp4'
+        self.split_format = 'mp4'
+        self.btn_smart_cuts = QPushButton()
+        self.btn_smart_cuts.setCheckable(True)
+        try:
+            self.btn_smart_cuts.setIcon(self.style().standardIcon(QStyle.SP_MediaSeekForward))
+        except Exception:
+            pass
+        self.btn_smart_cuts.setToolTip('Cortes inteligentes: mueve cada corte al cambio de escena o silencio más cercano (tolerancia configurable)')
+
         # Activar logs DEBUG
         self.btn_debug_logs = QPushButton()
         self.btn_debug_logs.setCheckable(True)
@@ -161,12 +652,22 @@ class VideoPlayer(QWidget):
             except Exception:
                 pass
         self.btn_shuffle.setToolTip('Aleatorio')
-        self.btn_shuffle.toggled.connect(lambda s: (setattr(self, 'shuffle', bool(s)), self.save_settings()))
+        self.btn_shuffle.toggled.connect(self._on_shuffle_toggled)
 
-        # Slider de progreso
+        # Slider de progreso: el arrastre pasa por el ScrubController (búsquedas a keyframes
+        # mientras se arrastra, una búsqueda exacta al soltar; ver scrubber.py)
+        self.scrub = ScrubController(self.player, self.seek, parent=self)
         self.position_slider = QSlider(Qt.Horizontal)
         self.position_slider.setRange(0, 0)
-        self.position_slider.sliderMoved.connect(self.seek)
+        self.position_slider.sliderPressed.connect(self.scrub.press)
+        self.position_slider.sliderMoved.connect(self.scrub.move)
+        self.position_slider.sliderReleased.connect(lambda: self.scrub.release(self.position_slider.value()))
+        # Forma de onda bajo el slider (waveform.py); se arrastra igual que el slider
+        self.waveform_view = WaveformView()
+        self.waveform_view.scrub_pressed.connect(self.scrub.press)
+        self.waveform_view.scrub_moved.connect(self.scrub.move)
+        self.waveform_view.scrub_released.connect(self.scrub.release)
+        self.waveform_view.hide()
 
         # Volumen
         self.volume_slider = QSlider(Qt.Horizontal)
@@ -180,7 +681,7 @@ class VideoPlayer(QWidget):
 
         # Lista de reproducción
         self.playlist_widget = QListWidget()
-        self.playlist_widget.setSelectionMode(QListWidget.SingleSelection)
+        self.playlist_widget.setSelectionMode(QListWidget.ExtendedSelection)
         self.playlist_widget.setDragDropMode(QAbstractItemView.InternalMove)
         # Conectar reordenado para sincronizar la lista interna
         try:
@@ -190,6 +691,30 @@ class VideoPlayer(QWidget):
         self.playlist_widget.itemDoubleClicked.connect(self.on_playlist_double_click)
         self.playlist_widget.setMinimumWidth(240)
 
+        # Búsqueda en la cola (searchindex.py): filtra la vista mientras se escribe
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText('Buscar (p. ej. viaje dur>10m res>=1080)')
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.setToolTip('Texto en el nombre o la carpeta; name:, dir:, ext:mkv; dur>10m, dur<=1h30m; res>=1080, res=4k.\n'
+                                    'Intro reproduce el primer resultado.')
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(120)
+        self._search_timer.timeout.connect(self._apply_search_filter)
+        # Renumerar las etiquetas tras eliminar filas (agrupado: una pasada por ráfaga)
+        self._renumber_from = None
+        self._renumber_timer = QTimer(self)
+        self._renumber_timer.setSingleShot(True)
+        self._renumber_timer.setInterval(0)
+        self._renumber_timer.timeout.connect(self._renumber_playlist_items)
+        self.search_edit.textChanged.connect(lambda _text: self._search_timer.start())
+        self.search_edit.returnPressed.connect(self._play_first_search_result)
+        self.playlist_panel = QWidget()
+        panel_layout = QVBoxLayout(self.playlist_panel)
+        panel_layout.setContentsMargins(0, 0, 0, 0)
+        panel_layout.addWidget(self.search_edit)
+        panel_layout.addWidget(self.playlist_widget, 1)
+
         # Layouts
         # Botón para mostrar/ocultar lista de reproducción (compacto)
         self.toggle_playlist_btn = QPushButton('▾')
@@ -214,6 +739,7 @@ class VideoPlayer(QWidget):
         control_layout.addWidget(self.split_btn)
         # botones compactos para opciones
         control_layout.addWidget(self.btn_force_precise)
+        control_layout.addWidget(self.btn_smart_cuts)
         control_layout.addWidget(self.btn_debug_logs)
         control_layout.addWidget(self.btn_loop)
         control_layout.addWidget(self.btn_shuffle)
@@ -232,6 +758,7 @@ class VideoPlayer(QWidget):
         def _show_quick_help():
             QMessageBox.information(self, 'Ayuda',
                 'Forzar cortes precisos: recodifica cada parte para cortes exactos (más lento).\n'
+                'Cortes inteligentes: ajusta cada corte al cambio de escena o silencio más cercano.\n'
                 'Activar logs DEBUG: muestra start_ms/end_ms y si se usó copy o recode en la salida.\n'
                 'Bucle: reproduce la cola en bucle. Aleatorio: reproduce en orden aleatorio.')
         self.info_btn.clicked.connect(_show_quick_help)
@@ -261,15 +788,16 @@ class VideoPlayer(QWidget):
         left_layout = QVBoxLayout()
         # Video con stretch para ocupar todo el espacio disponible
         left_layout.addWidget(self.video_widget, 1)
-        # Barra de tiempo encima de la botonera
+        # Barra de tiempo (y forma de onda) encima de la botonera
         left_layout.addLayout(bottom_layout)
+        left_layout.addWidget(self.waveform_view)
         # Botonera en la parte inferior
         left_layout.addLayout(control_layout)
         # Etiqueta de ayuda compacta debajo de la botonera (opcional, no ocupa mucho)
         left_layout.addWidget(self.small_help_label)
 
         main_layout.addLayout(left_layout, 1)
-        main_layout.addWidget(self.playlist_widget)
+        main_layout.addWidget(self.playlist_panel)
 
         self.setLayout(main_layout)
 
@@ -290,58 +818,226 @@ class VideoPlayer(QWidget):
             self._sc_toggle_fs.activated.connect(lambda: self.set_fullscreen(not self.fullscreen_btn.isChecked()))
             self._sc_escape = QShortcut(QKeySequence(Qt.Key_Escape), self)
             self._sc_escape.activated.connect(lambda: self.set_fullscreen(False) if self.fullscreen_btn.isChecked() else None)
+            self._sc_stats = QShortcut(QKeySequence('Ctrl+I'), self)
+            self._sc_stats.activated.connect(lambda: self.set_stats_overlay_visible(not self.stats_overlay.isVisible()))
+            self._sc_search = QShortcut(QKeySequence('Ctrl+F'), self)
+            self._sc_search.activated.connect(self.focus_search)
         except Exception:
             pass
 
+        # Overlay de estadísticas (Ctrl+I) sobre el vídeo
+        self.stats_overlay = QLabel(self.video_widget)
+        self.stats_overlay.setStyleSheet('background-color: rgba(0, 0, 0, 160); color: #e0e0e0; font-family: monospace; font-size: 10px; padding: 4px;')
+        self.stats_overlay.move(8, 8)
+        self.stats_overlay.hide()
+        self._stats_timer = QTimer(self)
+        self._stats_timer.setInterval(500)
+        self._stats_timer.timeout.connect(self._refresh_stats_overlay)
+
         # Conexiones del player
         self.player.positionChanged.connect(self.position_changed)
         self.player.durationChanged.connect(self.duration_changed)
         self.player.playbackStateChanged.connect(self.playback_state_changed)
         self.player.errorOccurred.connect(self.handle_error)
+        self.player.sourceChanged.connect(self._on_source_changed)
+        self._keyframe_thread = None
+        self._keyframe_worker = None
+        self._waveform_thread = None
+        self._waveform_worker = None
         self.player.mediaStatusChanged.connect(self.on_media_status_changed)
+        self.player.bufferProgressChanged.connect(self._on_buffer_progress)
+        try:
+            # primer frame real (si el backend expone el sink); si no, se usa positionChanged
+            self.video_widget.videoSink().videoFrameChanged.connect(self._on_video_frame)
+        except Exception:
+            pass
 
         # Cargar settings guardados (last_dir, loop, shuffle)
+        self.restore_session_enabled = True
+        # Opciones del escaneo de carpetas (globs de inclusión/exclusión, recursivo)
+        self.scan_include = None
+        self.scan_exclude = []
+        self.scan_recursive = True
+        # Proxies de reproducción para medios pesados (umbrales configurables en settings['proxy'])
+        self.proxy_settings = {'enabled': True, 'max_height': 1080, 'max_bitrate_kbps': 20000,
+                               'height': 540, 'cache_mb': 4096}
+        # Prioridad/afinidad/hilos de los ffmpeg hijos (governor.py); vacío = valores por defecto
+        self.governor_settings = {}
+        # Caché de resultados de corte entre ejecuciones (splitcache.py)
+        self.split_cache_settings = {'enabled': True, 'cache_mb': 8192}
+        # Forma de onda bajo la barra de posición (waveform.py)
+        self.waveform_settings = {'enabled': True, 'cache_mb': 256}
+        # Perfilado opcional de acciones (profiling.py); vacío = desactivado
+        self.profiling_settings = {}
         try:
             self._settings_path = os.path.join(os.path.expanduser('~'), '.pyvideoplayer.json')
             self.load_settings()
         except Exception:
             self._settings_path = None
 
+        # Sesión (cola, índice actual y posición) persistida en SQLite.
+        # Los guardados se agrupan con un timer para no escribir en cada cambio y se
+        # escriben en un hilo propio (SessionWriter). Si la cola sólo creció, se guardan
+        # únicamente las entradas nuevas desde `_session_append_from`.
+        self._session_store = SessionStore()
+        self._session_writer = SessionWriter(self._session_store)
+        self._session_queue_dirty = False
+        self._session_append_from = None
+        self._pending_restore_position = None
+        self._missing_paths = set()
+        self._session_save_timer = QTimer(self)
+        self._session_save_timer.setSingleShot(True)
+        self._session_save_timer.setInterval(1500)
+        self._session_save_timer.timeout.connect(self.save_session)
+        # Guardar la posición periódicamente mientras se reproduce
+        self._session_position_timer = QTimer(self)
+        self._session_position_timer.setInterval(5000)
+        self._session_position_timer.timeout.connect(self.save_session)
+
+        # Duraciones: caché persistente + sondeo en segundo plano (nunca en el hilo de la GUI)
+        self._media_cache = get_cache()
+        self._items_by_path = {}
+        self._probe_requested = set()
+        self._probe_thread = None
+        self._probe_worker = None
+        # Huellas de contenido para detectar duplicados con rutas distintas (fingerprint.py)
+        self._fingerprint_requested = set()
+        self._fingerprint_thread = None
+        self._fingerprint_worker = None
+        # Índice de búsqueda por id de entrada y ids ocultos por el filtro actual
+        self._search_index = SearchIndex()
+        self._search_hidden = set()
+        self._scan_worker = None
+        self._import_worker = None
+        self._import_profile = None
+        self._export_worker = None
+        self._proxies = ProxyCache(max_bytes=int(self.proxy_settings.get('cache_mb', 4096)) * 1024 * 1024,
+                                   max_height=int(self.proxy_settings.get('max_height', 1080)),
+                                   max_bitrate=int(self.proxy_settings.get('max_bitrate_kbps', 20000)) * 1000,
+                                   proxy_height=int(self.proxy_settings.get('height', 540)))
+        self._proxy_thread = None
+        self._proxy_worker = None
+        self._playing_proxy = None  # ruta del proxy cargado en el reproductor (None = original)
+
+        if self.restore_session_enabled:
+            self.restore_session()
+
+    @property
+    def current_index(self) -> int:
+        """Posición de la pista actual en la cola (-1 si no hay)."""
+        if self.current_id is None:
+            return -1
+        return self.playlist.index_of(self.current_id)
+
+    @current_index.setter
+    def current_index(self, index: int):
+        if 0 <= index < len(self.playlist):
+            self.current_id = self.playlist.entry_id(index)
+        else:
+            self.current_id = None
+
+    _PLAYLIST_FILTERS = ('Listas (*.json *.jsonl *.ndjson *.m3u *.m3u8);;JSON (*.json);;JSON Lines (*.jsonl);;'
+                         'M3U8 (*.m3u8 *.m3u);;All Files (*)')
+
     def export_playlist_dialog(self):
         if not self.playlist:
             QMessageBox.information(self, 'Exportar cola', 'La cola está vacía.')
             return
-        path, _ = QFileDialog.getSaveFileName(self, 'Exportar cola', os.path.expanduser('~'), 'JSON files (*.json);;All Files (*)')
+        if self._export_worker is not None:
+            QMessageBox.information(self, 'Exportar cola', 'Ya hay una exportación en curso.')
+            return
+        path, selected = QFileDialog.getSaveFileName(self, 'Exportar cola', os.path.expanduser('~'), self._PLAYLIST_FILTERS)
         if not path:
             return
+        if not os.path.splitext(path)[1]:
+            path += '.jsonl' if 'JSON Lines' in selected else '.m3u8' if 'M3U8' in selected else '.json'
+        # La escritura (y la consulta de duraciones para #EXTINF) va en un hilo, sobre una copia de las rutas
+        self._export_path = path
+        self._export_progress = QProgressDialog('Exportando cola...', 'Cancelar', 0, 0, self)
+        self._export_progress.setWindowModality(Qt.NonModal)
+        self._export_progress.setMinimumDuration(500)
+        self._export_thread = QThread()
+        self._export_worker = PlaylistExportWorker(path, list(self.playlist), self._media_cache)
+        self._export_worker.moveToThread(self._export_thread)
+        self._export_progress.canceled.connect(lambda w=self._export_worker: w.stop())
+        self._export_thread.started.connect(self._export_worker.run)
+        self._export_worker.finished.connect(self._on_export_finished)
+        self._export_worker.finished.connect(self._export_thread.quit)
+        self._export_worker.finished.connect(self._export_worker.deleteLater)
+        self._export_thread.finished.connect(self._export_thread.deleteLater)
+        self._export_thread.start()
+
+    def _on_export_finished(self, count, error):
+        self._export_worker = None
         try:
-            import json
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(self.playlist, f, ensure_ascii=False, indent=2)
-            QMessageBox.information(self, 'Exportar cola', f'Cola exportada a: {path}')
-        except Exception as e:
-            QMessageBox.critical(self, 'Error', f'No se pudo exportar la cola: {e}')
+            self._export_progress.close()
+        except Exception:
+            pass
+        if error == 'cancelado':
+            return
+        if error:
+            QMessageBox.critical(self, 'Error', f'No se pudo exportar la cola: {error}')
+        else:
+            QMessageBox.information(self, 'Exportar cola', f'Cola exportada a: {self._export_path} ({count} entradas)')
 
     def import_playlist_dialog(self):
-        path, _ = QFileDialog.getOpenFileName(self, 'Importar cola', os.path.expanduser('~'), 'JSON files (*.json);;All Files (*)')
+        path, _ = QFileDialog.getOpenFileName(self, 'Importar cola', os.path.expanduser('~'), self._PLAYLIST_FILTERS)
         if not path:
             return
+        if self._import_worker is not None:
+            QMessageBox.information(self, 'Importar cola', 'Ya hay una importación en curso.')
+            return
+        # Lectura, parseo y comprobación de rutas en un hilo; la cola se alimenta por lotes
+        self._import_progress = QProgressDialog('Importando cola...', 'Cancelar', 0, 0, self)
+        self._import_progress.setWindowModality(Qt.NonModal)
+        self._import_progress.setMinimumDuration(500)
+        self._import_found = 0
+        # perfil (si está activado) del lado de la GUI: desde aquí hasta _on_import_finished
+        self._import_profile = profiling.start('playlist_import')
+        self._import_thread = QThread()
+        self._import_worker = PlaylistImportWorker(path)
+        self._import_worker.moveToThread(self._import_thread)
+        # stop() directamente desde la GUI: el hilo del worker no atiende eventos mientras lee
+        self._import_progress.canceled.connect(lambda w=self._import_worker: w.stop())
+        self._import_thread.started.connect(self._import_worker.run)
+        self._import_worker.batch.connect(self._on_import_batch)
+        self._import_worker.finished.connect(self._on_import_finished)
+        self._import_worker.finished.connect(self._import_thread.quit)
+        self._import_worker.finished.connect(self._import_worker.deleteLater)
+        self._import_thread.finished.connect(self._import_thread.deleteLater)
+        self._import_thread.start()
+
+    def _on_import_batch(self, files):
+        self._import_found += len(files)
         try:
-            import json
-            with open(path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            if isinstance(data, list):
-                # filtrar rutas existentes
-                files = [p for p in data if os.path.isfile(p)]
-                if files:
-                    self.add_to_queue(files)
-                    QMessageBox.information(self, 'Importar cola', f'Se importaron {len(files)} entradas')
-                else:
-                    QMessageBox.information(self, 'Importar cola', 'No se encontraron archivos válidos en el JSON')
-            else:
-                QMessageBox.critical(self, 'Importar cola', 'Formato de archivo no válido')
-        except Exception as e:
-            QMessageBox.critical(self, 'Error', f'No se pudo importar la cola: {e}')
+            self._import_progress.setLabelText(f'Importando cola... {self._import_found} entradas')
+        except Exception:
+            pass
+        self.add_to_queue(files)
+        worker = self._import_worker
+        if worker is not None:
+            worker.ack()
+
+    def _on_import_finished(self, added, missing, cancelled, error):
+        self._import_worker = None
+        profiling.stop(self._import_profile)
+        self._import_profile = None
+        # la cola no se guardó durante la importación: guardarla ahora (sólo lo añadido)
+        self._mark_session_dirty(queue_changed=False)
+        try:
+            self._import_progress.close()
+        except Exception:
+            pass
+        if error:
+            QMessageBox.critical(self, 'Error', f'No se pudo importar la cola: {error}'
+                                 + (f'\n\nSe importaron {added} entradas antes del error.' if added else ''))
+        elif cancelled:
+            logging.getLogger(__name__).debug('Importación cancelada tras %d entradas', added)
+        elif added:
+            extra = f' ({missing} no encontradas)' if missing else ''
+            QMessageBox.information(self, 'Importar cola', f'Se importaron {added} entradas{extra}')
+        else:
+            QMessageBox.information(self, 'Importar cola', 'No se encontraron archivos válidos en la lista')
 
     def save_settings(self):
         try:
@@ -353,9 +1049,37 @@ class VideoPlayer(QWidget):
                  'shuffle': bool(self.shuffle),
                  'force_precise': bool(getattr(self, 'btn_force_precise', False) and getattr(self, 'btn_force_precise').isChecked()),
                  'debug_logs': bool(getattr(self, 'btn_debug_logs', False) and getattr(self, 'btn_debug_logs').isChecked()),
-                 'playlist_visible': bool(getattr(self, 'playlist_widget', None) and self.playlist_widget.isVisible())}
-            with open(self._settings_path, 'w', encoding='utf-8') as f:
+                 'smart_cuts': bool(getattr(self, 'btn_smart_cuts', False) and getattr(self, 'btn_smart_cuts').isChecked()),
+                 'smart_cut_tolerance': float(getattr(self, 'smart_cut_tolerance', 2.0)),
+                 'split_profile': getattr(self, 'split_profile', None),
+                 'split_profiles': dict(getattr(self, 'split_profiles', None) or {}),
+                 'split_format': getattr(self, 'split_format', 'mp4'),
+                 'proxy': dict(getattr(self, 'proxy_settings', None) or {}),
+                 'governor': dict(getattr(self, 'governor_settings', None) or {}),
+                 'split_cache': dict(getattr(self, 'split_cache_settings', None) or {}),
+                 'profiling': dict(getattr(self, 'profiling_settings', None) or {}),
+                 'waveform': dict(getattr(self, 'waveform_settings', None) or {}),
+                 'playlist_visible': bool(getattr(self, 'playlist_widget', None) and self.playlist_widget.isVisible()),
+                 'restore_session': bool(getattr(self, 'restore_session_enabled', True)),
+                 'scan_include': getattr(self, 'scan_include', None),
+                 'scan_exclude': list(getattr(self, 'scan_exclude', None) or []),
+                 'scan_recursive': bool(getattr(self, 'scan_recursive', True)),
+                 'show_stats': bool(getattr(self, 'stats_overlay', None) and self.stats_overlay.isVisible()),
+                 'metrics_file': getattr(self, 'metrics_file', None)}
+            # conservar las claves que no son de la ventana (p. ej. `watch_folders` y `watch`
+            # del vigilante de carpetas): se actualiza el fichero, no se reemplaza
+            try:
+                with open(self._settings_path, 'r', encoding='utf-8') as f:
+                    current = json.load(f)
+            except (OSError, ValueError):
+                current = {}
+            if isinstance(current, dict):
+                current.update(s)
+                s = current
+            tmp = self._settings_path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
                 json.dump(s, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self._settings_path)
         except Exception:
             pass
 
@@ -370,6 +1094,16 @@ class VideoPlayer(QWidget):
                 self.last_dir = s.get('last_dir', os.path.expanduser('~'))
                 self.loop = bool(s.get('loop', False))
                 self.shuffle = bool(s.get('shuffle', False))
+                self.restore_session_enabled = bool(s.get('restore_session', True))
+                self.scan_include = s.get('scan_include') or None
+                self.scan_exclude = list(s.get('scan_exclude') or [])
+                self.scan_recursive = bool(s.get('scan_recursive', True))
+                # Exportación JSONL de métricas: la variable PYVID_METRICS_FILE tiene prioridad
+                self.metrics_file = s.get('metrics_file') or None
+                if self.metrics_file and not self.metrics.export_path:
+                    self.metrics.export_path = self.metrics_file
+                if s.get('show_stats'):
+                    self.set_stats_overlay_visible(True)
                 self.btn_loop.setChecked(self.loop)
                 self.btn_shuffle.setChecked(self.shuffle)
                 # restaurar botones compactos si existen en settings
@@ -378,6 +1112,25 @@ class VideoPlayer(QWidget):
                         self.btn_force_precise.setChecked(bool(s.get('force_precise', False)))
                     if 'debug_logs' in s and hasattr(self, 'btn_debug_logs'):
                         self.btn_debug_logs.setChecked(bool(s.get('debug_logs', False)))
+                    if 'smart_cuts' in s and hasattr(self, 'btn_smart_cuts'):
+                        self.btn_smart_cuts.setChecked(bool(s.get('smart_cuts', False)))
+                    self.smart_cut_tolerance = float(s.get('smart_cut_tolerance', 2.0))
+                    self.split_profile = s.get('split_profile') or None
+                    self.split_profiles = dict(s.get('split_profiles') or {})
+                    self.split_format = s.get('split_format') or 'mp4'
+                    if isinstance(s.get('proxy'), dict):
+                        self.proxy_settings.update(s['proxy'])
+                    if isinstance(s.get('governor'), dict):
+                        self.governor_settings = dict(s['governor'])
+                        governor.configure(self.governor_settings)
+                    if isinstance(s.get('split_cache'), dict):
+                        self.split_cache_settings.update(s['split_cache'])
+                        splitcache.configure(self.split_cache_settings)
+                    if isinstance(s.get('profiling'), dict):
+                        self.profiling_settings = dict(s['profiling'])
+                        profiling.configure(self.profiling_settings)
+                    if isinstance(s.get('waveform'), dict):
+                        self.waveform_settings.update(s['waveform'])
                     if hasattr(self, 'btn_loop'):
                         self.btn_loop.setChecked(self.loop)
                     if hasattr(self, 'btn_shuffle'):
@@ -395,6 +1148,122 @@ class VideoPlayer(QWidget):
         except Exception:
             self.last_dir = os.path.expanduser('~')
 
+    # ----------------- Sesión (cola, índice y posición) -----------------
+    def _mark_session_dirty(self, queue_changed: bool = True, appended_from: int = None):
+        """Programar un guardado de la sesión.
+
+        `queue_changed` indica que hay que reescribir la cola; si el cambio sólo añadió
+        entradas al final, `appended_from` es la posición de la primera nueva y basta con
+        guardar desde ahí.
+        """
+        if queue_changed:
+            if appended_from is not None and not self._session_queue_dirty:
+                if self._session_append_from is None or appended_from < self._session_append_from:
+                    self._session_append_from = appended_from
+            else:
+                self._session_queue_dirty = True
+                self._session_append_from = None
+        try:
+            self._session_save_timer.start()
+        except Exception:
+            pass
+
+    def save_session(self, final: bool = False):
+        """Guardar la cola (sólo si cambió), el índice actual y la posición.
+
+        Las escrituras se hacen en el hilo de SessionWriter. Mientras hay una importación
+        en curso la cola no se guarda (cada lote la cambiaría); se guarda al terminar, o
+        ya si `final` (al cerrar la ventana).
+        """
+        writer = getattr(self, '_session_writer', None)
+        if writer is None or not self.restore_session_enabled:
+            return
+        try:
+            if self._import_worker is None or final:
+                if self._session_queue_dirty:
+                    writer.save_queue(list(self.playlist))
+                elif self._session_append_from is not None:
+                    start = self._session_append_from
+                    writer.append_queue(start, [self.playlist[i] for i in range(start, len(self.playlist))])
+                self._session_queue_dirty = False
+                self._session_append_from = None
+            if self._pending_restore_position is not None:
+                position = self._pending_restore_position
+            else:
+                position = self._original_position() if self.current_file else 0
+            writer.save_state(self.current_index, position)
+        except Exception:
+            logging.getLogger(__name__).exception('No se pudo guardar la sesión')
+
+    def restore_session(self):
+        """Restaurar la última sesión sin comprobar los ficheros.
+
+        La existencia de cada entrada se comprueba después en un hilo (MissingFilesWorker);
+        las que falten se marcan en la lista sin eliminarlas de la cola.
+        """
+        try:
+            paths, index, position = self._session_store.load()
+        except Exception:
+            logging.getLogger(__name__).exception('No se pudo cargar la sesión')
+            return
+        if not paths:
+            return
+        self.playlist = Playlist(paths)
+        self.current_index = index
+        self._shuffle_order.reset(self.playlist.ids(), current=self.current_id)
+        # No sondear duraciones al restaurar: con colas grandes bloquearía el arranque
+        self.update_playlist_view(probe_durations=False)
+        self.play_btn.setEnabled(True)
+        self.stop_btn.setEnabled(True)
+        self.prev_btn.setEnabled(len(self.playlist) > 1)
+        self.next_btn.setEnabled(len(self.playlist) > 1)
+        if index >= 0:
+            # Cargar (sin reproducir) y aplicar la posición cuando el medio esté cargado
+            self.current_file = paths[index]
+            self._pending_restore_position = position
+            self._start_source_metrics()
+            self.player.setSource(QUrl.fromLocalFile(self._playback_source(self.current_file)))
+            self.split_btn.setEnabled(True)
+        self._start_missing_validation()
+
+    def _start_missing_validation(self):
+        self._validate_thread = QThread()
+        self._validate_worker = MissingFilesWorker(self.playlist)
+        self._validate_worker.moveToThread(self._validate_thread)
+        self._validate_thread.started.connect(self._validate_worker.run)
+        self._validate_worker.finished.connect(self._on_missing_found)
+        self._validate_worker.finished.connect(self._validate_thread.quit)
+        self._validate_worker.finished.connect(self._validate_worker.deleteLater)
+        self._validate_thread.finished.connect(self._validate_thread.deleteLater)
+        self._validate_thread.start()
+
+    def _on_missing_found(self, missing):
+        self._validate_worker = None
+        if not missing:
+            return
+        self._missing_paths.update(missing)
+        logging.getLogger(__name__).info('Sesión restaurada: %d entradas no encontradas', len(missing))
+        self._apply_missing_marks()
+
+    def _apply_missing_marks(self):
+        """Marcar en la lista (tachado + tooltip) las entradas cuyo fichero no existe."""
+        if not self._missing_paths:
+            return
+        for i in range(self.playlist_widget.count()):
+            it = self.playlist_widget.item(i)
+            if self.playlist.path_of(it.data(Qt.UserRole)) in self._missing_paths:
+                font = it.font()
+                font.setStrikeOut(True)
+                it.setFont(font)
+                it.setToolTip('Fichero no encontrado')
+
+    def _on_shuffle_toggled(self, checked):
+        self.shuffle = bool(checked)
+        if self.shuffle:
+            # ciclo nuevo: la pista actual cuenta como ya reproducida
+            self._shuffle_order.reset(self.playlist.ids(), current=self.current_id)
+        self.save_settings()
+
     def dragEnterEvent(self, event):
         mime = event.mimeData()
         if mime.hasUrls():
@@ -421,6 +1290,19 @@ class VideoPlayer(QWidget):
             self.toggle_play()
             event.accept()
             return
+        # Ctrl+Left/Right: keyframe anterior/siguiente; ',' / '.': frame a frame; L: bucle A–B
+        if key in (Qt.Key_Left, Qt.Key_Right) and event.modifiers() & Qt.ControlModifier:
+            self.scrub.step_keyframe(key == Qt.Key_Right)
+            event.accept()
+            return
+        if key in (Qt.Key_Comma, Qt.Key_Period):
+            self.scrub.step_frames(1 if key == Qt.Key_Period else -1)
+            event.accept()
+            return
+        if key == Qt.Key_L:
+            self.toggle_ab_loop()
+            event.accept()
+            return
         # Right: next
         if key == Qt.Key_Right:
             self.next_track()
@@ -476,35 +1358,59 @@ class VideoPlayer(QWidget):
         menu = QMenu(self)
         play_act = menu.addAction("Reproducir")
         remove_act = menu.addAction("Eliminar")
+        dups = self.playlist.duplicate_ids()
+        dedupe_act = menu.addAction(f"Quitar duplicados ({len(dups)})" if dups else "Quitar duplicados")
+        dedupe_act.setEnabled(bool(dups))
+        ranges_act = menu.addAction("Extraer rangos (EDL/CSV)...")
+        join_act = menu.addAction("Unir seleccionados...")
+        join_act.setEnabled(len(self.playlist_widget.selectedItems()) >= 2)
         clear_act = menu.addAction("Limpiar cola")
         act = menu.exec(self.playlist_widget.mapToGlobal(pos))
         if act == play_act and row >= 0:
             self.play_index(row)
         elif act == remove_act and row >= 0:
-            self.playlist.pop(row)
-            if row == self.current_index:
-                # si se estaba reproduciendo, parar o mover a siguiente
-                if row < len(self.playlist):
-                    self.play_index(row)
-                elif len(self.playlist) > 0:
-                    self.play_index(len(self.playlist)-1)
-                else:
-                    self.player.stop()
-                    self.current_index = -1
-            elif self.current_index > row:
-                self.current_index -= 1
-            self.update_playlist_view()
+            # eliminar la selección si incluye la fila pulsada; si no, sólo esa fila
+            ids = self._selected_entry_ids()
+            clicked = self.playlist.entry_id(row)
+            self.remove_entries(ids if clicked in ids else [clicked])
+        elif act == dedupe_act:
+            self.remove_entries(dups)
+        elif act == ranges_act:
+            self.request_extract_ranges(self.playlist[row] if row >= 0 else None)
+        elif act == join_act:
+            self.request_join(self._selected_entry_ids())
         elif act == clear_act:
             self.clear_playlist()
 
+    def show_split_context_menu(self, pos):
+        menu = QMenu(self)
+        purge_act = menu.addAction("Vaciar caché de cortes")
+        purge_act.setEnabled(splitcache.get_split_cache() is not None)
+        act = menu.exec(self.split_btn.mapToGlobal(pos))
+        if act == purge_act:
+            self.purge_split_cache()
+
+    def purge_split_cache(self):
+        cache = splitcache.get_split_cache()
+        if cache is None:
+            return
+        try:
+            removed = cache.purge()
+        except Exception as e:
+            QMessageBox.critical(self, "Caché de cortes", f"No se pudo vaciar la caché: {e}")
+            return
+        QMessageBox.information(self, "Caché de cortes", f"Se borraron {removed} cortes guardados.")
+
     def open_file(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Abrir vídeo", "", "Video Files (*.mp4 *.mkv *.avi *.mov);;All Files (*)")
         if file_path:
             # Abrir un único archivo y reemplazar la cola
-            self.playlist = [file_path]
+            self.playlist = Playlist([file_path])
             self.current_index = 0
+            self._shuffle_order.reset(self.playlist.ids(), current=self.current_id)
             self.update_playlist_view()
             self.play_index(0)
+            self._mark_session_dirty()
 
     def add_to_queue_dialog(self):
         files, _ = QFileDialog.getOpenFileNames(self, "Añadir archivos a la cola", getattr(self, 'last_dir', os.path.expanduser('~')), "Video Files (*.mp4 *.mkv *.avi *.mov);;All Files (*)")
@@ -516,89 +1422,385 @@ class VideoPlayer(QWidget):
         folder = QFileDialog.getExistingDirectory(self, "Selecciona carpeta", getattr(self, 'last_dir', os.path.expanduser('~')))
         if not folder:
             return
-        # Buscar archivos de vídeo comunes en la carpeta (no recursivo)
-        exts = ('.mp4', '.mkv', '.avi', '.mov')
-        files = [os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(exts)]
-        files.sort()
-        if files:
-            self.last_dir = folder
-            self.add_to_queue(files)
+        if self._scan_worker is not None:
+            QMessageBox.information(self, "Añadir carpeta", "Ya hay un escaneo de carpeta en curso.")
+            return
+        self.last_dir = folder
+        self.save_settings()
+        # Escaneo recursivo en un hilo; los vídeos se van añadiendo a la cola por lotes
+        self._scan_progress = QProgressDialog("Buscando vídeos...", "Cancelar", 0, 0, self)
+        self._scan_progress.setWindowModality(Qt.NonModal)
+        self._scan_progress.setMinimumDuration(500)
+        self._scan_found = 0
+
+        self._scan_thread = QThread()
+        self._scan_worker = ScanWorker(folder, include=self.scan_include, exclude=self.scan_exclude,
+                                       recursive=self.scan_recursive)
+        self._scan_worker.moveToThread(self._scan_thread)
+        self._scan_progress.canceled.connect(self._scan_worker.stop)
+        self._scan_thread.started.connect(self._scan_worker.run)
+        self._scan_worker.batch.connect(self._on_scan_batch)
+        self._scan_worker.finished.connect(self._on_scan_finished)
+        self._scan_worker.finished.connect(self._scan_thread.quit)
+        self._scan_worker.finished.connect(self._scan_worker.deleteLater)
+        self._scan_thread.finished.connect(self._scan_thread.deleteLater)
+        self._scan_thread.start()
+
+    def _on_scan_batch(self, files):
+        self._scan_found += len(files)
+        try:
+            self._scan_progress.setLabelText(f"Buscando vídeos... {self._scan_found} encontrados")
+        except Exception:
+            pass
+        self.add_to_queue(files)
+
+    def _on_scan_finished(self, total, cancelled):
+        self._scan_worker = None
+        try:
+            self._scan_progress.close()
+        except Exception:
+            pass
+        logging.getLogger(__name__).debug("Escaneo de carpeta: %d vídeos (cancelado=%s)", total, cancelled)
+
+    def _selected_entry_ids(self):
+        return [it.data(Qt.UserRole) for it in self.playlist_widget.selectedItems()]
 
     def remove_selected(self):
-        row = self.playlist_widget.currentRow()
-        if row >= 0 and row < len(self.playlist):
-            was_current = (row == self.current_index)
-            removed = self.playlist.pop(row)
-            # ajustar current_index
-            if was_current:
-                # intentar reproducir siguiente lógico
-                if row < len(self.playlist):
-                    self.play_index(row)
-                elif len(self.playlist) > 0:
-                    self.play_index(len(self.playlist)-1)
-                else:
-                    self.player.stop()
-                    self.current_index = -1
-                    self.current_file = None
+        self.remove_entries(self._selected_entry_ids())
+
+    def remove_entries(self, entry_ids):
+        """Eliminar varias entradas de la cola en bloque.
+
+        Si se elimina la pista actual se reproduce la que ocupe su posición (o la última).
+        """
+        current = self.current_index
+        entry_ids = [e for e in dict.fromkeys(entry_ids) if self.playlist.path_of(e) is not None]
+        was_current = self.current_id in set(entry_ids)
+        paths = {e: self.playlist.path_of(e) for e in entry_ids}
+        positions = self.playlist.remove_ids(entry_ids)
+        if not positions:
+            return
+        for eid in entry_ids:
+            self._shuffle_order.remove(eid)
+        self._remove_playlist_items(positions, paths)
+        if was_current:
+            # siguiente lógico: la entrada que ha quedado en la posición de la actual
+            row = current - sum(1 for p in positions if p < current)
+            if row < len(self.playlist):
+                self.play_index(row)
+            elif len(self.playlist) > 0:
+                self.play_index(len(self.playlist) - 1)
             else:
-                if self.current_index > row:
-                    self.current_index -= 1
-            self.update_playlist_view()
+                self.player.stop()
+                self.current_id = None
+                self.current_file = None
+        self.prev_btn.setEnabled(len(self.playlist) > 1)
+        self.next_btn.setEnabled(len(self.playlist) > 1)
+        self._mark_session_dirty()
+
+    def _remove_playlist_items(self, positions, paths):
+        """Quitar de la lista sólo las filas `positions` (anteriores al borrado, ordenadas).
+
+        Sin reconstruir la lista: `takeItem` de mayor a menor fila, y el índice de búsqueda
+        y `_items_by_path` se actualizan por id. La numeración de las filas siguientes se
+        corrige después (`_renumber_playlist_items`).
+        """
+        with self.metrics.timer('remove_playlist_items', rows=len(positions)):
+            self.playlist_widget.setUpdatesEnabled(False)
+            try:
+                for row in reversed(positions):
+                    item = self.playlist_widget.takeItem(row)
+                    if item is None:
+                        continue
+                    eid = item.data(Qt.UserRole)
+                    items = self._items_by_path.get(paths.get(eid))
+                    if items is not None:
+                        try:
+                            items.remove(item)
+                        except ValueError:
+                            pass
+                        if not items:
+                            del self._items_by_path[paths[eid]]
+            finally:
+                self.playlist_widget.setUpdatesEnabled(True)
+            self._search_index.remove(paths)
+            self._search_hidden.difference_update(paths)
+        if self._renumber_from is None or positions[0] < self._renumber_from:
+            self._renumber_from = positions[0]
+        self._renumber_timer.start()
+
+    def _renumber_playlist_items(self):
+        start = self._renumber_from
+        self._renumber_from = None
+        if start is None:
+            return
+        self.playlist_widget.setUpdatesEnabled(False)
+        try:
+            for row in range(start, self.playlist_widget.count()):
+                item = self.playlist_widget.item(row)
+                _num, _sep, label = item.text().partition('. ')
+                item.setText(f"{row + 1:02d}. {label}")
+        finally:
+            self.playlist_widget.setUpdatesEnabled(True)
 
     def clear_playlist(self):
         self.playlist.clear()
-        self.current_index = -1
+        self._shuffle_order.reset([])
+        self.current_id = None
         self.current_file = None
         self.player.stop()
         self.update_playlist_view()
+        self._mark_session_dirty()
 
     def add_to_queue(self, files, play_immediately=False):
         # Añadir archivos a la cola y opcionalmente reproducir el primero añadido
         start_index = len(self.playlist)
-        self.playlist.extend(files)
-        self.update_playlist_view()
+        self._shuffle_order.extend(self.playlist.extend(files))
+        # Añadir sólo los items nuevos (sin reconstruir la lista ni sondear en este hilo)
+        self._append_playlist_items(start_index)
         # Habilitar controles relacionados
         self.prev_btn.setEnabled(len(self.playlist) > 1)
         self.next_btn.setEnabled(len(self.playlist) > 1)
         self.play_btn.setEnabled(True)
         self.stop_btn.setEnabled(True)
+        self._mark_session_dirty(appended_from=start_index)
 
         if play_immediately:
             self.current_index = start_index
             self.play_index(self.current_index)
 
-    def update_playlist_view(self):
-        self.playlist_widget.clear()
-        for i, p in enumerate(self.playlist, start=1):
-            name = os.path.basename(p)
-            # intentar obtener duración
-            dur_s = self._probe_duration_safe(p)
-            dur_str = ''
-            if dur_s is not None:
-                s = int(round(dur_s))
-                m, s = divmod(s, 60)
-                dur_str = f" ({m:02d}:{s:02d})"
-            from PySide6.QtWidgets import QListWidgetItem
-            item = QListWidgetItem(f"{i:02d}. {name}{dur_str}")
-            # Almacenar la ruta real en UserRole para reconstrucciones seguras al reordenar
-            item.setData(Qt.UserRole, p)
-            self.playlist_widget.addItem(item)
-        # seleccionar el item actual
-        if 0 <= self.current_index < self.playlist_widget.count():
-            self.playlist_widget.setCurrentRow(self.current_index)
+    @profiling.profiled('update_playlist_view')
+    def update_playlist_view(self, probe_durations: bool = True):
+        with self.metrics.timer('update_playlist_view', rows=len(self.playlist)):
+            self.playlist_widget.clear()
+            self._items_by_path = {}
+            self._search_hidden = set()
+            self._search_index.retain(self.playlist.ids())
+            self._append_playlist_items(0, probe_durations=probe_durations)
+            # seleccionar el item actual
+            if 0 <= self.current_index < self.playlist_widget.count():
+                self.playlist_widget.setCurrentRow(self.current_index)
+            self._apply_missing_marks()
+
+    @staticmethod
+    def _format_duration_suffix(dur_s):
+        if dur_s is None:
+            return ''
+        s = int(round(dur_s))
+        m, s = divmod(s, 60)
+        return f" ({m:02d}:{s:02d})"
+
+    def _append_playlist_items(self, start_index: int, probe_durations: bool = True):
+        """Crear los items de la lista para `self.playlist[start_index:]`.
+
+        Las duraciones se toman de la caché de metadatos; las que falten se piden al
+        DurationProbeWorker (si `probe_durations`) y se rellenan cuando llegan.
+        """
+        from PySide6.QtWidgets import QListWidgetItem
+        to_probe = []
+        to_fingerprint = []
+        known_fps = {}
+        t0 = time.perf_counter()
+        self.playlist_widget.setUpdatesEnabled(False)
+        try:
+            for i in range(start_index, len(self.playlist)):
+                eid = self.playlist.entry_id(i)
+                p = self.playlist.path_of(eid)
+                info = self._media_cache.get(p, validate=False)
+                dur_s = info.get('duration') if info else None
+                if eid not in self._search_index:
+                    video = ((info or {}).get('streams') or {}).get('video') or {}
+                    self._search_index.add(eid, p, duration=dur_s, height=video.get('height'))
+                item = QListWidgetItem(f"{i + 1:02d}. {os.path.basename(p)}{self._format_duration_suffix(dur_s)}")
+                # Guardar el id de la entrada en UserRole (estable al reordenar y con rutas repetidas)
+                item.setData(Qt.UserRole, eid)
+                self.playlist_widget.addItem(item)
+                self._items_by_path.setdefault(p, []).append(item)
+                if dur_s is None and p not in self._probe_requested:
+                    to_probe.append(p)
+                fp = info.get('fingerprint') if info else None
+                if fp and fp.startswith(f"v{FINGERPRINT_VERSION}:"):
+                    known_fps[p] = fp
+                elif p not in self._fingerprint_requested:
+                    to_fingerprint.append(p)
+            # con un filtro activo, las filas nuevas que no coinciden nacen ocultas
+            matches = self._search_index.search(self.search_edit.text())
+            if matches is not None:
+                for i in range(start_index, len(self.playlist)):
+                    eid = self.playlist.entry_id(i)
+                    if eid not in matches:
+                        self.playlist_widget.setRowHidden(i, True)
+                        self._search_hidden.add(eid)
+        finally:
+            self.playlist_widget.setUpdatesEnabled(True)
+        self.metrics.record('append_playlist_items', (time.perf_counter() - t0) * 1000.0,
+                            rows=len(self.playlist) - start_index)
+        if probe_durations and to_probe:
+            self._request_duration_probes(to_probe)
+        self.playlist.set_content_keys(known_fps)
+        if probe_durations and to_fingerprint:
+            self._request_fingerprints(to_fingerprint)
+        if probe_durations:
+            self._request_proxies(self.playlist[i] for i in range(start_index, len(self.playlist)))
+
+    def _request_duration_probes(self, paths):
+        if self._probe_worker is None:
+            self._probe_thread = QThread()
+            self._probe_worker = DurationProbeWorker(self._media_cache)
+            self._probe_worker.moveToThread(self._probe_thread)
+            self._probe_thread.started.connect(self._probe_worker.run)
+            self._probe_worker.probed.connect(self._on_durations_probed)
+            self._probe_thread.start()
+        self._probe_requested.update(paths)
+        self._probe_worker.enqueue(paths)
+
+    def _request_fingerprints(self, paths):
+        paths = [p for p in dict.fromkeys(paths) if p not in self._missing_paths]
+        if not paths:
+            return
+        if self._fingerprint_worker is None:
+            self._fingerprint_thread = QThread()
+            self._fingerprint_worker = FingerprintWorker(self._media_cache)
+            self._fingerprint_worker.moveToThread(self._fingerprint_thread)
+            self._fingerprint_thread.started.connect(self._fingerprint_worker.run)
+            self._fingerprint_worker.fingerprinted.connect(self._on_fingerprints)
+            self._fingerprint_thread.start()
+        self._fingerprint_requested.update(paths)
+        self._fingerprint_worker.enqueue(paths)
+
+    def _on_fingerprints(self, results):
+        self.playlist.set_content_keys(dict(results))
+
+    # ----------------- Proxies de reproducción -----------------
+    def _proxies_enabled(self) -> bool:
+        if os.environ.get('PYVID_PROXY', '').lower() in ('0', 'false', 'no'):
+            return False
+        return bool(self.proxy_settings.get('enabled', True))
+
+    def _request_proxies(self, paths, front=False):
+        """Encolar la generación de proxies (sólo se generan si el fichero supera los umbrales)."""
+        if not self._proxies_enabled():
+            return
+        paths = [p for p in dict.fromkeys(paths) if p not in self._missing_paths]
+        if not paths:
+            return
+        if self._proxy_worker is None:
+            self._proxy_thread = QThread()
+            self._proxy_worker = ProxyWorker(self._proxies)
+            self._proxy_worker.moveToThread(self._proxy_thread)
+            self._proxy_thread.started.connect(self._proxy_worker.run)
+            self._proxy_worker.ready.connect(self._on_proxy_ready)
+            self._proxy_thread.start()
+        self._proxy_worker.enqueue(paths, front=front)
+
+    def _playback_source(self, path: str) -> str:
+        """Fichero a reproducir para `path`: su proxy si existe, si no el original."""
+        proxy = self._proxies.lookup(path) if self._proxies_enabled() else None
+        self._playing_proxy = proxy
+        return proxy or path
+
+    def _on_proxy_ready(self, path, proxy):
+        # Si la pista actual se está reproduciendo desde el original, pasar al proxy en la misma posición
+        if path != self.current_file or self._playing_proxy is not None:
+            return
+        was_playing = self.player.playbackState() == QMediaPlayer.PlayingState
+        if self._pending_restore_position is None:
+            self._pending_restore_position = self.player.position()
+        self._playing_proxy = proxy
+        self._start_source_metrics()
+        self.player.setSource(QUrl.fromLocalFile(proxy))
+        if was_playing:
+            self.player.play()
 
+    def _original_duration_ms(self):
+        info = self._media_cache.get(self.current_file, validate=False) if self.current_file else None
+        dur = info.get('duration') if info else None
+        return int(dur * 1000) if dur else None
+
+    def _original_position(self) -> int:
+        """Posición actual expresada en la línea de tiempo del fichero original."""
+        position = self.player.position()
+        if self._playing_proxy:
+            return to_original_ms(position, self.player.duration(), self._original_duration_ms())
+        return position
+
+    def _source_position(self, position_ms: int) -> int:
+        """Posición del original -> posición en el fichero cargado (proxy u original)."""
+        if self._playing_proxy:
+            return to_proxy_ms(position_ms, self.player.duration(), self._original_duration_ms())
+        return position_ms
+
+    def _on_durations_probed(self, results):
+        for path, dur_s in results:
+            self._search_index.set_metadata(path, duration=dur_s)
+            suffix = self._format_duration_suffix(dur_s)
+            for item in self._items_by_path.get(path, ()):
+                try:
+                    item.setText(item.text() + suffix)
+                except RuntimeError:
+                    # item ya destruido (lista reconstruida mientras se sondeaba)
+                    pass
+        if 'dur' in self.search_edit.text():
+            # las duraciones nuevas pueden cambiar el resultado de un filtro dur<...>
+            self._search_timer.start()
+
+    # ----------------- Búsqueda en la cola -----------------
+    def focus_search(self):
+        self.set_playlist_visible(True)
+        self.search_edit.setFocus()
+        self.search_edit.selectAll()
+
+    def _apply_search_filter(self):
+        """Ocultar las filas que no cumplen la búsqueda; sólo se tocan las que cambian."""
+        with self.metrics.timer('playlist_search', rows=len(self.playlist)):
+            matches = self._search_index.search(self.search_edit.text())
+            hidden = self._search_hidden
+            self.playlist_widget.setUpdatesEnabled(False)
+            try:
+                for row, eid in enumerate(self.playlist.ids()):
+                    hide = matches is not None and eid not in matches
+                    if hide != (eid in hidden):
+                        self.playlist_widget.setRowHidden(row, hide)
+                        if hide:
+                            hidden.add(eid)
+                        else:
+                            hidden.discard(eid)
+            finally:
+                self.playlist_widget.setUpdatesEnabled(True)
+
+    def _play_first_search_result(self):
+        self._search_timer.stop()
+        self._apply_search_filter()
+        for row in range(len(self.playlist)):
+            if self.playlist.entry_id(row) not in self._search_hidden:
+                self.play_index(row)
+                return
+
+    @profiling.profiled('play_index')
     def play_index(self, index: int):
         if index < 0 or index >= len(self.playlist):
             return
         path = self.playlist[index]
         self.current_file = path
-        url = QUrl.fromLocalFile(path)
+        # Reproducir el proxy si ya existe; cortar/exportar siguen usando `current_file`
+        url = QUrl.fromLocalFile(self._playback_source(path))
+        self._pending_restore_position = None
+        self._start_source_metrics()
         self.player.setSource(url)
         self.player.play()
+        if self._playing_proxy is None:
+            self._request_proxies([path], front=True)
         self.current_index = index
-        self.update_playlist_view()
+        if self.shuffle:
+            self._shuffle_order.set_current(self.current_id)
+        # Sólo cambia la selección: no hace falta reconstruir (ni volver a sondear) la lista
+        if index < self.playlist_widget.count():
+            self.playlist_widget.setCurrentRow(index)
+        else:
+            self.update_playlist_view()
         self.play_btn.setEnabled(True)
         self.stop_btn.setEnabled(True)
+        self.split_btn.setEnabled(True)
         self.prev_btn.setEnabled(len(self.playlist) > 1)
         self.next_btn.setEnabled(len(self.playlist) > 1)
 
@@ -606,11 +1808,17 @@ class VideoPlayer(QWidget):
         if not self.playlist:
             return
         if self.shuffle:
-            next_idx = random.randrange(len(self.playlist))
-            # evitar repetir la misma pista cuando sea posible
-            if len(self.playlist) > 1:
-                while next_idx == self.current_index:
-                    next_idx = random.randrange(len(self.playlist))
+            # sin repeticiones hasta agotar el ciclo; al acabarlo, nuevo ciclo sólo en bucle
+            next_id = self._shuffle_order.next()
+            if next_id is None:
+                if not self.loop:
+                    self.player.stop()
+                    return
+                self._shuffle_order.new_cycle(avoid=self.current_id)
+                next_id = self._shuffle_order.next()
+                if next_id is None:
+                    return
+            next_idx = self.playlist.index_of(next_id)
         else:
             next_idx = self.current_index + 1
             if next_idx >= len(self.playlist):
@@ -625,6 +1833,14 @@ class VideoPlayer(QWidget):
     def prev_track(self):
         if not self.playlist:
             return
+        if self.shuffle:
+            # volver por el historial aleatorio; al principio del historial, reiniciar la pista actual
+            prev_id = self._shuffle_order.prev()
+            if prev_id is None:
+                self.player.setPosition(0)
+                return
+            self.play_index(self.playlist.index_of(prev_id))
+            return
         prev_idx = self.current_index - 1
         if prev_idx < 0:
             if self.loop:
@@ -661,6 +1877,11 @@ class VideoPlayer(QWidget):
         # Detectar fin de reproducción y saltar a la siguiente pista
         try:
             from PySide6.QtMultimedia import QMediaPlayer as _QMP
+            self._record_media_status_metrics(status)
+            if status == _QMP.MediaStatus.LoadedMedia and self._pending_restore_position:
+                # Sesión restaurada: volver a la posición guardada
+                self.player.setPosition(self._source_position(self._pending_restore_position))
+                self._pending_restore_position = None
             if status == _QMP.MediaStatus.EndOfMedia:
                 # Saltar a siguiente automáticamente
                 self.next_track()
@@ -686,6 +1907,7 @@ class VideoPlayer(QWidget):
 
     def seek(self, position_ms: int):
         # position_slider gives milliseconds
+        self._drift_ref = None
         self.player.setPosition(position_ms)
 
     def set_volume(self, value: int):
@@ -693,14 +1915,89 @@ class VideoPlayer(QWidget):
         self.audio_output.setVolume(max(0.0, min(1.0, value / 100.0)))
 
     def position_changed(self, position: int):
-        # Evitar sobrescribir cuando el usuario está moviendo el slider podría ser una mejora
+        self._record_position_metrics(position)
+        if self.position_slider.isSliderDown():
+            # mientras se arrastra, el slider y la etiqueta siguen al ratón, no al keyframe mostrado
+            self.update_time_label(self.position_slider.value(), self.player.duration())
+            return
         self.position_slider.blockSignals(True)
         self.position_slider.setValue(position)
         self.position_slider.blockSignals(False)
+        self.waveform_view.set_position(position)
         self.update_time_label(position, self.player.duration())
 
+    # ----------------- Instrumentación -----------------
+    def _start_source_metrics(self):
+        """Abrir los intervalos de arranque de un nuevo medio (setSource -> cargado / primer frame)."""
+        self.metrics.cancel('buffer_stall')
+        self.metrics.start('source_to_loaded')
+        self.metrics.start('source_to_first_frame')
+        self._drift_ref = None
+
+    def _record_media_status_metrics(self, status):
+        S = QMediaPlayer.MediaStatus
+        if status == S.LoadedMedia:
+            self.metrics.stop('source_to_loaded')
+        elif status in (S.StalledMedia, S.BufferingMedia):
+            # sólo cuenta como corte si ya se había mostrado imagen (no el buffer inicial)
+            if not self.metrics.is_open('source_to_first_frame') and not self.metrics.is_open('buffer_stall'):
+                self.metrics.start('buffer_stall')
+            self._drift_ref = None
+        elif status in (S.BufferedMedia, S.EndOfMedia, S.InvalidMedia):
+            self.metrics.stop('buffer_stall')
+
+    def _on_buffer_progress(self, progress):
+        if progress >= 1.0:
+            self.metrics.stop('buffer_stall')
+
+    def _on_video_frame(self, frame=None):
+        if self.metrics.is_open('source_to_first_frame'):
+            self.metrics.stop('source_to_first_frame', file=os.path.basename(self.current_file or ''))
+
+    def _record_position_metrics(self, position: int):
+        """Deriva de reproducción: tiempo real transcurrido menos avance de la posición.
+
+        Un valor sostenido > 0 indica que la decodificación no da abasto.
+        """
+        if position > 0 and self.metrics.is_open('source_to_first_frame'):
+            self._on_video_frame()
+        if self.player.playbackState() != QMediaPlayer.PlayingState:
+            self._drift_ref = None
+            return
+        now = time.perf_counter()
+        ref = self._drift_ref
+        self._drift_ref = (now, position)
+        if ref is None:
+            return
+        wall_ms = (now - ref[0]) * 1000.0
+        pos_ms = position - ref[1]
+        # descartar saltos (seek) y avances hacia atrás
+        if pos_ms <= 0 or pos_ms > 5000:
+            return
+        rate = self.player.playbackRate() or 1.0
+        self.metrics.record('playback_drift', wall_ms - pos_ms / rate)
+
+    def set_stats_overlay_visible(self, visible: bool):
+        """Mostrar u ocultar el overlay de estadísticas sobre el vídeo."""
+        if visible:
+            self._refresh_stats_overlay()
+            self.stats_overlay.show()
+            self.stats_overlay.raise_()
+            self._stats_timer.start()
+        else:
+            self.stats_overlay.hide()
+            self._stats_timer.stop()
+
+    def _refresh_stats_overlay(self):
+        lines = self.metrics.summary_lines() or ['(sin métricas todavía)']
+        if self._playing_proxy:
+            lines.insert(0, f"proxy: {os.path.basename(self._playing_proxy)}")
+        self.stats_overlay.setText('\n'.join(lines))
+        self.stats_overlay.adjustSize()
+
     def duration_changed(self, duration: int):
         self.position_slider.setRange(0, duration)
+        self.waveform_view.set_duration(duration)
         self.update_time_label(self.player.position(), duration)
 
     def update_time_label(self, position_ms: int, duration_ms: int):
@@ -716,13 +2013,89 @@ class VideoPlayer(QWidget):
 
         pos_str = ms_to_hhmmss(position_ms)
         dur_str = ms_to_hhmmss(duration_ms)
-        self.time_label.setText(f"{pos_str} / {dur_str}")
+        loop = ''
+        if self.scrub.loop_b is not None:
+            loop = f"  [A–B {ms_to_hhmmss(self.scrub.loop_a)}–{ms_to_hhmmss(self.scrub.loop_b)}]"
+        elif self.scrub.loop_a is not None:
+            loop = f"  [A {ms_to_hhmmss(self.scrub.loop_a)}]"
+        self.time_label.setText(f"{pos_str} / {dur_str}{loop}")
+
+    # ----------------- Keyframes, pasos y bucle A–B (scrubber.py) -----------------
+    def _on_source_changed(self, source):
+        # El índice y el bucle son del fichero que se reproduce (el original o su proxy)
+        self.scrub.set_index(None)
+        self.scrub.clear_loop()
+        path = source.toLocalFile() if source is not None else ''
+        self._request_waveform(self.current_file if path else None)
+        if not path:
+            return
+        if self._keyframe_worker is None:
+            self._keyframe_thread = QThread()
+            self._keyframe_worker = KeyframeWorker(self._media_cache)
+            self._keyframe_worker.moveToThread(self._keyframe_thread)
+            self._keyframe_thread.started.connect(self._keyframe_worker.run)
+            self._keyframe_worker.indexed.connect(self._on_keyframes_indexed)
+            self._keyframe_thread.start()
+        self._keyframe_worker.request(path)
+
+    def _on_keyframes_indexed(self, path, index):
+        if path == self.player.source().toLocalFile():
+            self.scrub.set_index(index)
+            logging.getLogger(__name__).debug("Keyframes de %s: %s", path, len(index) if index else None)
+
+    # ----------------- Forma de onda (waveform.py) -----------------
+    def _waveform_enabled(self) -> bool:
+        if os.environ.get('PYVID_WAVEFORM', '').lower() in ('0', 'false', 'no'):
+            return False
+        return bool(self.waveform_settings.get('enabled', True))
+
+    def _request_waveform(self, path):
+        """Pedir la forma de onda del original `path` (la del proxy sería la misma)."""
+        if not path or not self._waveform_enabled():
+            self.waveform_view.set_waveform(None)
+            self.waveform_view.hide()
+            return
+        view_path = getattr(self.waveform_view.waveform, 'source', None)
+        if view_path == path:
+            # el mismo original (p. ej. al pasar a su proxy): la forma de onda sirve
+            return
+        self.waveform_view.set_waveform(None)
+        if self._waveform_worker is None:
+            try:
+                cache_mb = int(self.waveform_settings.get('cache_mb', 256))
+            except (TypeError, ValueError):
+                cache_mb = 256
+            store = WaveformStore(max_bytes=cache_mb * 1024 * 1024, cache=self._media_cache)
+            self._waveform_thread = QThread()
+            self._waveform_worker = WaveformWorker(store)
+            self._waveform_worker.moveToThread(self._waveform_thread)
+            self._waveform_thread.started.connect(self._waveform_worker.run)
+            self._waveform_worker.ready.connect(self._on_waveform_ready)
+            self._waveform_thread.start()
+        self._waveform_worker.request(path)
+
+    def _on_waveform_ready(self, path, waveform):
+        if path != self.current_file:
+            return
+        self.waveform_view.set_waveform(waveform)
+        self.waveform_view.set_duration(self.player.duration())
+        self.waveform_view.set_position(self.player.position())
+        self.waveform_view.setVisible(waveform is not None)
+
+    def toggle_ab_loop(self):
+        self.scrub.cycle_loop()
+        self.update_time_label(self.player.position(), self.player.duration())
 
     def playback_state_changed(self, state):
+        # Mientras se reproduce, los ffmpeg de fondo (cortes, proxies) bajan de prioridad y de núcleos
+        governor.get_governor().set_playback_active(state == QMediaPlayer.PlayingState)
         if state == QMediaPlayer.PlayingState:
             self.play_btn.setIcon(self.style().standardIcon(QStyle.SP_MediaPause))
+            self._session_position_timer.start()
         else:
             self.play_btn.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay))
+            self._session_position_timer.stop()
+            self._mark_session_dirty(queue_changed=False)
 
     def handle_error(self, error, error_string=None):
         # Mostrar error simple en etiqueta de tiempo
@@ -732,6 +2105,34 @@ class VideoPlayer(QWidget):
             self.time_label.setText(f"Error: {msg}")
 
     def closeEvent(self, event):
+        # Guardar la sesión antes de parar (stop() pone la posición a 0) y esperar a que se escriba
+        self.save_session(final=True)
+        self._session_writer.flush(10)
+        self.metrics.close()
+        # Parar los hilos de fondo (validación de sesión, escaneo, importación/exportación, sondeo de duraciones, huellas, proxies)
+        for worker_attr, thread_attr in (('_validate_worker', '_validate_thread'),
+                                         ('_scan_worker', '_scan_thread'),
+                                         ('_import_worker', '_import_thread'),
+                                         ('_export_worker', '_export_thread'),
+                                         ('_probe_worker', '_probe_thread'),
+                                         ('_fingerprint_worker', '_fingerprint_thread'),
+                                         ('_keyframe_worker', '_keyframe_thread'),
+                                         ('_waveform_worker', '_waveform_thread'),
+                                         ('_proxy_worker', '_proxy_thread')):
+            try:
+                worker = getattr(self, worker_attr, None)
+                if worker is not None:
+                    worker.stop()
+                thread = getattr(self, thread_attr, None)
+                if thread is not None and thread.isRunning():
+                    thread.quit()
+                    thread.wait(2000)
+            except RuntimeError:
+                # objeto Qt ya destruido (deleteLater)
+                pass
+        server = getattr(self, 'ipc_server', None)
+        if server is not None:
+            server.close()
         try:
             self.player.stop()
         except Exception:
@@ -753,43 +2154,165 @@ class VideoPlayer(QWidget):
             QMessageBox.warning(self, "Valor inválido", "La duración debe ser un entero positivo mayor que 0.")
             return
 
-        out_dir = QFileDialog.getExistingDirectory(self, "Selecciona carpeta de salida", os.path.expanduser("~"))
+        out_dir = self._ask_output_dir()
         if not out_dir:
             return
 
-        # Comprobar permisos de escritura en la carpeta seleccionada
+        # Preparar y lanzar worker en QThread
         try:
-            if not os.path.isdir(out_dir):
-                raise RuntimeError("La ruta seleccionada no es un directorio válido.")
-            test_path = os.path.join(out_dir, ".pv_write_test")
-            with open(test_path, "w", encoding="utf-8") as _f:
-                _f.write("ok")
-            os.remove(test_path)
+            self._start_split(self.current_file, out_dir, seg)
         except Exception as e:
-            QMessageBox.critical(self, "Error de permisos", f"No se puede escribir en la carpeta seleccionada:\n{e}")
-            return
+            QMessageBox.critical(self, "Error", f"No se pudo importar el módulo de corte: {e}")
 
-        # Preparar y lanzar worker en QThread
+    def _start_split(self, path, out_dir, seg):
+        """Cortar `path` con las opciones actuales (cortes inteligentes, perfil, formato)."""
+        from splitter import split_video_async
+
+        snap = self.smart_cut_tolerance if self.btn_smart_cuts.isChecked() else None
+        self._start_split_job("Cortando vídeo...", split_video_async, path, out_dir, seg, snap_tolerance=snap,
+                              profile=self.split_profile, extra_profiles=self.split_profiles,
+                              output_format=self.split_format)
+
+    def _split_job_running(self) -> bool:
         try:
-            from splitter import split_video
+            return self._thread is not None and self._thread.isRunning()
+        except (AttributeError, RuntimeError):
+            # sin trabajo aún, o el QThread ya se destruyó (deleteLater)
+            return False
+
+    # ----------------- Control por IPC (instancia única, ver ipc.py) -----------------
+    def handle_ipc_command(self, cmd):
+        """Atender un comando del protocolo de ipc.py; devuelve el dict de respuesta."""
+        name = cmd.get('cmd')
+        if name == 'ping':
+            return {'ok': True, 'pid': os.getpid()}
+        if name == 'status':
+            state = self.player.playbackState()
+            return {'ok': True, 'file': self.current_file, 'index': self.current_index,
+                    'state': {QMediaPlayer.PlayingState: 'playing', QMediaPlayer.PausedState: 'paused'}.get(state, 'stopped'),
+                    'position_ms': self._original_position(), 'duration_ms': self._original_duration_ms(),
+                    'queue_length': len(self.playlist)}
+        if name == 'raise':
+            if self.isMinimized():
+                self.showNormal()
+            self.raise_()
+            self.activateWindow()
+            return {'ok': True}
+        if name in ('open', 'enqueue'):
+            files = [f for f in cmd.get('files') or [] if isinstance(f, str)]
+            found = [f for f in files if os.path.isfile(f)]
+            if found:
+                self.add_to_queue(found, play_immediately=(name == 'open'))
+                if name == 'open':
+                    self.handle_ipc_command({'cmd': 'raise'})
+            missing = [f for f in files if f not in found]
+            reply = {'ok': bool(found) or not files, 'added': len(found)}
+            if missing:
+                reply['missing'] = missing
+                if not found:
+                    reply['error'] = 'no se encontró ningún fichero'
+            return reply
+        if name in ('play', 'pause', 'toggle', 'stop', 'next', 'prev'):
+            if not self.playlist:
+                return {'ok': False, 'error': 'la cola está vacía'}
+            {'play': self.player.play, 'pause': self.player.pause, 'toggle': self.toggle_play, 'stop': self.stop,
+             'next': self.next_track, 'prev': self.prev_track}[name]()
+            return {'ok': True}
+        if name == 'seek':
+            try:
+                position = int(cmd['position_ms'])
+            except (KeyError, TypeError, ValueError):
+                return {'ok': False, 'error': 'seek necesita position_ms'}
+            self.seek(self._source_position(max(0, position)))
+            return {'ok': True}
+        if name == 'split':
+            path = cmd.get('file') or self.current_file
+            out_dir = cmd.get('output_dir')
+            try:
+                seg = float(cmd.get('segment_length'))
+            except (TypeError, ValueError):
+                seg = 0
+            if not path or not os.path.isfile(path):
+                return {'ok': False, 'error': 'no hay vídeo que cortar'}
+            if seg <= 0 or not out_dir:
+                return {'ok': False, 'error': 'split necesita segment_length > 0 y output_dir'}
+            if self._split_job_running():
+                return {'ok': False, 'error': 'ya hay un corte en curso'}
+            os.makedirs(out_dir, exist_ok=True)
+            self._start_split(path, out_dir, seg)
+            return {'ok': True, 'started': True}
+        if name == 'quit':
+            QTimer.singleShot(0, self.close)
+            return {'ok': True}
+        return {'ok': False, 'error': f'comando desconocido: {name}'}
+
+    def request_extract_ranges(self, path=None):
+        """Extraer clips de `path` (o del vídeo actual) según un EDL/CSV de rangos de entrada/salida."""
+        path = path or self.current_file
+        if not path:
+            QMessageBox.warning(self, "Advertencia", "No hay vídeo cargado.")
+            return
+        ranges_file, _ = QFileDialog.getOpenFileName(self, "Lista de rangos (EDL/CSV)", getattr(self, 'last_dir', os.path.expanduser('~')),
+                                                     "Rangos (*.edl *.csv *.txt);;All Files (*)")
+        if not ranges_file:
+            return
+        try:
+            from edl import parse_ranges_file
+            from splitter import extract_ranges_async
+            ranges = parse_ranges_file(ranges_file)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"No se pudo leer la lista de rangos: {e}")
+            return
+        if not ranges:
+            QMessageBox.information(self, "Extraer rangos", "No se encontraron rangos válidos en el fichero.")
+            return
+        out_dir = self._ask_output_dir()
+        if not out_dir:
+            return
+        self._start_split_job(f"Extrayendo {len(ranges)} clips...", extract_ranges_async, path, ranges, out_dir)
+
+    def request_join(self, entry_ids):
+        """Unir en un único fichero las entradas `entry_ids` en el orden de la cola."""
+        ids = set(entry_ids)
+        paths = [self.playlist.path_of(eid) for eid in self.playlist.ids() if eid in ids]
+        if len(paths) < 2:
+            QMessageBox.information(self, "Unir", "Selecciona al menos dos vídeos de la cola.")
+            return
+        default = os.path.join(os.path.dirname(paths[0]), "JOIN.mp4")
+        out_path, _ = QFileDialog.getSaveFileName(self, "Guardar vídeo unido", default, "MP4 (*.mp4);;All Files (*)")
+        if not out_path:
+            return
+        if os.path.abspath(out_path) in {os.path.abspath(p) for p in paths}:
+            QMessageBox.warning(self, "Unir", "El fichero de salida no puede ser una de las partes.")
+            return
+        try:
+            from splitter import join_videos_async
         except Exception as e:
             QMessageBox.critical(self, "Error", f"No se pudo importar el módulo de corte: {e}")
             return
+        self._start_split_job(f"Uniendo {len(paths)} vídeos...", join_videos_async, paths, out_path)
 
-        # Mostrar diálogo de progreso indeterminado
-        self._progress = QProgressDialog("Cortando vídeo...", None, 0, 0, self)
-        self._progress.setWindowModality(Qt.WindowModal)
-        self._progress.setCancelButton(None)
-        self._progress.setMinimumDuration(0)
-        self._progress.show()
+    def _ask_output_dir(self):
+        """Pedir carpeta de salida y comprobar que se puede escribir en ella; None si se cancela o falla."""
+        out_dir = QFileDialog.getExistingDirectory(self, "Selecciona carpeta de salida", os.path.expanduser("~"))
+        if not out_dir:
+            return None
 
-        # Deshabilitar temporalmente el botón de cortar para evitar reentradas
+        # Comprobar permisos de escritura en la carpeta seleccionada
         try:
-            self.split_btn.setEnabled(False)
-        except Exception:
-            pass
+            if not os.path.isdir(out_dir):
+                raise RuntimeError("La ruta seleccionada no es un directorio válido.")
+            test_path = os.path.join(out_dir, ".pv_write_test")
+            with open(test_path, "w", encoding="utf-8") as _f:
+                _f.write("ok")
+            os.remove(test_path)
+        except Exception as e:
+            QMessageBox.critical(self, "Error de permisos", f"No se puede escribir en la carpeta seleccionada:\n{e}")
+            return None
+        return out_dir
 
-        # Aplicar opciones seleccionadas: forzar recodificación precisa y activar logs
+    def _apply_split_options(self):
+        """Aplicar opciones seleccionadas: forzar recodificación precisa y activar logs."""
         try:
             # Forzar cortes precisos mediante variable de entorno que lee splitter
             if self.btn_force_precise.isChecked():
@@ -817,33 +2340,51 @@ class VideoPlayer(QWidget):
             # No abortar si no se pueden aplicar las opciones
             pass
 
-        # Worker usando QThread
-        class SplitWorker(QObject):
-            finished = Signal(list, str)
+    def _start_split_job(self, label, fn, *args, **kwargs):
+        """Lanzar `fn(*args, **kwargs)` (split_video_async, extract_ranges_async, ...) en un
+        QThread con diálogo de progreso cancelable; el resultado llega a `_on_split_finished`."""
+        # Mostrar diálogo de progreso indeterminado
+        self._progress = QProgressDialog(label, "Cancelar", 0, 0, self)
+        self._progress.setWindowModality(Qt.WindowModal)
+        self._progress.setMinimumDuration(0)
+        self._progress.show()
 
-            def __init__(self, in_path, out_dir, seg_len):
-                super().__init__()
-                self.in_path = in_path
-                self.out_dir = out_dir
-                self.seg_len = seg_len
+        # Deshabilitar temporalmente el botón de cortar para evitar reentradas
+        try:
+            self.split_btn.setEnabled(False)
+        except Exception:
+            pass
 
-            def run(self):
-                try:
-                    outputs = split_video(self.in_path, self.out_dir, self.seg_len)
-                    self.finished.emit(outputs, "")
-                except Exception as exc:
-                    self.finished.emit([], str(exc))
+        self._apply_split_options()
 
         self._thread = QThread()
-        self._worker = SplitWorker(self.current_file, out_dir, seg)
+        self._worker = SplitWorker(fn, *args, **kwargs)
         self._worker.moveToThread(self._thread)
         self._thread.started.connect(self._worker.run)
         self._worker.finished.connect(self._on_split_finished)
+        self._worker.progress.connect(self._on_split_progress)
+        self._progress.canceled.connect(self._cancel_split_job)
         self._worker.finished.connect(self._thread.quit)
         self._worker.finished.connect(self._worker.deleteLater)
         self._thread.finished.connect(self._thread.deleteLater)
         self._thread.start()
 
+    def _cancel_split_job(self):
+        # también llega al cerrar el diálogo al terminar: entonces la tarea ya acabó y no hace nada
+        try:
+            self._worker.cancel()
+        except (AttributeError, RuntimeError):
+            pass
+
+    def _on_split_progress(self, done, total):
+        try:
+            if total > 0:
+                if self._progress.maximum() != 1000:
+                    self._progress.setRange(0, 1000)
+                self._progress.setValue(min(1000, int(done * 1000 / total)))
+        except (AttributeError, RuntimeError):
+            pass
+
     def _on_split_finished(self, outputs, error_str):
         # Cerrar progreso
         try:
@@ -857,6 +2398,9 @@ class VideoPlayer(QWidget):
         except Exception:
             pass
 
+        if error_str == SplitWorker.CANCELLED:
+            QMessageBox.information(self, "Cancelado", "La operación se canceló; las partes ya escritas se conservan.")
+            return
         if error_str:
             # Si el error indica falta de moviepy, ofrecer copiar el comando de instalación
             if "moviepy" in error_str.lower():
@@ -905,32 +2449,25 @@ class VideoPlayer(QWidget):
             pass
 
     def on_playlist_reordered(self, parent, start, end, destination, row):
-        # Reconstruir self.playlist leyendo la ruta real desde item.data(Qt.UserRole)
-        new_order = []
-        for i in range(self.playlist_widget.count()):
-            it = self.playlist_widget.item(i)
-            path = it.data(Qt.UserRole)
-            if path:
-                new_order.append(path)
-        # Si la reconstrucción tiene la misma longitud, aceptarla
-        if len(new_order) == self.playlist_widget.count():
-            self.playlist = new_order
-            # actualizar current_index según new order
-            if self.current_file and self.current_file in self.playlist:
-                self.current_index = self.playlist.index(self.current_file)
-            else:
-                self.current_index = -1
+        # El widget ya movió las filas start..end delante de `row`; aplicar el mismo
+        # movimiento a la cola. La pista actual se sigue por id, no hay que buscarla.
+        self.playlist.move_range(start, end - start + 1, row)
         # Guardar settings tras reordenado
         self.save_settings()
+        self._mark_session_dirty()
 
     def _probe_duration_safe(self, path: str):
-        """Intentar obtener la duración del fichero usando splitter/ffprobe; devolver None si no es posible."""
+        """Intentar obtener la duración del fichero usando la caché o splitter/ffprobe; devolver None si no es posible."""
         try:
+            info = self._media_cache.get(path)
+            if info and info.get('duration') is not None:
+                return info['duration']
             import splitter
             ff = splitter._find_ffmpeg_executable()
             if not ff:
                 return None
             dur = splitter._probe_duration_with_ffprobe(ff, path)
+            self._media_cache.update(path, duration=dur)
             return dur
         except Exception:
             return None
@@ -939,7 +2476,7 @@ class VideoPlayer(QWidget):
         """Mostrar u ocultar el widget de la lista de reproducción y ajustar el layout."""
         try:
             if visible:
-                self.playlist_widget.show()
+                self.playlist_panel.show()
                 # actualizar texto del botón
                 try:
                     self.toggle_playlist_btn.setText('▾')
@@ -947,7 +2484,7 @@ class VideoPlayer(QWidget):
                 except Exception:
                     pass
             else:
-                self.playlist_widget.hide()
+                self.playlist_panel.hide()
                 try:
                     self.toggle_playlist_btn.setText('▸')
                     self.toggle_playlist_btn.setChecked(False)
@@ -0,0 +1,192 @@
+"""Cola de reproducción con identificadores estables por entrada.
+
+Cada entrada recibe un id entero único al añadirse, de modo que la misma ruta puede
+aparecer varias veces sin ambigüedad. Se mantiene un índice `id -> posición` que se
+recalcula de forma perezosa sólo a partir de la primera posición modificada: añadir
+al final es O(1), las operaciones en bloque (eliminar varias, mover un rango) hacen
+una única pasada y `index_of` es O(1) amortizado.
+
+Las entradas con la misma huella de contenido (ver fingerprint.py, `set_content_keys`)
+cuentan como duplicadas aunque sus rutas sean distintas.
+
+La clase se comporta como una secuencia de rutas (`len`, iteración, `cola[i]`), así el
+código que sólo necesita las rutas puede seguir tratándola como una lista.
+"""
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+class Playlist:
+    """Secuencia de rutas con ids estables."""
+
+    def __init__(self, paths: Iterable[str] = ()):
+        self._ids: List[int] = []
+        self._paths: Dict[int, str] = {}
+        # ruta -> número de entradas con esa ruta (para `in` en O(1))
+        self._path_counts: Dict[str, int] = {}
+        self._pos: Dict[int, int] = {}
+        # posiciones >= _dirty_from pueden estar desactualizadas en _pos
+        self._dirty_from = 0
+        self._next_id = 1
+        # ruta -> huella de contenido (las rutas sin huella se comparan por ruta)
+        self._content_keys: Dict[str, str] = {}
+        self.extend(paths)
+
+    # --- secuencia de rutas ---
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __bool__(self) -> bool:
+        return bool(self._ids)
+
+    def __iter__(self) -> Iterator[str]:
+        paths = self._paths
+        return (paths[i] for i in self._ids)
+
+    def __getitem__(self, index: int) -> str:
+        return self._paths[self._ids[index]]
+
+    def __contains__(self, path) -> bool:
+        return path in self._path_counts
+
+    # --- ids ---
+    def ids(self) -> List[int]:
+        """Copia de los ids en el orden actual."""
+        return list(self._ids)
+
+    def entry_id(self, index: int) -> int:
+        return self._ids[index]
+
+    def path_of(self, entry_id: int) -> Optional[str]:
+        return self._paths.get(entry_id)
+
+    def _reindex(self) -> None:
+        ids = self._ids
+        pos = self._pos
+        for i in range(self._dirty_from, len(ids)):
+            pos[ids[i]] = i
+        self._dirty_from = len(ids)
+
+    def index_of(self, entry_id) -> int:
+        """Posición actual de `entry_id` o -1 si no está en la cola."""
+        if entry_id not in self._paths:
+            return -1
+        if self._dirty_from < len(self._ids):
+            p = self._pos.get(entry_id)
+            if p is None or p >= self._dirty_from:
+                self._reindex()
+        return self._pos[entry_id]
+
+    def _mark_dirty(self, position: int) -> None:
+        if position < self._dirty_from:
+            self._dirty_from = position
+
+    # --- mutaciones ---
+    def append(self, path: str) -> int:
+        return self.extend([path])[0]
+
+    def extend(self, paths: Iterable[str]) -> List[int]:
+        """Añadir rutas al final; devuelve los ids asignados."""
+        new_ids = []
+        for p in paths:
+            eid = self._next_id
+            self._next_id += 1
+            self._paths[eid] = p
+            self._path_counts[p] = self._path_counts.get(p, 0) + 1
+            if self._dirty_from == len(self._ids):
+                self._pos[eid] = len(self._ids)
+                self._dirty_from += 1
+            self._ids.append(eid)
+            new_ids.append(eid)
+        return new_ids
+
+    def clear(self) -> None:
+        self._ids = []
+        self._paths = {}
+        self._path_counts = {}
+        self._pos = {}
+        self._dirty_from = 0
+
+    def remove_ids(self, entry_ids: Iterable[int]) -> List[int]:
+        """Eliminar varias entradas en una sola pasada.
+
+        Devuelve las posiciones (anteriores a la eliminación) que ocupaban, ordenadas.
+        """
+        doomed = {e for e in entry_ids if e in self._paths}
+        if not doomed:
+            return []
+        positions = sorted(self.index_of(e) for e in doomed)
+        self._ids = [e for e in self._ids if e not in doomed]
+        counts = self._path_counts
+        for e in doomed:
+            p = self._paths.pop(e)
+            if counts[p] > 1:
+                counts[p] -= 1
+            else:
+                del counts[p]
+            self._pos.pop(e, None)
+        self._dirty_from = min(self._dirty_from, positions[0])
+        return positions
+
+    def remove_at(self, positions: Iterable[int]) -> List[int]:
+        """Eliminar las entradas en `positions`; devuelve sus ids."""
+        ids = [self._ids[p] for p in set(positions) if 0 <= p < len(self._ids)]
+        self.remove_ids(ids)
+        return ids
+
+    def pop(self, index: int) -> str:
+        eid = self._ids[index]
+        path = self._paths[eid]
+        self.remove_ids([eid])
+        return path
+
+    def move_range(self, start: int, count: int, dest: int) -> None:
+        """Mover `count` entradas desde `start` para que queden delante de la posición `dest`.
+
+        `dest` se expresa en posiciones anteriores al movimiento (misma convención que la
+        señal `rowsMoved` de Qt).
+        """
+        n = len(self._ids)
+        if count <= 0 or start < 0 or start + count > n or start <= dest <= start + count:
+            return
+        block = self._ids[start:start + count]
+        rest = self._ids[:start] + self._ids[start + count:]
+        insert_at = dest if dest < start else dest - count
+        self._ids = rest[:insert_at] + block + rest[insert_at:]
+        self._mark_dirty(min(start, insert_at))
+
+    def reorder(self, entry_ids: List[int]) -> bool:
+        """Sustituir el orden por `entry_ids` (debe ser una permutación de los ids actuales)."""
+        if len(entry_ids) != len(self._ids) or set(entry_ids) != set(self._ids):
+            return False
+        self._ids = list(entry_ids)
+        self._dirty_from = 0
+        return True
+
+    # --- contenido ---
+    def set_content_keys(self, keys: Dict[str, str]) -> None:
+        """Registrar huellas de contenido `ruta -> huella` (pueden llegar por lotes)."""
+        self._content_keys.update(keys)
+
+    def content_key(self, entry_id: int):
+        """Clave de duplicado de `entry_id`: su huella si se conoce, si no su ruta. O(1)."""
+        p = self._paths[entry_id]
+        fp = self._content_keys.get(p)
+        return ('fp', fp) if fp else ('path', p)
+
+    def duplicate_ids(self) -> List[int]:
+        """Ids de las entradas cuya ruta o contenido ya apareció antes en la cola (se conserva la primera)."""
+        seen = set()
+        dups = []
+        for e in self._ids:
+            key = self.content_key(e)
+            if key in seen:
+                dups.append(e)
+            else:
+                seen.add(key)
+        return dups
+
+    def dedupe(self) -> List[int]:
+        """Eliminar entradas repetidas conservando la primera aparición; devuelve los ids eliminados."""
+        dups = self.duplicate_ids()
+        self.remove_ids(dups)
+        return dups
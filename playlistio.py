@@ -0,0 +1,248 @@
+"""Lectura y escritura en streaming de listas de reproducción (JSON, JSON Lines y M3U/M3U8).
+
+Ni la lectura ni la escritura cargan la lista entera en memoria, así que una lista de un
+millón de entradas se importa y exporta con memoria constante:
+
+- JSON: una lista (`["a.mp4", ...]` o `[{"path": "a.mp4", "duration": 12.5}, ...]`) que se
+  decodifica elemento a elemento con `JSONDecoder.raw_decode` sobre bloques del fichero.
+  Es el formato que ya exportaba el reproductor.
+- JSON Lines (`.jsonl`/`.ndjson`): una entrada por línea, cadena u objeto como en JSON.
+- M3U/M3U8: una ruta o URL `file://` por línea; en M3U extendido, `#EXTINF:segundos,título`
+  precede a la ruta. Al exportar se escribe M3U extendido con las duraciones de la caché
+  de metadatos (`-1` si no se conocen).
+
+Las rutas relativas se resuelven contra la carpeta de la lista. Las entradas se producen
+como `(ruta, duración_s o None)`; comprobar que existen es cosa del llamador (ver
+`PlaylistImportWorker` en player.py, que lo hace por lotes fuera del hilo de la GUI).
+"""
+import os
+import re
+import json
+import logging
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+from urllib.request import url2pathname
+
+
+FORMATS = ('json', 'jsonl', 'm3u')
+CHUNK_CHARS = 64 * 1024
+_SEPARATORS = re.compile(r'[\s,]*')
+
+Entry = Tuple[str, Optional[float]]
+
+
+def detect_format(path: str) -> str:
+    """Formato de la lista según la extensión (`json` si no se reconoce)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if ext in ('.m3u', '.m3u8'):
+        return 'm3u'
+    return 'json'
+
+
+def _resolve(ref: str, base_dir: str) -> Optional[str]:
+    ref = ref.strip()
+    if not ref:
+        return None
+    if ref[0] == '/' and '/.' not in ref and '//' not in ref:
+        # caso habitual (ruta absoluta ya normalizada): sin más llamadas
+        return ref
+    if ref.lower().startswith('file:'):
+        ref = url2pathname(unquote(urlparse(ref).path))
+    elif '://' in ref:
+        # URLs remotas: el reproductor sólo trabaja con ficheros locales
+        return None
+    ref = os.path.expanduser(ref)
+    if not os.path.isabs(ref):
+        ref = os.path.join(base_dir, ref)
+    return os.path.normpath(ref)
+
+
+def _entry_from_json(item, base_dir: str) -> Optional[Entry]:
+    duration = None
+    if isinstance(item, dict):
+        duration = item.get('duration')
+        item = item.get('path')
+    if not isinstance(item, str):
+        return None
+    path = _resolve(item, base_dir)
+    if path is None:
+        return None
+    if duration is not None:
+        duration = float(duration) if isinstance(duration, (int, float)) and duration >= 0 else None
+    return path, duration
+
+
+def _iter_json_array(f) -> Iterator[object]:
+    """Elementos de una lista JSON leída por bloques (sin cargar el documento entero)."""
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+    started = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = f.read(CHUNK_CHARS)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    while True:
+        # saltar espacios (y comas entre elementos)
+        while True:
+            pos = _SEPARATORS.match(buf, pos).end() if started else len(buf) - len(buf[pos:].lstrip())
+            if pos < len(buf) or eof:
+                break
+            fill()
+        if pos >= len(buf):
+            raise ValueError('lista JSON incompleta' if started else 'fichero vacío')
+        if not started:
+            if buf[pos] != '[':
+                raise ValueError('se esperaba una lista JSON')
+            started = True
+            pos += 1
+            continue
+        if buf[pos] == ']':
+            return
+        while True:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+                # un número o literal pegado al final del bloque puede seguir en el siguiente
+                if end < len(buf) or eof or isinstance(item, (str, dict, list)):
+                    break
+            except ValueError:
+                if eof:
+                    raise
+            fill()
+        pos = end
+        yield item
+
+
+def _decode_line(raw: bytes) -> str:
+    try:
+        return raw.decode('utf-8')
+    except UnicodeDecodeError:
+        # M3U "clásico": codificación local, normalmente Latin-1/CP1252
+        return raw.decode('latin-1')
+
+
+def _iter_m3u(path: str, base_dir: str) -> Iterator[Entry]:
+    duration = None
+    with open(path, 'rb') as f:
+        for raw in f:
+            line = _decode_line(raw).lstrip('\ufeff').strip()
+            if not line:
+                continue
+            if line.startswith('#'):
+                if line.upper().startswith('#EXTINF:'):
+                    try:
+                        duration = float(line[8:].split(',', 1)[0].split()[0])
+                    except (ValueError, IndexError):
+                        duration = None
+                continue
+            entry = _resolve(line, base_dir)
+            if entry is not None:
+                yield entry, duration if duration is not None and duration >= 0 else None
+            duration = None
+
+
+def iter_playlist(path: str, fmt: Optional[str] = None) -> Iterator[Entry]:
+    """Recorre las entradas `(ruta, duración_s)` de la lista `path` en streaming."""
+    fmt = fmt or detect_format(path)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    logger = logging.getLogger(__name__)
+    if fmt == 'm3u':
+        yield from _iter_m3u(path, base_dir)
+        return
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        if fmt == 'json':
+            # los .json de una entrada por línea también se aceptan
+            head = f.read(1)
+            while head.isspace():
+                head = f.read(1)
+            f.seek(0)
+            if head == '[':
+                for item in _iter_json_array(f):
+                    entry = _entry_from_json(item, base_dir)
+                    if entry is not None:
+                        yield entry
+                return
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                logger.debug("iter_playlist: línea %d no válida en %s", lineno, path)
+                continue
+            entry = _entry_from_json(item, base_dir)
+            if entry is not None:
+                yield entry
+
+
+def iter_playlist_batches(path: str, batch_size: int = 2000, fmt: Optional[str] = None,
+                          should_stop: Optional[Callable[[], bool]] = None) -> Iterator[List[Entry]]:
+    """Como `iter_playlist`, pero por lotes de como mucho `batch_size` entradas."""
+    batch: List[Entry] = []
+    for entry in iter_playlist(path, fmt):
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+            if should_stop is not None and should_stop():
+                return
+    if batch:
+        yield batch
+
+
+def write_playlist(path: str, paths: Iterable[str], fmt: Optional[str] = None,
+                   duration_of: Optional[Callable[[str], Optional[float]]] = None,
+                   should_stop: Optional[Callable[[], bool]] = None) -> int:
+    """Escribir `paths` en `path` entrada a entrada. Devuelve el número de entradas escritas.
+
+    `duration_of(ruta)` da la duración en segundos (o None) para `#EXTINF` y para el campo
+    `duration` de JSON Lines. Se escribe en un temporal que sustituye al destino al
+    terminar, así una exportación cancelada o fallida no deja el fichero a medias.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt not in FORMATS:
+        raise ValueError(f'formato de lista desconocido: {fmt}')
+    tmp = path + '.pv_tmp'
+    count = 0
+    try:
+        with open(tmp, 'w', encoding='utf-8', newline='\n') as f:
+            if fmt == 'json':
+                f.write('[')
+            elif fmt == 'm3u':
+                f.write('#EXTM3U\n')
+            for p in paths:
+                if should_stop is not None and count % 1000 == 0 and should_stop():
+                    raise InterruptedError('exportación cancelada')
+                duration = duration_of(p) if duration_of is not None else None
+                if fmt == 'json':
+                    # mismo aspecto que json.dump(..., indent=2) de una lista de cadenas
+                    f.write((',\n  ' if count else '\n  ') + json.dumps(p, ensure_ascii=False))
+                elif fmt == 'jsonl':
+                    item = {'path': p}
+                    if duration is not None:
+                        item['duration'] = round(float(duration), 3)
+                    f.write(json.dumps(item, ensure_ascii=False) + '\n')
+                else:
+                    secs = int(round(duration)) if duration is not None else -1
+                    title = os.path.splitext(os.path.basename(p))[0].replace('\n', ' ')
+                    f.write(f'#EXTINF:{secs},{title}\n{p}\n')
+                count += 1
+            if fmt == 'json':
+                f.write('\n]\n' if count else ']\n')
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    return count
@@ -0,0 +1,90 @@
+"""Perfiles de salida del corte: varias salidas a partir de UNA decodificación.
+
+Un perfil es una lista declarativa de salidas (dicts). Todas se alimentan del mismo
+proceso de ffmpeg: el vídeo se decodifica una vez y `filter_complex` lo reparte con
+`split` a un `scale` por salida, y cada rama va a su propio codificador. Así producir
+las partes a calidad completa y un proxy 360p de cada parte cuesta una sola lectura y
+decodificación del original en lugar de dos.
+
+Claves de cada salida:
+
+- `name`: identificador (clave en el manifiesto). La salida `main` son las partes
+  `VID-NNNN.mp4` que devuelve `split_video`.
+- `kind`: `segments` (una parte por segmento, con el muxer `segment`) o `hls` (escalera
+  de variantes HLS de todo el rango cortado, con playlist maestra).
+- `dir`: subcarpeta relativa a la carpeta de salida (opcional).
+- `height`: altura de salida (el ancho mantiene la proporción); sin ella, resolución original.
+- `video` / `audio`: opciones de codificación (`codec`, `crf`, `preset`, `bitrate`, `gop`).
+- `ladder` (sólo `hls`): lista de variantes `{height, bitrate, audio_bitrate}`; `hls_time`.
+
+Los perfiles incluidos están en `OUTPUT_PROFILES`; en `~/.pyvideoplayer.json` se pueden
+añadir otros con la clave `split_profiles` (mismo formato).
+"""
+import copy
+from typing import Dict, List, Optional, Union
+
+
+MAIN_OUTPUT = {
+    'name': 'main', 'kind': 'segments',
+    'video': {'codec': 'libx264', 'preset': 'fast', 'crf': 23},
+    'audio': {'codec': 'aac'},
+}
+
+PROXY_360 = {
+    'name': 'proxy', 'kind': 'segments', 'dir': 'proxy', 'height': 360,
+    'video': {'codec': 'libx264', 'preset': 'veryfast', 'crf': 28, 'gop': 12},
+    'audio': {'codec': 'aac', 'bitrate': '96k'},
+}
+
+HLS_LADDER = {
+    'name': 'hls', 'kind': 'hls', 'dir': 'hls', 'hls_time': 4,
+    'video': {'codec': 'libx264', 'preset': 'veryfast'},
+    'audio': {'codec': 'aac'},
+    'ladder': [
+        {'height': 360, 'bitrate': '800k', 'audio_bitrate': '96k'},
+        {'height': 720, 'bitrate': '2800k', 'audio_bitrate': '128k'},
+    ],
+}
+
+OUTPUT_PROFILES: Dict[str, List[dict]] = {
+    'segments': [MAIN_OUTPUT],
+    'segments+proxy': [MAIN_OUTPUT, PROXY_360],
+    'segments+hls': [MAIN_OUTPUT, HLS_LADDER],
+}
+
+
+def resolve_profile(profile: Union[str, List[dict], None],
+                    extra_profiles: Optional[Dict[str, List[dict]]] = None) -> Optional[List[dict]]:
+    """Devuelve la lista de salidas de `profile` (nombre o lista ya declarada).
+
+    Garantiza que hay exactamente una salida `main` de tipo `segments` (se añade la de
+    por defecto si falta). Lanza ValueError si el nombre no existe o una salida no es válida.
+    """
+    if profile is None:
+        return None
+    if isinstance(profile, str):
+        known = dict(OUTPUT_PROFILES)
+        known.update(extra_profiles or {})
+        if profile not in known:
+            raise ValueError(f"Perfil de salida desconocido: {profile}")
+        outputs = known[profile]
+    else:
+        outputs = profile
+    outputs = copy.deepcopy(list(outputs))
+    names = set()
+    for out in outputs:
+        name = out.get('name')
+        if not name or name in names:
+            raise ValueError(f"Salida sin nombre o duplicada en el perfil: {name!r}")
+        names.add(name)
+        kind = out.setdefault('kind', 'segments')
+        if kind not in ('segments', 'hls'):
+            raise ValueError(f"Tipo de salida no soportado: {kind}")
+        if kind == 'hls' and not out.get('ladder'):
+            raise ValueError(f"La salida HLS {name!r} necesita 'ladder'")
+    main = [o for o in outputs if o['name'] == 'main']
+    if not main:
+        outputs.insert(0, copy.deepcopy(MAIN_OUTPUT))
+    elif main[0]['kind'] != 'segments':
+        raise ValueError("La salida 'main' debe ser de tipo 'segments'")
+    return outputs
@@ -0,0 +1,319 @@
+"""Perfilado opcional de acciones concretas (cortes, verificación, lista de reproducción, importación).
+
+Desactivado por defecto y sin coste apreciable en ese caso (una comprobación por
+llamada). Se activa con `PYVID_PROFILE` (junto a `PYVID_DEBUG`) o con la clave
+`profiling` de `~/.pyvideoplayer.json`:
+
+- `PYVID_PROFILE=1` o `cpu`: cProfile; `mem`: tracemalloc; `cpu,mem` o `all`: ambos.
+- `PYVID_PROFILE_DIR`: carpeta de volcados (por defecto `~/.pyvideoplayer_profiles/`).
+- Ajustes: `{"profiling": {"enabled": true, "mode": "cpu,mem", "dir": "...", "keep": 50,
+  "actions": ["split_video", ...]}}`. La variable de entorno tiene prioridad.
+
+Cada acción perfilada deja en la carpeta, con el prefijo `<fecha>-<acción>-<pid>-<n>`:
+`.pstats` (cargable con `pstats.Stats`), `.tracemalloc` (`tracemalloc.Snapshot.load`) y
+un `.json` con el resumen (tiempo total, CPU del hilo, pico de memoria, funciones y
+líneas más costosas). Sólo se conservan las `keep` últimas acciones (rotación por
+nombre, que empieza por la fecha). `tools/profile_summary.py` lista y muestra los volcados.
+
+Se instrumenta con `@profiled('acción')` (funciones normales o corrutinas) o, para
+acciones que empiezan y terminan en sitios distintos (p. ej. una importación que llega
+por lotes al hilo de la GUI), con `start('acción')` y `sesión.stop()`. cProfile sólo
+puede haber uno activo por hilo: una acción perfilada dentro de otra (en el mismo
+contexto, `contextvars`, así que cada tarea de asyncio lleva el suyo) sólo mide su
+tiempo, que queda en el resumen de la exterior (`nested`). Si otra tarea del mismo hilo
+tiene ya el cProfile, la acción se vuelca aparte sólo con su tiempo (`concurrent_with`)
+y la que lo tiene anota en `concurrent` las que corrieron a la vez, cuyo trabajo está
+mezclado en su `.pstats`. tracemalloc es global al proceso: se arranca con la primera
+acción y se para con la última.
+"""
+import os
+import io
+import json
+import time
+import pstats
+import logging
+import cProfile
+import inspect
+import contextvars
+import functools
+import threading
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+
+TRACE_FRAMES = 10
+_TOP_FUNCTIONS = 15
+_TOP_ALLOCATIONS = 10
+
+_config_lock = threading.Lock()
+_settings: Dict[str, Any] = {}
+_config: Optional[Dict[str, Any]] = None
+# acción perfilada activa en el contexto actual (hilo o tarea de asyncio)
+_current: contextvars.ContextVar = contextvars.ContextVar('pyvid_profiling_session', default=None)
+# hilo -> acción que tiene su cProfile (o el tracemalloc) en marcha
+_owners: Dict[int, 'Session'] = {}
+_owners_lock = threading.Lock()
+_counter = 0
+_trace_lock = threading.Lock()
+_trace_users = 0
+_trace_started = False
+
+
+def default_profile_dir() -> str:
+    return os.path.join(os.path.expanduser('~'), '.pyvideoplayer_profiles')
+
+
+def _parse_mode(value) -> set:
+    modes = set()
+    for part in str(value or '').lower().replace(' ', '').split(','):
+        if part in ('1', 'true', 'yes', 'on', 'cpu'):
+            modes.add('cpu')
+        elif part in ('mem', 'memory', 'tracemalloc'):
+            modes.add('mem')
+        elif part == 'all':
+            modes.update(('cpu', 'mem'))
+    return modes
+
+
+def configure(settings: Optional[dict] = None) -> None:
+    """Aplicar la clave `profiling` de los ajustes (ver el docstring del módulo)."""
+    global _settings, _config
+    with _config_lock:
+        _settings = dict(settings or {})
+        _config = None
+
+
+def _current_config() -> Dict[str, Any]:
+    global _config
+    config = _config
+    if config is not None:
+        return config
+    with _config_lock:
+        s = _settings
+        env = os.environ.get('PYVID_PROFILE')
+        if env is not None and env.strip():
+            modes = _parse_mode(env)
+        elif s.get('enabled'):
+            modes = _parse_mode(s.get('mode') or 'cpu')
+        else:
+            modes = set()
+        actions = s.get('actions')
+        _config = {
+            'modes': modes,
+            'dir': os.environ.get('PYVID_PROFILE_DIR') or s.get('dir') or default_profile_dir(),
+            'keep': max(1, int(s.get('keep', 50))),
+            'actions': set(actions) if actions else None,
+        }
+        return _config
+
+
+def enabled(action: Optional[str] = None) -> bool:
+    config = _current_config()
+    if not config['modes']:
+        return False
+    return action is None or config['actions'] is None or action in config['actions']
+
+
+def _trace_acquire() -> None:
+    global _trace_users, _trace_started
+    with _trace_lock:
+        if _trace_users == 0:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(TRACE_FRAMES)
+                _trace_started = True
+            tracemalloc.reset_peak()
+        _trace_users += 1
+
+
+def _trace_release() -> None:
+    global _trace_users, _trace_started
+    with _trace_lock:
+        _trace_users -= 1
+        if _trace_users == 0 and _trace_started:
+            tracemalloc.stop()
+            _trace_started = False
+
+
+def _top_functions(profiler: cProfile.Profile) -> List[Dict[str, Any]]:
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, _callers) in stats.stats.items():
+        rows.append({'function': f"{os.path.basename(filename)}:{line}({func})", 'calls': nc,
+                     'tottime': round(tt, 6), 'cumtime': round(ct, 6)})
+    rows.sort(key=lambda r: r['cumtime'], reverse=True)
+    return rows[:_TOP_FUNCTIONS]
+
+
+def _rotate(directory: str, keep: int) -> None:
+    """Borrar los volcados más antiguos hasta dejar `keep` acciones."""
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    stems = sorted({n[:-5] for n in names if n.endswith('.json')})
+    for stem in stems[:-keep] if len(stems) > keep else []:
+        for ext in ('.json', '.pstats', '.tracemalloc'):
+            try:
+                os.remove(os.path.join(directory, stem + ext))
+            except OSError:
+                pass
+
+
+def _live(session: Optional['Session']) -> Optional['Session']:
+    """`session` o su antecesor más cercano que siga en marcha."""
+    while session is not None and session._stopped:
+        session = session._parent
+    return session
+
+
+class Session:
+    """Una acción perfilada. Se crea con `start()`; `stop()` vuelca los resultados."""
+
+    def __init__(self, action: str, config: Dict[str, Any]):
+        self.action = action
+        self.config = config
+        self.nested: List[Dict[str, Any]] = []
+        # acciones de otras tareas de este hilo que corrieron mientras ésta tenía el cProfile
+        self.concurrent: List[str] = []
+        self.concurrent_with: Optional[str] = None
+        self._profiler = None
+        self._tracing = False
+        self._stopped = False
+        self._started = time.time()
+        self._wall0 = time.perf_counter()
+        self._cpu0 = time.thread_time()
+        self._thread = threading.current_thread()
+        self._parent = _live(_current.get())
+        if self._parent is None:
+            with _owners_lock:
+                owner = _live(_owners.get(self._thread.ident))
+                if owner is None:
+                    _owners[self._thread.ident] = self
+                else:
+                    owner.concurrent.append(action)
+            if owner is not None:
+                # otra tarea de este hilo tiene el cProfile: esta acción sólo mide su tiempo
+                self.concurrent_with = owner.action
+            else:
+                if 'cpu' in config['modes']:
+                    profiler = cProfile.Profile()
+                    try:
+                        profiler.enable()
+                        self._profiler = profiler
+                    except ValueError:
+                        # otro perfilador activo (p. ej. un depurador)
+                        logging.getLogger(__name__).debug("profiling: cProfile no disponible para %s", action)
+                if 'mem' in config['modes']:
+                    _trace_acquire()
+                    self._tracing = True
+        _current.set(self)
+
+    def stop(self) -> Optional[str]:
+        """Terminar la acción. Devuelve la ruta del resumen `.json` (None si es anidada o falla)."""
+        if self._stopped:
+            return None
+        self._stopped = True
+        if self._profiler is not None:
+            self._profiler.disable()
+        wall = time.perf_counter() - self._wall0
+        cpu = time.thread_time() - self._cpu0 if threading.current_thread() is self._thread else None
+        if _current.get() is self:
+            _current.set(_live(self._parent))
+        with _owners_lock:
+            if _owners.get(self._thread.ident) is self:
+                del _owners[self._thread.ident]
+        if self._parent is not None and not self._parent._stopped:
+            self._parent.nested.append({'action': self.action, 'wall_s': round(wall, 6)})
+            return None
+        # sin padre o con el padre ya volcado: resumen propio (sólo tiempo si era anidada)
+        try:
+            return self._dump(wall, cpu)
+        except Exception:
+            logging.getLogger(__name__).debug("profiling: no se pudo volcar %s", self.action, exc_info=True)
+            return None
+        finally:
+            if self._tracing:
+                _trace_release()
+
+    def _dump(self, wall: float, cpu: Optional[float]) -> str:
+        global _counter
+        directory = self.config['dir']
+        os.makedirs(directory, exist_ok=True)
+        with _config_lock:
+            _counter += 1
+            n = _counter
+        stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(self._started)) + f".{int(self._started * 1000) % 1000:03d}"
+        stem = os.path.join(directory, f"{stamp}-{self.action}-{os.getpid()}-{n}")
+        summary: Dict[str, Any] = {
+            'action': self.action, 'started': self._started, 'wall_s': round(wall, 6),
+            'thread_cpu_s': round(cpu, 6) if cpu is not None else None,
+            'thread': self._thread.name, 'pid': os.getpid(), 'nested': self.nested,
+        }
+        if self._parent is not None:
+            summary['parent'] = self._parent.action
+        if self.concurrent_with is not None:
+            summary['concurrent_with'] = self.concurrent_with
+        if self.concurrent:
+            summary['concurrent'] = self.concurrent
+        if self._profiler is not None:
+            self._profiler.dump_stats(stem + '.pstats')
+            summary['pstats'] = os.path.basename(stem + '.pstats')
+            summary['top_functions'] = _top_functions(self._profiler)
+        if self._tracing and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot.dump(stem + '.tracemalloc')
+            summary['tracemalloc'] = os.path.basename(stem + '.tracemalloc')
+            summary['current_bytes'] = current
+            summary['peak_bytes'] = peak
+            summary['top_allocations'] = [
+                {'line': f"{os.path.basename(s.traceback[0].filename)}:{s.traceback[0].lineno}",
+                 'size': s.size, 'count': s.count}
+                for s in snapshot.statistics('lineno')[:_TOP_ALLOCATIONS]]
+        tmp = stem + '.json.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, stem + '.json')
+        _rotate(directory, self.config['keep'])
+        logging.getLogger(__name__).debug("profiling: %s %.3fs -> %s.json", self.action, wall, stem)
+        return stem + '.json'
+
+
+def start(action: str) -> Optional[Session]:
+    """Empezar a perfilar `action` en este contexto; None si el perfilado está desactivado para ella."""
+    if not enabled(action):
+        return None
+    try:
+        return Session(action, _current_config())
+    except Exception:
+        logging.getLogger(__name__).debug("profiling: no se pudo empezar %s", action, exc_info=True)
+        return None
+
+
+def stop(session: Optional[Session]) -> Optional[str]:
+    """`session.stop()` tolerando None (perfilado desactivado)."""
+    return session.stop() if session is not None else None
+
+
+def profiled(action: str):
+    """Decorador: perfilar cada llamada a la función (o corrutina) como `action`."""
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                session = start(action)
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    stop(session)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            session = start(action)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stop(session)
+        return wrapper
+    return decorate
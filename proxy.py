@@ -0,0 +1,171 @@
+"""Proxies de reproducción para medios pesados (4K, bitrates altos).
+
+Cuando un fichero de la cola supera los umbrales de resolución o bitrate, se genera en
+segundo plano una versión ligera (altura reducida, H.264 con GOP corto para que los
+saltos sean inmediatos) en una caché acotada en disco. El reproductor usa el proxy si
+existe; cortar, unir o exportar siguen trabajando siempre con el original.
+
+El proxy conserva la línea de tiempo del original (mismos fps y duración), así que una
+posición en el proxy corresponde a la misma posición en el original; `to_original_ms` /
+`to_proxy_ms` corrigen la pequeña diferencia de duración que pueda haber al final.
+
+La caché se limita por tamaño total: al crear un proxy se borran los usados hace más
+tiempo (LRU por fecha de modificación, que se actualiza en cada uso).
+"""
+import os
+import hashlib
+import logging
+import subprocess
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+from governor import get_governor
+
+
+PROXY_VERSION = 1
+
+
+def default_proxy_dir() -> str:
+    return os.path.join(os.path.expanduser('~'), '.pyvideoplayer_proxies')
+
+
+def to_original_ms(position_ms: int, proxy_duration_ms: Optional[int], original_duration_ms: Optional[int]) -> int:
+    """Posición en el proxy -> posición en el original."""
+    if not proxy_duration_ms or not original_duration_ms:
+        return position_ms
+    ratio = original_duration_ms / float(proxy_duration_ms)
+    # diferencias grandes no son de redondeo: no escalar
+    if abs(ratio - 1.0) > 0.02:
+        return position_ms
+    return int(round(position_ms * ratio))
+
+
+def to_proxy_ms(position_ms: int, proxy_duration_ms: Optional[int], original_duration_ms: Optional[int]) -> int:
+    """Posición en el original -> posición en el proxy."""
+    return to_original_ms(position_ms, original_duration_ms, proxy_duration_ms)
+
+
+class ProxyCache:
+    """Caché en disco de proxies `original -> proxy.mp4`, acotada a `max_bytes`."""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 4096 * 1024 * 1024,
+                 max_height: int = 1080, max_bitrate: int = 20000000, proxy_height: int = 540,
+                 gop: int = 12, crf: int = 28):
+        self.cache_dir = cache_dir or default_proxy_dir()
+        self.max_bytes = int(max_bytes)
+        self.max_height = int(max_height)
+        self.max_bitrate = int(max_bitrate)
+        self.proxy_height = int(proxy_height)
+        self.gop = int(gop)
+        self.crf = int(crf)
+        self._lock = threading.Lock()
+
+    def _key(self, path: str) -> str:
+        st = os.stat(path)
+        raw = repr((os.path.abspath(path), st.st_size, st.st_mtime_ns, self.proxy_height, self.gop, PROXY_VERSION))
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def proxy_path(self, path: str) -> str:
+        return os.path.join(self.cache_dir, self._key(path) + '.mp4')
+
+    def lookup(self, path: str) -> Optional[str]:
+        """Ruta del proxy de `path` si ya existe (sin sondear ni transcodificar)."""
+        try:
+            proxy = self.proxy_path(path)
+        except OSError:
+            return None
+        if not os.path.exists(proxy):
+            return None
+        try:
+            os.utime(proxy, None)  # marcar como usado (LRU)
+        except OSError:
+            pass
+        return proxy
+
+    def needs_proxy(self, info: Dict[str, Any]) -> bool:
+        """True si los streams de `info` (ver mediainfo.get_stream_info) superan los umbrales."""
+        video = info.get('video') or {}
+        height = video.get('height') or 0
+        bitrate = info.get('bitrate') or 0
+        return bool(video) and (height > self.max_height or bitrate > self.max_bitrate)
+
+    def ensure(self, path: str, ffmpeg_exe: str, should_stop=None) -> Optional[str]:
+        """Devuelve el proxy de `path`, generándolo si hace falta; None si no lo necesita."""
+        existing = self.lookup(path)
+        if existing:
+            return existing
+        from mediainfo import get_stream_info
+        if not self.needs_proxy(get_stream_info(path, ffmpeg_exe)):
+            return None
+        return self.build(path, ffmpeg_exe, should_stop)
+
+    def build(self, path: str, ffmpeg_exe: str, should_stop=None) -> Optional[str]:
+        """Transcodifica el proxy de `path` (a un temporal y renombrado atómico).
+
+        Si `should_stop()` pasa a ser True se mata ffmpeg y se devuelve None.
+        """
+        logger = logging.getLogger(__name__)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        out = self.proxy_path(path)
+        tmp = out + '.tmp.mp4'
+        cmd = [ffmpeg_exe, '-y', '-v', 'error', '-nostdin', '-i', path,
+               '-map', '0:v:0', '-map', '0:a:0?',
+               '-vf', f"scale=-2:'min({self.proxy_height},ih)'",
+               '-c:v', 'libx264', '-preset', 'veryfast', '-crf', str(self.crf), '-pix_fmt', 'yuv420p',
+               '-g', str(self.gop), '-keyint_min', str(self.gop), '-sc_threshold', '0',
+               '-c:a', 'aac', '-b:a', '96k', '-movflags', '+faststart', tmp]
+        with tempfile.TemporaryFile() as err:
+            proc = get_governor().popen(cmd, stdout=subprocess.DEVNULL, stderr=err)
+            cancelled = False
+            while True:
+                try:
+                    proc.wait(timeout=0.2)
+                    break
+                except subprocess.TimeoutExpired:
+                    if should_stop is not None and should_stop():
+                        proc.kill()
+                        proc.wait()
+                        cancelled = True
+                        break
+            err.seek(0)
+            stderr = err.read()[-2000:].decode('utf-8', 'replace')
+        if cancelled or proc.returncode != 0:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            if cancelled:
+                return None
+            raise RuntimeError(f"ffmpeg no pudo generar el proxy de {path}: {stderr}")
+        os.replace(tmp, out)
+        logger.debug("proxy: generado %s para %s", out, path)
+        self.evict(keep=out)
+        return out
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Borrar los proxies menos usados hasta quedar por debajo de `max_bytes`."""
+        with self._lock:
+            try:
+                entries = []
+                with os.scandir(self.cache_dir) as it:
+                    for e in it:
+                        if e.is_file() and e.name.endswith('.mp4') and not e.name.endswith('.tmp.mp4'):
+                            st = e.stat()
+                            entries.append((st.st_mtime, st.st_size, e.path))
+            except OSError:
+                return 0
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, p in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if keep and os.path.abspath(p) == os.path.abspath(keep):
+                    continue
+                try:
+                    os.remove(p)
+                    total -= size
+                    removed += 1
+                except OSError:
+                    pass
+            return removed
@@ -0,0 +1,212 @@
+"""Ejecución de ffmpeg/ffprobe con captura de salida acotada y progreso incremental.
+
+`subprocess.run(capture_output=True)` guarda en memoria toda la salida de error de un
+proceso; en una recodificación de horas son decenas de MB por trabajo. `run_captured`
+lee stdout y stderr a medida que llegan con un hilo por tubería y guarda sólo:
+
+- el principio (`head_bytes`, donde ffmpeg escribe la descripción de la entrada, p. ej.
+  `Duration:`) y el final (`tail_bytes`, donde están los errores) de cada stream, en
+  búferes circulares de tamaño fijo;
+- el último estado de progreso (`frame=… time=… speed=…`), que se parsea línea a línea
+  (ffmpeg separa esas líneas con '\r') y se pasa a `progress_cb`.
+
+Devuelve un `subprocess.CompletedProcess` como `subprocess.run`, así que los llamadores
+no cambian; si se recortó algo, el texto lleva una marca con los bytes omitidos.
+`run_captured_async` hace lo mismo sobre asyncio.
+Los procesos se lanzan a través del gobernador de recursos (governor.py).
+"""
+import re
+import asyncio
+import threading
+import subprocess
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from governor import get_governor
+
+
+_PROGRESS_RE = re.compile(r'(\w+)=\s*([^\s=]+)')
+
+
+class BoundedCapture:
+    """Guarda los primeros `head_bytes` y los últimos `tail_bytes` de un stream."""
+
+    def __init__(self, head_bytes: int = 8192, tail_bytes: int = 32768):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self._head = bytearray()
+        self._tail = deque()
+        self._tail_size = 0
+        self.total = 0
+
+    def write(self, data: bytes) -> None:
+        self.total += len(data)
+        room = self.head_bytes - len(self._head)
+        if room > 0:
+            self._head += data[:room]
+            data = data[room:]
+        if not data or self.tail_bytes <= 0:
+            return
+        if len(data) >= self.tail_bytes:
+            self._tail.clear()
+            self._tail.append(bytes(data[-self.tail_bytes:]))
+            self._tail_size = self.tail_bytes
+            return
+        self._tail.append(bytes(data))
+        self._tail_size += len(data)
+        while self._tail_size - len(self._tail[0]) >= self.tail_bytes:
+            self._tail_size -= len(self._tail.popleft())
+
+    def getvalue(self) -> bytes:
+        tail = b''.join(self._tail)
+        if len(tail) > self.tail_bytes:
+            tail = tail[-self.tail_bytes:]
+        omitted = self.total - len(self._head) - len(tail)
+        if omitted > 0:
+            return bytes(self._head) + b'\n[... %d bytes omitidos ...]\n' % omitted + tail
+        return bytes(self._head) + tail
+
+
+def parse_progress_line(line: str) -> Optional[Dict[str, str]]:
+    """`frame=  120 fps= 60 ... time=00:00:04.80 ... speed=2.1x` -> dict, o None si no es de progreso."""
+    if 'time=' not in line:
+        return None
+    fields = dict(_PROGRESS_RE.findall(line))
+    return fields if 'time' in fields else None
+
+
+def progress_time_ms(fields: Dict[str, str]) -> Optional[int]:
+    """Valor de `time=` (HH:MM:SS.xx) en ms."""
+    m = re.match(r'(-?\d+):(\d+):(\d+(?:\.\d+)?)', fields.get('time', ''))
+    if not m:
+        return None
+    h, mm, ss = m.groups()
+    return int(round((abs(int(h)) * 3600 + int(mm) * 60 + float(ss)) * 1000.0))
+
+
+class _LineSplitter:
+    """Trocea un stream en líneas ('\r' o '\n', como las líneas de estado de ffmpeg)."""
+
+    def __init__(self, on_line: Optional[Callable[[str], None]]):
+        self.on_line = on_line
+        self._pending = b''
+
+    def feed(self, chunk: bytes) -> None:
+        if self.on_line is None:
+            return
+        parts = re.split(rb'[\r\n]', self._pending + chunk)
+        self._pending = parts.pop()[-4096:]
+        for raw in parts:
+            if raw:
+                self.on_line(raw.decode('utf-8', 'replace'))
+
+    def close(self) -> None:
+        if self.on_line is not None and self._pending:
+            self.on_line(self._pending.decode('utf-8', 'replace'))
+        self._pending = b''
+
+
+def _pump(stream, capture: BoundedCapture, on_line: Optional[Callable[[str], None]]) -> None:
+    lines = _LineSplitter(on_line)
+    try:
+        while True:
+            chunk = stream.read1(65536) if hasattr(stream, 'read1') else stream.read(65536)
+            if not chunk:
+                break
+            capture.write(chunk)
+            lines.feed(chunk)
+        lines.close()
+    finally:
+        stream.close()
+
+
+async def _pump_async(stream, capture: BoundedCapture, on_line: Optional[Callable[[str], None]]) -> None:
+    lines = _LineSplitter(on_line)
+    while True:
+        chunk = await stream.read(65536)
+        if not chunk:
+            break
+        capture.write(chunk)
+        lines.feed(chunk)
+    lines.close()
+
+
+def _progress_line_handler(progress_cb):
+    if progress_cb is None:
+        return None
+
+    def on_err_line(line: str) -> None:
+        fields = parse_progress_line(line)
+        if fields is not None:
+            progress_cb(fields)
+    return on_err_line
+
+
+def run_captured(cmd: List[str], text: bool = True, progress_cb: Optional[Callable[[Dict[str, str]], None]] = None,
+                 head_bytes: int = 8192, tail_bytes: int = 32768, stdout_limit: int = 4 * 1024 * 1024,
+                 should_stop: Optional[Callable[[], bool]] = None,
+                 stdout_line_cb: Optional[Callable[[str], None]] = None) -> subprocess.CompletedProcess:
+    """Ejecuta `cmd` con salida acotada (ver el docstring del módulo).
+
+    `progress_cb(campos)` recibe cada línea de progreso de stderr ya parseada y
+    `stdout_line_cb(línea)` cada línea de stdout, para salidas largas que se procesan
+    al vuelo (p. ej. `-f framecrc`) en lugar de guardarlas. Con `should_stop()`
+    verdadero se mata el proceso (returncode negativo).
+    """
+    proc = get_governor().popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out_cap = BoundedCapture(stdout_limit, tail_bytes)
+    err_cap = BoundedCapture(head_bytes, tail_bytes)
+
+    readers = [threading.Thread(target=_pump, args=(proc.stdout, out_cap, stdout_line_cb), daemon=True),
+               threading.Thread(target=_pump, args=(proc.stderr, err_cap, _progress_line_handler(progress_cb)), daemon=True)]
+    for t in readers:
+        t.start()
+    try:
+        while True:
+            try:
+                proc.wait(timeout=0.2)
+                break
+            except subprocess.TimeoutExpired:
+                if should_stop is not None and should_stop():
+                    proc.kill()
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        for t in readers:
+            t.join()
+    out, err = out_cap.getvalue(), err_cap.getvalue()
+    if text:
+        out, err = out.decode('utf-8', 'replace'), err.decode('utf-8', 'replace')
+    return subprocess.CompletedProcess(proc.args, proc.returncode, out, err)
+
+
+async def run_captured_async(cmd: List[str], text: bool = True,
+                             progress_cb: Optional[Callable[[Dict[str, str]], None]] = None,
+                             head_bytes: int = 8192, tail_bytes: int = 32768,
+                             stdout_limit: int = 4 * 1024 * 1024) -> subprocess.CompletedProcess:
+    """Versión asyncio de `run_captured` (`asyncio.create_subprocess_exec`).
+
+    Si la tarea se cancela, el proceso hijo se mata antes de propagar la cancelación.
+    """
+    proc = await get_governor().create_subprocess_exec(cmd, stdin=subprocess.DEVNULL,
+                                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out_cap = BoundedCapture(stdout_limit, tail_bytes)
+    err_cap = BoundedCapture(head_bytes, tail_bytes)
+    try:
+        await asyncio.gather(_pump_async(proc.stdout, out_cap, None),
+                             _pump_async(proc.stderr, err_cap, _progress_line_handler(progress_cb)))
+        returncode = await proc.wait()
+    except BaseException:
+        if proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await asyncio.shield(proc.wait())
+        raise
+    out, err = out_cap.getvalue(), err_cap.getvalue()
+    if text:
+        out, err = out.decode('utf-8', 'replace'), err.decode('utf-8', 'replace')
+    return subprocess.CompletedProcess(cmd, returncode, out, err)
@@ -0,0 +1,115 @@
+"""Escaneo recursivo de carpetas en busca de vídeos.
+
+Usa `os.scandir` (una sola llamada al sistema por directorio, sin `stat` extra por
+entrada en la mayoría de sistemas de ficheros) y devuelve los ficheros encontrados
+por lotes, de modo que el llamador puede ir añadiéndolos a la cola mientras el
+escaneo continúa. Pensado para ejecutarse en un hilo de fondo.
+"""
+import os
+import fnmatch
+import logging
+from typing import Callable, Iterable, Iterator, List, Optional
+
+
+VIDEO_EXTENSIONS = ('.mp4', '.m4v', '.mkv', '.webm', '.avi', '.mov', '.ts', '.m2ts', '.mts', '.flv', '.wmv', '.mpg', '.mpeg')
+
+
+def sniff_video(path: str) -> bool:
+    """Comprueba la cabecera del fichero (magic bytes) para detectar contenedores de vídeo comunes.
+
+    Reconoce MP4/MOV (`ftyp`/`moov`/`mdat`), Matroska/WebM (EBML), AVI (RIFF/AVI),
+    MPEG-TS (byte de sincronía 0x47 cada 188 bytes), MPEG-PS, FLV y ASF/WMV.
+    """
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(380)
+    except OSError:
+        return False
+    if len(head) < 12:
+        return False
+    if head[4:8] in (b'ftyp', b'moov', b'mdat', b'free', b'wide'):
+        return True
+    if head[:4] == b'\x1a\x45\xdf\xa3':
+        return True
+    if head[:4] == b'RIFF' and head[8:12] == b'AVI ':
+        return True
+    if head[:3] == b'FLV':
+        return True
+    if head[:4] == b'\x00\x00\x01\xba':
+        return True
+    if head[:16] == b'\x30\x26\xb2\x75\x8e\x66\xcf\x11\xa6\xd9\x00\xaa\x00\x62\xce\x6c':
+        return True
+    if len(head) >= 377 and head[0] == 0x47 and head[188] == 0x47 and head[376] == 0x47:
+        return True
+    return False
+
+
+def _matches(rel_path: str, name: str, patterns: Iterable[str]) -> bool:
+    for pat in patterns:
+        if fnmatch.fnmatch(name, pat) or fnmatch.fnmatch(rel_path, pat):
+            return True
+    return False
+
+
+def scan_media(root: str,
+               include: Optional[List[str]] = None,
+               exclude: Optional[List[str]] = None,
+               recursive: bool = True,
+               sniff: bool = False,
+               batch_size: int = 500,
+               should_stop: Optional[Callable[[], bool]] = None) -> Iterator[List[str]]:
+    """Recorre `root` y produce listas de rutas de vídeo de como mucho `batch_size` elementos.
+
+    - `include`: globs (sobre el nombre o la ruta relativa con '/'); si se indica, sustituye
+      al filtro por extensión.
+    - `exclude`: globs de ficheros o carpetas a ignorar (una carpeta excluida no se recorre).
+    - `sniff`: si es True, los ficheros sin extensión de vídeo conocida se aceptan cuando
+      su cabecera coincide con un contenedor de vídeo (ver `sniff_video`).
+    - `should_stop`: se consulta por cada directorio; si devuelve True el escaneo termina.
+
+    Dentro de cada directorio los ficheros se devuelven ordenados por nombre y los
+    subdirectorios se recorren en orden, así el resultado es estable entre ejecuciones.
+    """
+    logger = logging.getLogger(__name__)
+    exclude = list(exclude or [])
+    batch: List[str] = []
+    # Pila de directorios pendientes (DFS iterativo: sin límite de recursión)
+    stack = [root]
+    while stack:
+        if should_stop is not None and should_stop():
+            logger.debug("scan_media: cancelado")
+            break
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            logger.debug("scan_media: no se pudo leer %s: %s", current, e)
+            continue
+        subdirs = []
+        for entry in entries:
+            rel = os.path.relpath(entry.path, root).replace(os.sep, '/')
+            if exclude and _matches(rel, entry.name, exclude):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        subdirs.append(entry.path)
+                    continue
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if include:
+                ok = _matches(rel, entry.name, include)
+            else:
+                ok = entry.name.lower().endswith(VIDEO_EXTENSIONS) or (sniff and sniff_video(entry.path))
+            if ok:
+                batch.append(entry.path)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        # apilar al revés para visitar los subdirectorios en orden alfabético
+        stack.extend(reversed(subdirs))
+    if batch:
+        yield batch
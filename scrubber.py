@@ -0,0 +1,163 @@
+"""Arrastre rápido de la barra de posición con búsquedas a keyframes y ajuste exacto al soltar.
+
+Con `sliderMoved -> setPosition` cada movimiento del ratón lanza una búsqueda exacta, y
+en ficheros con GOP largo cada una decodifica desde el keyframe anterior: las búsquedas
+se acumulan y la imagen va segundos por detrás del ratón. `ScrubController`:
+
+- durante el arrastre busca al keyframe más cercano (índice de keyframes.py), que se
+  muestra sin decodificar frames intermedios;
+- sólo tiene una búsqueda en vuelo: mientras el reproductor no ha respondido (primer
+  `positionChanged` o `settle_ms`), las peticiones nuevas sustituyen a la pendiente y
+  las intermedias se descartan;
+- al soltar hace una única búsqueda exacta a la posición final y reanuda si estaba
+  reproduciendo.
+
+Usa el mismo índice para avanzar/retroceder frame a frame (duración de frame estimada) o
+de keyframe en keyframe, y para el bucle A–B: si hay un keyframe a menos de un frame de
+A, A se ajusta a él y cada vuelta del bucle es una búsqueda sin decodificación extra.
+"""
+from typing import Callable, Optional
+
+from PySide6.QtCore import QObject, QTimer
+from PySide6.QtMultimedia import QMediaPlayer
+
+from keyframes import KeyframeIndex
+
+
+class ScrubController(QObject):
+    """Coordina las búsquedas de un QMediaPlayer durante el arrastre de la barra de posición.
+
+    `seek_fn(ms)` hace la búsqueda (p. ej. `VideoPlayer.seek`), en la línea de tiempo del
+    fichero que se está reproduciendo, igual que el índice de keyframes.
+    """
+
+    def __init__(self, player, seek_fn: Callable[[int], None], parent=None, settle_ms: int = 150):
+        super().__init__(parent)
+        self.player = player
+        self.seek_fn = seek_fn
+        self.index: Optional[KeyframeIndex] = None
+        self.dragging = False
+        self._was_playing = False
+        self._pending: Optional[int] = None
+        self._in_flight = False
+        self._settle = QTimer(self)
+        self._settle.setSingleShot(True)
+        self._settle.setInterval(settle_ms)
+        self._settle.timeout.connect(self._seek_settled)
+        self.player.positionChanged.connect(self._on_position_changed)
+        # contadores para métricas / depuración
+        self.seeks_issued = 0
+        self.seeks_dropped = 0
+        # bucle A–B (ms en la línea de tiempo del fichero reproducido)
+        self.loop_a: Optional[int] = None
+        self.loop_b: Optional[int] = None
+
+    def set_index(self, index: Optional[KeyframeIndex]) -> None:
+        self.index = index
+
+    def _is_playing(self) -> bool:
+        return self.player.playbackState() == QMediaPlayer.PlayingState
+
+    # --- arrastre ---
+    def press(self) -> None:
+        self.dragging = True
+        self._was_playing = self._is_playing()
+        if self._was_playing:
+            self.player.pause()
+
+    def move(self, position_ms: int) -> None:
+        if not self.dragging:
+            self.seek_exact(position_ms)
+            return
+        target = self.index.nearest(position_ms) if self.index is not None else position_ms
+        if self._pending is not None:
+            self.seeks_dropped += 1
+        self._pending = target
+        self._issue_pending()
+
+    def release(self, position_ms: int) -> None:
+        if self._pending is not None:
+            self.seeks_dropped += 1
+        self._pending = None
+        self._settle.stop()
+        self._in_flight = False
+        self.dragging = False
+        self.seek_exact(position_ms)
+        if self._was_playing:
+            self.player.play()
+
+    def _issue_pending(self) -> None:
+        if self._in_flight or self._pending is None:
+            return
+        target, self._pending = self._pending, None
+        # no repetir una búsqueda al mismo keyframe en el que ya está
+        if target == self.player.position():
+            return
+        self._in_flight = True
+        self.seeks_issued += 1
+        self.seek_fn(target)
+        self._settle.start()
+
+    def _seek_settled(self) -> None:
+        self._in_flight = False
+        self._issue_pending()
+
+    def _on_position_changed(self, position: int) -> None:
+        if self._in_flight:
+            self._settle.stop()
+            self._seek_settled()
+        elif self.loop_b is not None and not self.dragging and position >= self.loop_b:
+            self.seek_exact(self.loop_a)
+
+    def seek_exact(self, position_ms: int) -> None:
+        self.seeks_issued += 1
+        self.seek_fn(max(0, int(position_ms)))
+
+    # --- pasos ---
+    def step_frames(self, count: int) -> None:
+        """Pausar y avanzar (o retroceder, `count` < 0) `count` frames."""
+        if self._is_playing():
+            self.player.pause()
+        frame_ms = self.index.frame_ms if self.index is not None else 40.0
+        target = self.player.position() + int(round(count * frame_ms))
+        self.seek_exact(min(max(0, target), max(0, self.player.duration() - 1)))
+
+    def step_keyframe(self, forward: bool) -> None:
+        """Ir al keyframe siguiente o anterior (si no hay índice, ±5 s)."""
+        position = self.player.position()
+        if self.index is None:
+            target = position + (5000 if forward else -5000)
+        elif forward:
+            target = self.index.after(position)
+        else:
+            # un poco antes de la posición: estando justo en un keyframe, ir al anterior
+            target = self.index.before(position - int(self.index.frame_ms))
+        if target is not None:
+            self.seek_exact(target)
+
+    # --- bucle A–B ---
+    def cycle_loop(self) -> str:
+        """Primera llamada: fija A; segunda: fija B y activa el bucle; tercera: lo quita.
+
+        Devuelve el estado resultante: 'a', 'ab' u 'off'.
+        """
+        position = self.player.position()
+        if self.loop_a is None or (self.loop_b is None and position <= self.loop_a):
+            # primera marca, o B antes que A: (re)empezar con A aquí
+            self.loop_a = self._loop_start(position)
+            return 'a'
+        if self.loop_b is None:
+            self.loop_b = position
+            self.seek_exact(self.loop_a)
+            return 'ab'
+        self.clear_loop()
+        return 'off'
+
+    def _loop_start(self, position: int) -> int:
+        if self.index is None:
+            return position
+        keyframe = self.index.nearest(position)
+        return keyframe if abs(keyframe - position) <= self.index.frame_ms else position
+
+    def clear_loop(self) -> None:
+        self.loop_a = self.loop_b = None
@@ -0,0 +1,376 @@
+"""Índice de búsqueda incremental sobre la cola de reproducción.
+
+El índice se mantiene al añadir y quitar entradas (no se reconstruye en cada búsqueda) y
+está indexado por id de entrada (ver playlist.py), así que reordenar la cola no lo toca:
+
+- Texto: nombre del fichero y carpeta, en minúsculas y sin tildes. Cada nombre se parte
+  en bigramas y trigramas (`"cla" -> {ids}`); un término de 3 o más caracteres se busca
+  intersecando sus trigramas de menor a mayor tamaño y comprobando la subcadena sólo en
+  los candidatos. Las carpetas se indexan una sola vez aunque tengan miles de vídeos.
+- Extensión: conjunto de ids por extensión (`ext:mkv` es una consulta directa).
+- Metadatos de la caché (duración, altura del vídeo): listas ordenadas que se rehacen
+  de forma perezosa tras un cambio; un filtro `dur>10m` es una búsqueda binaria.
+
+Con varios términos se empieza por el más selectivo (estimado con los tamaños de los
+trigramas o de los rangos ordenados). Los siguientes se intersecan como conjunto si es
+barato obtenerlo y, si no, se comprueban entrada a entrada sobre el resultado parcial.
+
+Sintaxis de la consulta (todos los términos deben cumplirse):
+
+- `texto`, `"texto con espacios"`: en el nombre o en la carpeta.
+- `name:texto`, `dir:texto`, `ext:mkv`: sólo en el nombre, sólo en la carpeta, extensión.
+- `dur>10m`, `dur<=1h30m`, `dur=90s`, `dur>1:30`: duración (`h`, `m`, `s` o `hh:mm:ss`).
+- `res>=1080`, `res=4k`, `res<720p`: altura del vídeo.
+
+Las entradas sin el metadato no cumplen los filtros numéricos que lo usan.
+"""
+import os
+import re
+import bisect
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+_TOKEN_RE = re.compile(r'"([^"]*)"|(\S+)')
+_FILTER_RE = re.compile(r'^(dur|duration|res|height)(<=|>=|<|>|=)(.+)$')
+_FIELD_RE = re.compile(r'^(name|dir|ext):(.*)$')
+_DURATION_RE = re.compile(r'^(?:(\d+(?:\.\d+)?)h)?(?:(\d+(?:\.\d+)?)m)?(?:(\d+(?:\.\d+)?)s?)?$')
+_RESOLUTIONS = {'8k': 4320, '5k': 2880, '4k': 2160, '2k': 1440, 'uhd': 2160, 'fhd': 1080, 'hd': 720, 'sd': 480}
+
+NUMERIC_FIELDS = ('duration', 'height')
+
+
+def normalize(text: str) -> str:
+    """Minúsculas y sin diacríticos (`Canción` -> `cancion`) para comparar como el usuario escribe."""
+    if text.isascii():
+        return text.lower()
+    text = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _grams(text: str) -> Set[str]:
+    """Bigramas y trigramas de `text` (las claves de índice)."""
+    return {text[i:i + n] for n in (2, 3) for i in range(len(text) - n + 1)}
+
+
+def _extension(name: str) -> str:
+    return os.path.splitext(name)[1][1:]
+
+
+def parse_duration(value: str) -> Optional[Tuple[float, float]]:
+    """`10m`, `1h30m`, `90s`, `90`, `1:30`, `1:02:03` -> (segundos, precisión en segundos)."""
+    value = value.strip().lower()
+    if ':' in value:
+        try:
+            parts = [float(p) for p in value.split(':')]
+        except ValueError:
+            return None
+        if len(parts) > 3:
+            return None
+        secs = 0.0
+        for p in parts:
+            secs = secs * 60 + p
+        return secs, 1.0
+    m = _DURATION_RE.match(value)
+    if not value or not m or not any(m.groups()):
+        return None
+    h, mi, s = (float(g) if g else 0.0 for g in m.groups())
+    unit = 1.0 if m.group(3) else 60.0 if m.group(2) else 3600.0
+    return h * 3600 + mi * 60 + s, unit
+
+
+def parse_height(value: str) -> Optional[Tuple[float, float]]:
+    """`1080`, `1080p`, `4k` -> (altura, 0)."""
+    value = value.strip().lower()
+    if value in _RESOLUTIONS:
+        return float(_RESOLUTIONS[value]), 0.0
+    if value.endswith('p'):
+        value = value[:-1]
+    try:
+        return float(int(value)), 0.0
+    except ValueError:
+        return None
+
+
+def parse_query(query: str) -> List[tuple]:
+    """Trocear la consulta en términos `('text', campo, texto)` o `('num', campo, op, valor, precisión)`.
+
+    Un filtro mal formado (`dur>abc`) se trata como texto.
+    """
+    terms = []
+    for quoted, word in _TOKEN_RE.findall(query):
+        if quoted:
+            text = normalize(quoted)
+            if text:
+                terms.append(('text', 'any', text))
+            continue
+        m = _FILTER_RE.match(word.lower())
+        if m:
+            name, op, raw = m.groups()
+            field = 'duration' if name in ('dur', 'duration') else 'height'
+            parsed = parse_duration(raw) if field == 'duration' else parse_height(raw)
+            if parsed is not None:
+                terms.append(('num', field, op, parsed[0], parsed[1]))
+                continue
+        m = _FIELD_RE.match(word.lower())
+        if m and m.group(2):
+            field, text = m.groups()
+            if field == 'ext':
+                terms.append(('text', 'ext', normalize(text).lstrip('.')))
+            else:
+                terms.append(('text', field, normalize(text)))
+            continue
+        terms.append(('text', 'any', normalize(word)))
+    return terms
+
+
+class SearchIndex:
+    """Índice `id de entrada -> nombre, carpeta, duración, altura` con búsqueda por trigramas."""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        self._path: Dict[int, str] = {}
+        self._by_path: Dict[str, Set[int]] = {}
+        self._names: Dict[int, str] = {}
+        self._name_grams: Dict[str, Set[int]] = {}
+        self._by_ext: Dict[str, Set[int]] = {}
+        # carpetas: se indexan una vez y se comparten entre sus entradas
+        self._folder_of: Dict[int, int] = {}
+        self._folder_ids: Dict[str, int] = {}
+        self._folders: Dict[int, str] = {}
+        self._folder_grams: Dict[str, Set[int]] = {}
+        self._folder_members: Dict[int, Set[int]] = {}
+        self._next_folder = 1
+        self._numeric: Dict[str, Dict[int, float]] = {f: {} for f in NUMERIC_FIELDS}
+        # campo -> (valores ordenados, ids en el mismo orden), o None si hay que rehacerlo
+        self._sorted: Dict[str, Optional[Tuple[List[float], List[int]]]] = {f: None for f in NUMERIC_FIELDS}
+
+    def __len__(self) -> int:
+        return len(self._path)
+
+    def __contains__(self, entry_id) -> bool:
+        return entry_id in self._path
+
+    # --- mantenimiento ---
+    def add(self, entry_id: int, path: str, duration: Optional[float] = None, height: Optional[int] = None) -> None:
+        if entry_id in self._path:
+            self.remove([entry_id])
+        self._path[entry_id] = path
+        self._by_path.setdefault(path, set()).add(entry_id)
+        folder, name = os.path.split(path)
+        name = normalize(name)
+        self._names[entry_id] = name
+        name_grams = self._name_grams
+        for g in _grams(name):
+            ids = name_grams.get(g)
+            if ids is None:
+                name_grams[g] = {entry_id}
+            else:
+                ids.add(entry_id)
+        self._by_ext.setdefault(_extension(name), set()).add(entry_id)
+        folder = normalize(folder)
+        fid = self._folder_ids.get(folder)
+        if fid is None:
+            fid = self._next_folder
+            self._next_folder += 1
+            self._folder_ids[folder] = fid
+            self._folders[fid] = folder
+            self._folder_members[fid] = set()
+            for g in _grams(folder):
+                self._folder_grams.setdefault(g, set()).add(fid)
+        self._folder_of[entry_id] = fid
+        self._folder_members[fid].add(entry_id)
+        self._set_numeric(entry_id, duration=duration, height=height)
+
+    def remove(self, entry_ids: Iterable[int]) -> None:
+        for eid in entry_ids:
+            path = self._path.pop(eid, None)
+            if path is None:
+                continue
+            same = self._by_path.get(path)
+            if same is not None:
+                same.discard(eid)
+                if not same:
+                    del self._by_path[path]
+            name = self._names.pop(eid)
+            ext_ids = self._by_ext[_extension(name)]
+            ext_ids.discard(eid)
+            if not ext_ids:
+                del self._by_ext[_extension(name)]
+            for g in _grams(name):
+                ids = self._name_grams.get(g)
+                if ids is not None:
+                    ids.discard(eid)
+                    if not ids:
+                        del self._name_grams[g]
+            fid = self._folder_of.pop(eid)
+            members = self._folder_members[fid]
+            members.discard(eid)
+            if not members:
+                self._drop_folder(fid)
+            for field in NUMERIC_FIELDS:
+                if self._numeric[field].pop(eid, None) is not None:
+                    self._sorted[field] = None
+
+    def _drop_folder(self, fid: int) -> None:
+        folder = self._folders.pop(fid)
+        del self._folder_ids[folder]
+        del self._folder_members[fid]
+        for g in _grams(folder):
+            ids = self._folder_grams.get(g)
+            if ids is not None:
+                ids.discard(fid)
+                if not ids:
+                    del self._folder_grams[g]
+
+    def retain(self, entry_ids: Iterable[int]) -> None:
+        """Quitar las entradas que no estén en `entry_ids` (p. ej. tras eliminar de la cola)."""
+        keep = set(entry_ids)
+        self.remove([eid for eid in self._path if eid not in keep])
+
+    def _set_numeric(self, entry_id: int, **values) -> None:
+        for field, value in values.items():
+            if value is None:
+                continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            if self._numeric[field].get(entry_id) != value:
+                self._numeric[field][entry_id] = value
+                self._sorted[field] = None
+
+    def set_metadata(self, path: str, duration: Optional[float] = None, height: Optional[int] = None) -> None:
+        """Actualizar los metadatos de todas las entradas con la ruta `path` (p. ej. al sondear la duración)."""
+        for eid in self._by_path.get(path, ()):
+            self._set_numeric(eid, duration=duration, height=height)
+
+    # --- consulta ---
+    @staticmethod
+    def _gram_sets(text: str, grams: Dict[str, Set[int]]) -> Optional[List[Set[int]]]:
+        """Conjuntos de índice de `text` de menor a mayor (vacío: nada coincide); None si es muy corto."""
+        if len(text) < 2:
+            return None
+        keys = _trigrams(text) if len(text) >= 3 else {text}
+        sets = []
+        for g in keys:
+            ids = grams.get(g)
+            if not ids:
+                return []
+            sets.append(ids)
+        sets.sort(key=len)
+        return sets
+
+    def _substring(self, text: str, strings: Dict[int, str], grams: Dict[str, Set[int]]) -> Set[int]:
+        sets = self._gram_sets(text, grams)
+        if sets is None:
+            return {k for k, s in strings.items() if text in s}
+        if not sets:
+            return set()
+        candidates = sets[0].intersection(*sets[1:]) if len(sets) > 1 else set(sets[0])
+        if len(text) <= 3:
+            return candidates
+        return {k for k in candidates if text in strings[k]}
+
+    def _ordered(self, field: str) -> Tuple[List[float], List[int]]:
+        ordered = self._sorted[field]
+        if ordered is None:
+            pairs = sorted((v, e) for e, v in self._numeric[field].items())
+            ordered = self._sorted[field] = ([v for v, _e in pairs], [e for _v, e in pairs])
+        return ordered
+
+    def _numeric_range(self, op: str, value: float, precision: float, values: List[float]) -> Tuple[int, int]:
+        lo, hi = 0, len(values)
+        if op == '>':
+            lo = bisect.bisect_right(values, value)
+        elif op == '>=':
+            lo = bisect.bisect_left(values, value)
+        elif op == '<':
+            hi = bisect.bisect_left(values, value)
+        elif op == '<=':
+            hi = bisect.bisect_right(values, value)
+        else:
+            # igualdad con la precisión con que se escribió (`dur=10m` admite 9:30..10:30)
+            lo = bisect.bisect_left(values, value - precision / 2.0)
+            hi = bisect.bisect_right(values, value + precision / 2.0)
+        return lo, hi
+
+    def _estimate(self, term: tuple) -> int:
+        """Tamaño aproximado (cota superior) del conjunto de `term`, sin materializarlo."""
+        if term[0] == 'num':
+            values, _ids = self._ordered(term[1])
+            lo, hi = self._numeric_range(term[2], term[3], term[4], values)
+            return hi - lo
+        field, text = term[1], term[2]
+        if field == 'ext':
+            return len(self._by_ext.get(text, ()))
+        total = 0
+        if field in ('any', 'name'):
+            sets = self._gram_sets(text, self._name_grams)
+            total += len(self._names) if sets is None else len(sets[0]) if sets else 0
+        if field in ('any', 'dir'):
+            sets = self._gram_sets(text, self._folder_grams)
+            fids = self._folders if sets is None else sets[0] if sets else ()
+            total += sum(len(self._folder_members[f]) for f in fids)
+        return total
+
+    def _materialize(self, term: tuple) -> Set[int]:
+        if term[0] == 'num':
+            values, ids = self._ordered(term[1])
+            lo, hi = self._numeric_range(term[2], term[3], term[4], values)
+            return set(ids[lo:hi])
+        field, text = term[1], term[2]
+        if field == 'ext':
+            return set(self._by_ext.get(text, ()))
+        result: Set[int] = set()
+        if field in ('any', 'name'):
+            result = self._substring(text, self._names, self._name_grams)
+        if field in ('any', 'dir'):
+            for fid in self._substring(text, self._folders, self._folder_grams):
+                result |= self._folder_members[fid]
+        return result
+
+    def _filter(self, term: tuple, candidates: Set[int]) -> Set[int]:
+        """Quedarse con los `candidates` que cumplen `term`, comprobándolos uno a uno."""
+        if term[0] == 'num':
+            values = self._numeric[term[1]]
+            op, value, precision = term[2], term[3], term[4]
+            if op == '=':
+                lo, hi = value - precision / 2.0, value + precision / 2.0
+                return {e for e in candidates if lo <= values.get(e, -1.0) <= hi}
+            cmp = {'>': float.__gt__, '>=': float.__ge__, '<': float.__lt__, '<=': float.__le__}[op]
+            return {e for e in candidates if e in values and cmp(values[e], value)}
+        field, text = term[1], term[2]
+        names, folders, folder_of = self._names, self._folders, self._folder_of
+        if field == 'name':
+            return {e for e in candidates if text in names[e]}
+        if field == 'ext':
+            return candidates & self._by_ext.get(text, set())
+        if field == 'dir':
+            return {e for e in candidates if text in folders[folder_of[e]]}
+        return {e for e in candidates if text in names[e] or text in folders[folder_of[e]]}
+
+    def search(self, query: str) -> Optional[Set[int]]:
+        """Ids que cumplen `query`, o None si la consulta está vacía (no filtrar)."""
+        terms = parse_query(query)
+        if not terms:
+            return None
+        estimated = sorted((self._estimate(t), i, t) for i, t in enumerate(terms))
+        result = self._materialize(estimated[0][2])
+        for size, _i, term in estimated[1:]:
+            if not result:
+                break
+            # obtener un rango ordenado o un conjunto del índice cuesta poco por elemento (C);
+            # comprobar entrada a entrada cuesta más, pero sólo recorre el resultado parcial
+            cheap = term[0] == 'num' or term[1] == 'ext'
+            if size <= len(result) * (2 if cheap else 1):
+                result &= self._materialize(term)
+            else:
+                result = self._filter(term, result)
+        return result
@@ -0,0 +1,195 @@
+"""Persistencia de la sesión de reproducción (cola, índice actual y posición).
+
+La sesión se guarda en un fichero SQLite junto al fichero de settings. La cola se
+escribe en una única transacción con `executemany`, de modo que colas de 100k
+entradas se guardan y cargan en décimas de segundo; si sólo se añadieron entradas al
+final se escriben únicamente las nuevas (`append_queue`). Las escrituras de la GUI
+pasan por `SessionWriter`, que las hace en un hilo propio. La carga NO comprueba si los
+ficheros existen: esa comprobación se hace después en segundo plano
+(ver `find_missing`), para que el arranque no tenga que hacer un `stat` por entrada.
+"""
+import os
+import sqlite3
+import logging
+import threading
+from collections import deque
+from typing import Callable, Iterable, List, Optional, Tuple
+
+
+SESSION_FILENAME = '.pyvideoplayer_session.sqlite'
+
+
+def default_session_path() -> str:
+    """Ruta por defecto del fichero de sesión (en el directorio del usuario)."""
+    return os.path.join(os.path.expanduser('~'), SESSION_FILENAME)
+
+
+class SessionStore:
+    """Almacén SQLite de la sesión.
+
+    Tablas:
+    - `queue(pos INTEGER PRIMARY KEY, path TEXT)`: la cola en orden.
+    - `state(key TEXT PRIMARY KEY, value TEXT)`: índice actual, posición en ms, etc.
+
+    La cola y el estado se guardan por separado: guardar la posición (cada pocos
+    segundos) no reescribe la cola.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or default_session_path()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path)
+        # journal en memoria: el fichero de sesión es prescindible y así se evita
+        # escribir un -journal adicional en cada guardado
+        conn.execute('PRAGMA journal_mode=MEMORY')
+        conn.execute('PRAGMA synchronous=OFF')
+        conn.execute('CREATE TABLE IF NOT EXISTS queue (pos INTEGER PRIMARY KEY, path TEXT NOT NULL)')
+        conn.execute('CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)')
+        return conn
+
+    def save_queue(self, paths: Iterable[str]) -> None:
+        """Reemplaza la cola guardada por `paths` en una única transacción."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('DELETE FROM queue')
+                conn.executemany('INSERT INTO queue (pos, path) VALUES (?, ?)', enumerate(paths))
+        finally:
+            conn.close()
+
+    def append_queue(self, start: int, paths: Iterable[str]) -> None:
+        """Guarda sólo las entradas añadidas al final: reemplaza las filas desde la posición `start`."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('DELETE FROM queue WHERE pos >= ?', (int(start),))
+                conn.executemany('INSERT INTO queue (pos, path) VALUES (?, ?)', enumerate(paths, int(start)))
+        finally:
+            conn.close()
+
+    def save_state(self, current_index: int, position_ms: int) -> None:
+        """Guarda el índice actual y la posición de reproducción (ms)."""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany('INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)',
+                                 [('current_index', str(int(current_index))),
+                                  ('position_ms', str(max(0, int(position_ms))))])
+        finally:
+            conn.close()
+
+    def load(self) -> Tuple[List[str], int, int]:
+        """Devuelve `(paths, current_index, position_ms)`.
+
+        Si no hay sesión guardada devuelve `([], -1, 0)`. No accede a los ficheros de la cola.
+        """
+        if not os.path.exists(self.path):
+            return [], -1, 0
+        conn = self._connect()
+        try:
+            paths = [row[0] for row in conn.execute('SELECT path FROM queue ORDER BY pos')]
+            state = dict(conn.execute('SELECT key, value FROM state'))
+        finally:
+            conn.close()
+        try:
+            current_index = int(state.get('current_index', -1))
+        except (TypeError, ValueError):
+            current_index = -1
+        try:
+            position_ms = int(state.get('position_ms', 0))
+        except (TypeError, ValueError):
+            position_ms = 0
+        if not (0 <= current_index < len(paths)):
+            current_index = -1
+            position_ms = 0
+        return paths, current_index, position_ms
+
+    def clear(self) -> None:
+        """Elimina la sesión guardada."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class SessionWriter:
+    """Hace las escrituras de un `SessionStore` en un hilo propio, en el orden pedido.
+
+    Un guardado completo de la cola sustituye a los guardados de cola pendientes y un
+    guardado de estado al estado pendiente, así que una ráfaga de cambios no encola
+    escrituras que ya no sirven. `flush` espera a que termine lo pendiente (al cerrar).
+    """
+
+    def __init__(self, store: SessionStore):
+        self.store = store
+        self._cond = threading.Condition()
+        self._jobs = deque()
+        self._busy = False
+        self._thread: Optional[threading.Thread] = None
+
+    def _submit(self, kind: str, args: tuple, supersedes: Tuple[str, ...]) -> None:
+        with self._cond:
+            if supersedes:
+                self._jobs = deque(j for j in self._jobs if j[0] not in supersedes)
+            self._jobs.append((kind, args))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='session-writer', daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def save_queue(self, paths: List[str]) -> None:
+        self._submit('queue', (paths,), ('queue', 'append'))
+
+    def append_queue(self, start: int, paths: List[str]) -> None:
+        self._submit('append', (start, paths), ())
+
+    def save_state(self, current_index: int, position_ms: int) -> None:
+        self._submit('state', (current_index, position_ms), ('state',))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Esperar a que se escriba todo lo pendiente; False si vence `timeout`."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._jobs and not self._busy, timeout)
+
+    def _run(self) -> None:
+        methods = {'queue': self.store.save_queue, 'append': self.store.append_queue,
+                   'state': self.store.save_state}
+        while True:
+            with self._cond:
+                if not self._cond.wait_for(lambda: self._jobs, timeout=30):
+                    # sin trabajo: terminar el hilo (se vuelve a crear con el siguiente guardado)
+                    self._thread = None
+                    return
+                kind, args = self._jobs.popleft()
+                self._busy = True
+            try:
+                methods[kind](*args)
+            except Exception:
+                logging.getLogger(__name__).exception('No se pudo guardar la sesión (%s)', kind)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+
+def find_missing(paths: Iterable[str], batch_size: int = 500,
+                 should_stop: Optional[Callable[[], bool]] = None) -> List[str]:
+    """Devuelve las rutas de `paths` que no existen como fichero.
+
+    Pensada para ejecutarse en un hilo de fondo. Comprueba `should_stop()` cada
+    `batch_size` entradas para poder cancelarse. Las rutas repetidas se comprueban una vez.
+    """
+    logger = logging.getLogger(__name__)
+    missing: List[str] = []
+    seen = set()
+    for n, p in enumerate(paths, start=1):
+        if p in seen:
+            continue
+        seen.add(p)
+        if not os.path.isfile(p):
+            missing.append(p)
+        if should_stop is not None and n % batch_size == 0 and should_stop():
+            logger.debug("find_missing: cancelado tras %d entradas", n)
+            break
+    return missing
@@ -0,0 +1,187 @@
+"""Orden aleatorio de reproducción sin repeticiones y con historial.
+
+`ShuffleOrder` mantiene una permutación de las claves de la cola generada de forma
+perezosa con Fisher–Yates: sólo se sortea la siguiente posición cuando se pide
+(`next`), así añadir elementos es O(1) (entran en el "pool" de no reproducidos) y no
+hay que barajar la cola entera. El prefijo ya sorteado de la permutación es el
+historial del ciclo actual, lo que permite volver atrás (`prev`) en O(1).
+"""
+import random
+from typing import Dict, Hashable, Iterable, List, Optional
+
+
+_REMOVED = object()
+
+
+class ShuffleOrder:
+    """Permutación perezosa de claves con cursor e historial acotado.
+
+    - `order[:drawn]`: claves ya sorteadas en este ciclo, en orden de reproducción.
+    - `order[drawn:]`: claves pendientes (pool), en orden arbitrario.
+    - `cursor`: posición de la pista actual dentro del prefijo sorteado.
+
+    Las claves eliminadas del prefijo se dejan como marcas (`_REMOVED`) que `next`/`prev`
+    saltan; del pool se eliminan en O(1) intercambiando con el último. Cuando las marcas
+    superan a las claves vivas se compacta el prefijo (coste amortizado O(1) por borrado),
+    así la memoria queda acotada aunque nunca empiece un ciclo nuevo.
+    """
+
+    def __init__(self, keys: Iterable[Hashable] = (), history_size: int = 500, rng: Optional[random.Random] = None):
+        self.history_size = max(1, int(history_size))
+        self._rng = rng or random.Random()
+        self._order: List = []
+        self._pos: Dict[Hashable, int] = {}
+        self._drawn = 0
+        self._cursor = -1
+        self._removed = 0
+        self.extend(keys)
+
+    def __len__(self) -> int:
+        return len(self._pos)
+
+    def __contains__(self, key) -> bool:
+        return key in self._pos
+
+    @property
+    def current(self):
+        if 0 <= self._cursor < self._drawn:
+            key = self._order[self._cursor]
+            if key is not _REMOVED:
+                return key
+        return None
+
+    def remaining(self) -> int:
+        """Número de claves que faltan por sonar en el ciclo actual."""
+        return len(self._order) - self._drawn
+
+    def extend(self, keys: Iterable[Hashable]) -> None:
+        """Añadir claves al pool de pendientes (O(1) por clave)."""
+        for key in keys:
+            if key in self._pos:
+                continue
+            self._pos[key] = len(self._order)
+            self._order.append(key)
+
+    def _swap(self, i: int, j: int) -> None:
+        if i == j:
+            return
+        a, b = self._order[i], self._order[j]
+        self._order[i], self._order[j] = b, a
+        if a is not _REMOVED:
+            self._pos[a] = j
+        if b is not _REMOVED:
+            self._pos[b] = i
+
+    def remove(self, key) -> None:
+        """Eliminar una clave (O(1))."""
+        p = self._pos.pop(key, None)
+        if p is None:
+            return
+        if p < self._drawn:
+            # ya sonó en este ciclo: dejar una marca para no desplazar el historial
+            self._order[p] = _REMOVED
+            self._removed += 1
+            if self._removed > max(32, len(self._pos)):
+                self._compact()
+            return
+        last = len(self._order) - 1
+        self._swap(p, last)
+        self._order.pop()
+
+    def _compact(self) -> None:
+        """Quitar las marcas `_REMOVED` del prefijo sorteado conservando el orden y el cursor."""
+        kept = []
+        cursor = -1
+        for i in range(self._drawn):
+            key = self._order[i]
+            if key is not _REMOVED:
+                kept.append(key)
+            if i == self._cursor:
+                # si la pista actual se eliminó, el cursor queda en la anterior viva
+                cursor = len(kept) - 1
+        self._order = kept + self._order[self._drawn:]
+        self._drawn = len(kept)
+        self._cursor = cursor
+        self._removed = 0
+        self._pos = {k: i for i, k in enumerate(self._order)}
+
+    def _draw(self) -> None:
+        """Sortear la siguiente posición (un paso de Fisher–Yates)."""
+        j = self._rng.randrange(self._drawn, len(self._order))
+        self._swap(self._drawn, j)
+        self._drawn += 1
+
+    def next(self):
+        """Devuelve la siguiente clave o None si el ciclo terminó."""
+        # tras `prev`, avanzar de nuevo recorre el historial ya sorteado
+        c = self._cursor + 1
+        while c < self._drawn:
+            if self._order[c] is not _REMOVED:
+                self._cursor = c
+                return self._order[c]
+            c += 1
+        if self._drawn >= len(self._order):
+            self._cursor = self._drawn - 1
+            return None
+        self._draw()
+        self._cursor = self._drawn - 1
+        return self._order[self._cursor]
+
+    def prev(self):
+        """Devuelve la clave anterior del historial o None si no hay."""
+        floor = max(0, self._cursor - self.history_size)
+        c = self._cursor - 1
+        while c >= floor:
+            if self._order[c] is not _REMOVED:
+                self._cursor = c
+                return self._order[c]
+            c -= 1
+        return None
+
+    def set_current(self, key) -> None:
+        """Marcar `key` como pista actual (p. ej. al elegirla a mano en la lista).
+
+        Si ya es la actual no cambia nada. Si no, la clave pasa al final del prefijo
+        sorteado y el cursor queda ahí: `next` sigue con claves que aún no han sonado. Si ya había sonado se intercambia con la última
+        sorteada (que sigue en el prefijo), sin mover el cursor hacia atrás ni dejar marcas.
+        """
+        p = self._pos.get(key)
+        if p is None or p == self._cursor:
+            # ya es la actual (p. ej. tras `next`/`prev`): no tocar el historial
+            return
+        if p >= self._drawn:
+            self._swap(p, self._drawn)
+            self._drawn += 1
+        else:
+            self._swap(p, self._drawn - 1)
+        self._cursor = self._drawn - 1
+
+    def new_cycle(self, avoid=None) -> None:
+        """Empezar un ciclo nuevo con todas las claves pendientes.
+
+        Si se indica `avoid` (normalmente la pista que acaba de sonar) y hay más de una
+        clave, no será la primera del nuevo ciclo.
+        """
+        keys = [k for k in self._order if k is not _REMOVED]
+        self._order = keys
+        self._pos = {k: i for i, k in enumerate(keys)}
+        self._drawn = 0
+        self._cursor = -1
+        self._removed = 0
+        if avoid is not None and avoid in self._pos and len(keys) > 1:
+            # sacar `avoid` del sorteo del primer paso: ponerlo al final y sortear entre el resto
+            self._swap(self._pos[avoid], len(keys) - 1)
+            j = self._rng.randrange(0, len(keys) - 1)
+            self._swap(0, j)
+            self._drawn = 1
+
+    def reset(self, keys: Iterable[Hashable], current=None) -> None:
+        """Reiniciar con `keys`; si `current` está entre ellas cuenta como ya reproducida."""
+        self._order = []
+        self._pos = {}
+        self._drawn = 0
+        self._cursor = -1
+        self._removed = 0
+        self.extend(keys)
+        if current is not None:
+            self.set_current(current)
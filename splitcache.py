@@ -0,0 +1,314 @@
+"""Caché de resultados de corte entre ejecuciones, direccionada por contenido.
+
+Cortar el mismo original con los mismos ajustes en otra carpeta no vuelve a lanzar
+ffmpeg: el resultado se guarda en `~/.pyvideoplayer_splitcache/<clave>/` y una petición
+repetida se sirve enlazando esos ficheros en la nueva carpeta de salida.
+
+- Clave: huella rápida de la entrada (tamaño, mtime y hash de unos bloques muestreados,
+  ver fingerprint.py; nunca se lee el fichero entero) más las opciones de corte
+  normalizadas (longitud en ms, tolerancia de ajuste, formato, perfil resuelto, modo
+  preciso y motor). Cambiar cualquiera de ellas da otra entrada.
+- Enlazado: reflink (copia con copy-on-write, Btrfs/XFS) si el sistema de ficheros lo
+  permite, si no hardlink y, entre sistemas de ficheros distintos, copia. Un hardlink
+  comparte inodo con la caché: si alguien modifica la salida en su sitio cambia el
+  mtime del fichero cacheado, y la entrada se descarta en la siguiente consulta. Antes
+  de cortar en una carpeta, los ficheros enlazados que el corte puede sobrescribir se
+  sustituyen por copias propias (`detach_links`) para que ffmpeg no escriba a través
+  del enlace. Sólo se miran esos ficheros (`output_files`: partes, playlists, manifiesto
+  y subcarpetas del perfil), nunca el resto de la carpeta elegida.
+- Tamaño acotado (`max_bytes`): LRU por fecha de modificación del directorio de la
+  entrada, que se actualiza en cada uso; `purge()` vacía la caché.
+
+Se configura con la clave `split_cache` de `~/.pyvideoplayer.json` (`enabled`,
+`cache_mb`) y `PYVID_SPLIT_CACHE=0` la desactiva.
+"""
+import os
+import json
+import time
+import fnmatch
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fingerprint import get_fingerprint
+
+
+CACHE_VERSION = 1
+ENTRY_FILE = 'entry.json'
+
+# ficheros que un corte puede escribir en la raíz de la carpeta de salida (ver splitter.py)
+OUTPUT_PATTERNS = ('VID-*', 'CLIP-*', 'index.m3u8', 'master.m3u8', 'init.mp4', 'manifest.json')
+
+# ioctl FICLONE de Linux (reflink de un fichero completo)
+_FICLONE = 0x40049409
+
+
+def default_split_cache_dir() -> str:
+    return os.path.join(os.path.expanduser('~'), '.pyvideoplayer_splitcache')
+
+
+def _reflink(src: str, dst: str) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(src, 'rb') as s, open(dst, 'wb') as d:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        return True
+    except OSError:
+        try:
+            os.remove(dst)
+        except OSError:
+            pass
+        return False
+
+
+def link_or_copy(src: str, dst: str) -> str:
+    """Coloca `src` en `dst` (reemplazándolo): reflink, hardlink o copia. Devuelve el método usado."""
+    os.makedirs(os.path.dirname(dst) or '.', exist_ok=True)
+    tmp = dst + '.pv_link_tmp'
+    try:
+        os.remove(tmp)
+    except OSError:
+        pass
+    method = 'reflink'
+    if not _reflink(src, tmp):
+        method = 'hardlink'
+        try:
+            os.link(src, tmp)
+        except OSError:
+            method = 'copy'
+            shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+    return method
+
+
+def snapshot_dir(root: str) -> Dict[str, Tuple[int, int]]:
+    """`ruta relativa -> (tamaño, mtime_ns)` de los ficheros bajo `root`."""
+    files: Dict[str, Tuple[int, int]] = {}
+    for dirpath, _dirs, names in os.walk(root):
+        for name in names:
+            full = os.path.join(dirpath, name)
+            try:
+                st = os.stat(full)
+            except OSError:
+                continue
+            files[os.path.relpath(full, root)] = (st.st_size, st.st_mtime_ns)
+    return files
+
+
+def output_files(root: str, subdirs: Iterable[str] = ()) -> Iterator[str]:
+    """Rutas de los ficheros de `root` que un corte puede sobrescribir.
+
+    Los de la raíz que encajan con `OUTPUT_PATTERNS` y todo lo que haya bajo las
+    subcarpetas `subdirs` (las de las salidas del perfil); el resto no se recorre.
+    """
+    try:
+        with os.scandir(root) as it:
+            for e in it:
+                if e.is_file() and any(fnmatch.fnmatchcase(e.name, p) for p in OUTPUT_PATTERNS):
+                    yield e.path
+    except OSError:
+        return
+    for sub in subdirs:
+        for dirpath, _dirs, names in os.walk(os.path.join(root, sub)):
+            for name in names:
+                yield os.path.join(dirpath, name)
+
+
+def snapshot_outputs(root: str, subdirs: Iterable[str] = ()) -> Dict[str, Tuple[int, int]]:
+    """Como `snapshot_dir`, pero sólo de los ficheros de `output_files`."""
+    files: Dict[str, Tuple[int, int]] = {}
+    for full in output_files(root, subdirs):
+        try:
+            st = os.stat(full)
+        except OSError:
+            continue
+        files[os.path.relpath(full, root)] = (st.st_size, st.st_mtime_ns)
+    return files
+
+
+def detach_links(root: str, subdirs: Iterable[str] = ()) -> int:
+    """Sustituir por copias propias los ficheros de salida de `root` con más de un enlace.
+
+    ffmpeg sobrescribe las salidas en su sitio: sin esto, cortar de nuevo en una carpeta
+    servida con hardlinks modificaría también la caché y las demás carpetas enlazadas.
+    Sólo se tocan los ficheros de `output_files`.
+    """
+    detached = 0
+    for full in output_files(root, subdirs):
+        try:
+            if os.stat(full).st_nlink <= 1:
+                continue
+            tmp = full + '.pv_link_tmp'
+            shutil.copy2(full, tmp)
+            os.replace(tmp, full)
+            detached += 1
+        except OSError:
+            logging.getLogger(__name__).debug("splitcache: no se pudo separar %s", full, exc_info=True)
+    return detached
+
+
+class SplitCache:
+    """Almacén `clave -> ficheros de un corte`, acotado a `max_bytes`."""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 8192 * 1024 * 1024):
+        self.cache_dir = cache_dir or default_split_cache_dir()
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(fingerprint: str, options: Dict[str, Any]) -> str:
+        raw = json.dumps({'v': CACHE_VERSION, 'input': fingerprint, 'options': options}, sort_keys=True)
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def key_for(self, input_path: str, options: Dict[str, Any]) -> str:
+        # huella de contenido (cacheada en la caché de metadatos) más el mtime del fichero
+        return self.make_key(f"{get_fingerprint(input_path)}:{os.stat(input_path).st_mtime_ns}", options)
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self._entry_dir(key), ENTRY_FILE), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # descartar entradas cuyos ficheros se modificaron (hardlinks editados en su sitio)
+        base = os.path.join(self._entry_dir(key), 'files')
+        for rel, (size, mtime_ns) in entry.get('files', {}).items():
+            try:
+                st = os.stat(os.path.join(base, rel))
+            except OSError:
+                return None
+            if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                return None
+        return entry
+
+    def serve(self, key: str, output_dir: str) -> Optional[List[str]]:
+        """Si `key` está en la caché, enlaza sus ficheros en `output_dir` y devuelve las partes."""
+        logger = logging.getLogger(__name__)
+        entry = self._load(key)
+        if entry is None:
+            if os.path.isdir(self._entry_dir(key)):
+                logger.debug("splitcache: entrada %s inválida, se descarta", key)
+                self._remove(key)
+            return None
+        base = os.path.join(self._entry_dir(key), 'files')
+        methods = set()
+        for rel in entry['files']:
+            methods.add(link_or_copy(os.path.join(base, rel), os.path.join(output_dir, rel)))
+        try:
+            os.utime(self._entry_dir(key), None)  # marcar como usada (LRU)
+        except OSError:
+            pass
+        logger.info("splitcache: %d ficheros servidos desde la caché (%s)", len(entry['files']), ','.join(sorted(methods)))
+        return [os.path.join(output_dir, rel) for rel in entry['outputs']]
+
+    def store(self, key: str, output_dir: str, outputs: List[str],
+              before: Optional[Dict[str, Tuple[int, int]]] = None, subdirs: Iterable[str] = ()) -> bool:
+        """Guarda bajo `key` los ficheros que el corte escribió en `output_dir`.
+
+        `before` es el `snapshot_outputs(output_dir, subdirs)` previo al corte: sólo se
+        guardan los ficheros de salida nuevos o modificados desde entonces.
+        """
+        logger = logging.getLogger(__name__)
+        before = before or {}
+        written = [rel for rel, stat in snapshot_outputs(output_dir, subdirs).items() if before.get(rel) != stat]
+        rel_outputs = [os.path.relpath(p, output_dir) for p in outputs]
+        if not written or any(rel not in written for rel in rel_outputs):
+            return False
+        final = self._entry_dir(key)
+        tmp = final + '.tmp-%d-%d' % (os.getpid(), threading.get_ident())
+        shutil.rmtree(tmp, ignore_errors=True)
+        try:
+            files = {}
+            for rel in written:
+                dst = os.path.join(tmp, 'files', rel)
+                link_or_copy(os.path.join(output_dir, rel), dst)
+                st = os.stat(dst)
+                files[rel] = (st.st_size, st.st_mtime_ns)
+            entry = {'version': CACHE_VERSION, 'created': int(time.time()), 'files': files, 'outputs': rel_outputs}
+            with open(os.path.join(tmp, ENTRY_FILE), 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            with self._lock:
+                self._remove(key)
+                os.replace(tmp, final)
+        except OSError:
+            logger.debug("splitcache: no se pudo guardar la entrada %s", key, exc_info=True)
+            shutil.rmtree(tmp, ignore_errors=True)
+            return False
+        logger.debug("splitcache: guardados %d ficheros en %s", len(written), final)
+        self.evict(keep=key)
+        return True
+
+    def _remove(self, key: str) -> None:
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for e in it:
+                    if not e.is_dir() or '.tmp-' in e.name:
+                        continue
+                    size = sum(st[0] for st in snapshot_dir(e.path).values())
+                    entries.append((e.stat().st_mtime, size, e.name))
+        except OSError:
+            pass
+        return entries
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """Borrar las entradas menos usadas hasta quedar por debajo de `max_bytes`."""
+        with self._lock:
+            entries = self._entries()
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, key in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                self._remove(key)
+                total -= size
+                removed += 1
+            return removed
+
+    def purge(self) -> int:
+        """Vaciar la caché. Devuelve el número de entradas borradas."""
+        with self._lock:
+            entries = self._entries()
+            for _, _, key in entries:
+                self._remove(key)
+            return len(entries)
+
+
+_split_cache: Optional[SplitCache] = None
+_split_cache_enabled = True
+_split_cache_lock = threading.Lock()
+
+
+def configure(settings: Optional[dict] = None) -> None:
+    """Aplicar la clave `split_cache` de los ajustes (`enabled`, `cache_mb`, `dir`)."""
+    global _split_cache, _split_cache_enabled
+    s = dict(settings or {})
+    with _split_cache_lock:
+        _split_cache_enabled = bool(s.get('enabled', True))
+        _split_cache = SplitCache(s.get('dir') or None, int(s.get('cache_mb', 8192)) * 1024 * 1024)
+
+
+def get_split_cache() -> Optional[SplitCache]:
+    """Caché compartida del proceso, o None si está desactivada (ajustes o PYVID_SPLIT_CACHE=0)."""
+    global _split_cache
+    if os.environ.get('PYVID_SPLIT_CACHE', '').lower() in ('0', 'false', 'no'):
+        return None
+    with _split_cache_lock:
+        if not _split_cache_enabled:
+            return None
+        if _split_cache is None:
+            _split_cache = SplitCache()
+        return _split_cache
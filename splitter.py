@@ -1,9 +1,14 @@
 import os
-from typing import List
+from typing import List, Optional, Tuple
 import traceback
 import subprocess
 import shutil
 import logging
+import asyncio
+import weakref
+
+from runner import run_captured_async, progress_time_ms
+from profiling import profiled
 
 
 def _find_ffmpeg_executable():
@@ -31,7 +36,145 @@ def _find_ffmpeg_executable():
     return None
 
 
+# Límite de ffmpeg simultáneos lanzados por el splitter (un semáforo por bucle de eventos)
+_max_jobs: Optional[int] = None
+_job_semaphores = weakref.WeakKeyDictionary()
+
+
+def set_concurrency_limit(max_jobs: Optional[int]) -> None:
+    """Fija cuántos ffmpeg/ffprobe del splitter pueden correr a la vez en cada bucle asyncio.
+
+    None vuelve al valor por defecto: PYVID_MAX_JOBS o la mitad de los núcleos (mínimo 1).
+    """
+    global _max_jobs
+    _max_jobs = max(1, int(max_jobs)) if max_jobs else None
+    _job_semaphores.clear()
+
+
+def _job_slots() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    sem = _job_semaphores.get(loop)
+    if sem is None:
+        limit = _max_jobs
+        if limit is None:
+            try:
+                limit = int(os.environ.get('PYVID_MAX_JOBS', '0'))
+            except ValueError:
+                limit = 0
+            limit = limit if limit > 0 else max(1, (os.cpu_count() or 2) // 2)
+        sem = _job_semaphores[loop] = asyncio.Semaphore(limit)
+    return sem
+
+
+async def _run(cmd: List[str], on_time=None) -> subprocess.CompletedProcess:
+    """Ejecuta `cmd` a través del gobernador de recursos (prioridad, afinidad, hilos) con
+    la salida capturada de forma acotada (principio y final de stderr, ver runner.py).
+
+    `on_time(ms)` recibe la posición de codificación (`time=` de ffmpeg) según avanza.
+    Espera turno en el límite de concurrencia (`set_concurrency_limit`); si la tarea se
+    cancela, el ffmpeg en marcha se mata.
+    """
+    progress = None
+    if on_time is not None:
+        def progress(fields):
+            t = progress_time_ms(fields)
+            if t is not None:
+                on_time(t)
+    async with _job_slots():
+        return await run_captured_async(cmd, progress_cb=progress)
+
+
+def _run_sync(coro):
+    """Ejecuta una corrutina del splitter desde código síncrono (la API clásica)."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    coro.close()
+    raise RuntimeError('Hay un bucle asyncio en marcha en este hilo: usa la versión *_async de la función.')
+
+
+async def _gather_all(aws) -> list:
+    """Como asyncio.gather, pero si una falla se cancelan las demás (matando sus ffmpeg)."""
+    tasks = [asyncio.ensure_future(a) for a in aws]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def _threadsafe_progress(progress_cb):
+    """Adaptar `progress_cb` para llamarlo desde un hilo (asyncio.to_thread) sin salir del bucle."""
+    if progress_cb is None:
+        return None
+    loop = asyncio.get_running_loop()
+    return lambda done, total: loop.call_soon_threadsafe(progress_cb, done, total)
+
+
+class AsyncJob:
+    """Tarea asyncio de una operación del splitter con su progreso como iterador asíncrono.
+
+        job = AsyncJob(split_video_async, path, out_dir, 60)
+        async for done, total in job:
+            ...
+        parts = await job
+
+    El iterador entrega el último `(hechos, total)` disponible (los intermedios se
+    descartan si el consumidor va más lento) y termina al acabar la tarea.
+    `job.cancel()` cancela la tarea y mata los ffmpeg en marcha.
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        self._latest = None
+        self._event = asyncio.Event()
+        kwargs['progress_cb'] = self._on_progress
+        self.task = asyncio.ensure_future(fn(*args, **kwargs))
+        self.task.add_done_callback(lambda _t: self._event.set())
+
+    def _on_progress(self, done, total) -> None:
+        self._latest = (done, total)
+        self._event.set()
+
+    def cancel(self) -> bool:
+        return self.task.cancel()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while self._latest is None:
+            if self.task.done():
+                raise StopAsyncIteration
+            self._event.clear()
+            await self._event.wait()
+        item, self._latest = self._latest, None
+        return item
+
+    def __await__(self):
+        return self.task.__await__()
+
+
+def _time_reporter(progress_cb, offset_ms: int, total_ms: int):
+    """Adaptar `progress_cb(hechos, total)` a `on_time(ms)` de `_run` para un tramo que empieza en `offset_ms`."""
+    if progress_cb is None:
+        return None
+    return lambda t: progress_cb(min(total_ms, offset_ms + t), total_ms)
+
+
 def _probe_duration_with_ffprobe(ffprobe_cmd: str, input_path: str) -> float:
+    """Versión síncrona de `_probe_duration_async`."""
+    return _run_sync(_probe_duration_async(ffprobe_cmd, input_path))
+
+
+async def probe_duration_async(input_path: str, ffmpeg_exe: Optional[str] = None) -> float:
+    """Duración en segundos de `input_path` (ffprobe, o `ffmpeg -i` si no hay ffprobe)."""
+    return await _probe_duration_async(ffmpeg_exe or _find_ffmpeg_executable(), input_path)
+
+
+async def _probe_duration_async(ffprobe_cmd: str, input_path: str) -> float:
     """Usa ffprobe para obtener la duración en segundos. Lanza CalledProcessError si falla."""
     # Intentar ffprobe (si ffprobe está disponible en el mismo directorio que ffmpeg, probarlo)
     ffprobe = None
@@ -48,7 +191,7 @@ def _probe_duration_with_ffprobe(ffprobe_cmd: str, input_path: str) -> float:
     if ffprobe:
         # Comando que devuelve solo la duración
         cmd = [ffprobe, '-v', 'error', '-show_entries', 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', input_path]
-        proc = subprocess.run(cmd, capture_output=True, text=True)
+        proc = await _run(cmd)
         if proc.returncode == 0:
             out = proc.stdout.strip()
             try:
@@ -64,7 +207,7 @@ def _probe_duration_with_ffprobe(ffprobe_cmd: str, input_path: str) -> float:
         raise RuntimeError('No se encontró ffprobe ni ffmpeg para obtener la duración del archivo.')
 
     cmd = [ffmpeg, '-i', input_path]
-    proc = subprocess.run(cmd, capture_output=True, text=True)
+    proc = await _run(cmd)
     stderr = proc.stderr
     # Buscar 'Duration: 00:05:59.15'
     import re
@@ -76,20 +219,27 @@ def _probe_duration_with_ffprobe(ffprobe_cmd: str, input_path: str) -> float:
     return duration
 
 
-def _run_ffmpeg_segment(ffmpeg_cmd: str, input_path: str, start: float, dur: float, out_path: str) -> None:
+def _force_precise_enabled() -> bool:
+    """True si PYVID_SPLIT_FORCE_PRECISE pide recodificación precisa."""
+    return os.environ.get('PYVID_SPLIT_FORCE_PRECISE', '').lower() in ('1', 'true', 'yes')
+
+
+async def _run_ffmpeg_segment(ffmpeg_cmd: str, input_path: str, start: float, dur: float, out_path: str,
+                              precise: Optional[bool] = None) -> None:
     """Ejecuta ffmpeg para extraer un segmento. Intenta copia de streams y, si falla, recodifica.
 
     Si la variable de entorno PYVID_SPLIT_FORCE_PRECISE está establecida (1/true), se fuerza recodificación
     usando -i INPUT -ss START -t DUR para obtener cortes exactos (sin solapamientos), aunque más lentos.
+    `precise` (True/False) tiene prioridad sobre la variable (p. ej. trabajos de distributed.py).
     """
     logger = logging.getLogger(__name__)
-    force_precise = os.environ.get('PYVID_SPLIT_FORCE_PRECISE', '').lower() in ('1', 'true', 'yes')
+    force_precise = _force_precise_enabled() if precise is None else precise
 
     # Si no forzamos precisión, intentar copia directa (rápido, sin recodificar)
     if not force_precise:
         # -ss antes de -i suele ser más rápido; usar -t para la duración
         copy_cmd = [ffmpeg_cmd, '-y', '-ss', str(start), '-i', input_path, '-t', str(dur), '-c', 'copy', '-avoid_negative_ts', '1', out_path]
-        proc = subprocess.run(copy_cmd, capture_output=True, text=True)
+        proc = await _run(copy_cmd)
         if proc.returncode == 0:
             logger.debug("ffmpeg: used stream copy for start=%s dur=%s out=%s", start, dur, out_path)
             return
@@ -98,7 +248,7 @@ def _run_ffmpeg_segment(ffmpeg_cmd: str, input_path: str, start: float, dur: flo
 
     # Recodificar con -i antes de -ss para cortes exactos
     recode_cmd = [ffmpeg_cmd, '-y', '-i', input_path, '-ss', str(start), '-t', str(dur), '-c:v', 'libx264', '-preset', 'fast', '-crf', '23', '-c:a', 'aac', out_path]
-    proc2 = subprocess.run(recode_cmd, capture_output=True, text=True)
+    proc2 = await _run(recode_cmd)
     if proc2.returncode == 0:
         logger.debug("ffmpeg: used recode precise for start=%s dur=%s out=%s", start, dur, out_path)
         return
@@ -119,82 +269,752 @@ def _ms_to_seconds(ms: int) -> float:
     return ms / 1000.0
 
 
-def split_video(input_path: str, output_dir: str, segment_length: float) -> List[str]:
+def _plan_segments(total_ms: int, segment_ms: int) -> List[Tuple[int, int]]:
+    """Devuelve los segmentos `(start_ms, end_ms)` contiguos de `segment_ms` que cubren `total_ms`.
+    La última parte contiene el resto."""
+    segments = []
+    index = 0
+    while index * segment_ms < total_ms:
+        segments.append((index * segment_ms, min((index + 1) * segment_ms, total_ms)))
+        index += 1
+    return segments
+
+
+def _plan_split(input_path: str, duration: float, segment_length: float,
+                snap_tolerance: Optional[float] = None, ffmpeg_exe: Optional[str] = None) -> List[Tuple[int, int]]:
+    """Planifica los segmentos en ms. Con `snap_tolerance` (segundos) cada corte se ajusta al
+    cambio de escena o silencio más cercano dentro de esa tolerancia (ver analysis.py).
+    Si el análisis falla se usan los cortes fijos."""
+    segments = _plan_segments(_seconds_to_ms(duration), _seconds_to_ms(segment_length))
+    if snap_tolerance and len(segments) > 1:
+        logger = logging.getLogger(__name__)
+        try:
+            from analysis import analyze_media, snap_segments
+            result = analyze_media(input_path, ffmpeg_exe=ffmpeg_exe or _find_ffmpeg_executable())
+            segments = snap_segments(segments, result, _seconds_to_ms(snap_tolerance))
+            logger.debug("[splitter] cortes ajustados al contenido: %s", [s for s, _ in segments[1:]])
+        except Exception as e:
+            logger.warning("No se pudo analizar el contenido para ajustar los cortes (%s); se usan cortes fijos.", e)
+    return segments
+
+
+def _clear_parts(directory: str, ext: str = 'mp4') -> int:
+    """Borrar las partes `VID-NNNN.<ext>` que haya en `directory` (de un corte anterior).
+
+    Con los muxers `segment`/`hls` ffmpeg decide cuántas partes escribe: una parte vieja
+    con el mismo nombre no debe pasar por una de este corte.
+    """
+    removed = 0
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return 0
+    for name in names:
+        stem, dot, suffix = name.partition('.')
+        if suffix == ext and stem.startswith('VID-') and stem[4:].isdigit():
+            try:
+                os.remove(os.path.join(directory, name))
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def _frame_time_delta(fps) -> str:
+    """Valor de `-segment_time_delta`: medio intervalo entre fotogramas (lo que recomienda
+    la documentación de ffmpeg junto con `-force_key_frames`).
+
+    El IDR forzado en una frontera puede llegar al muxer con un timestamp un pelo por
+    debajo de ella (redondeo entre bases de tiempo) y el corte se iría al siguiente
+    fotograma clave; con medio fotograma de margen no puede adelantarse a otro fotograma.
+    `fps` es el de mediainfo ('30', '30000/1001', ...); si no se conoce se supone 60.
+    """
+    try:
+        if isinstance(fps, str) and '/' in fps:
+            num, den = fps.split('/', 1)
+            rate = float(num) / float(den)
+        else:
+            rate = float(fps)
+    except (TypeError, ValueError, ZeroDivisionError):
+        rate = 0.0
+    if not rate > 0:
+        rate = 60.0
+    return f"{0.5 / rate:.6f}"
+
+
+def _segment_list_path(directory: str, name: str = 'main') -> str:
+    """Ruta temporal para `-segment_list` de la salida `name` (se borra al leerla)."""
+    return os.path.join(directory, f".segments-{name}-{os.getpid()}.csv")
+
+
+async def _collect_segment_parts(ffmpeg_cmd: str, list_path: str, segments: List[Tuple[int, int]],
+                                 tolerance_ms: Optional[int] = 80) -> List[str]:
+    """Partes que el muxer `segment` escribió de verdad, comprobadas contra el plan.
+
+    Lee `-segment_list` (formato csv) en lugar de suponer los nombres y sondea la duración
+    de cada parte. Si alguna no coincide con su segmento o faltan/sobran partes, lanza
+    RuntimeError indicando qué corte falló. Con `tolerance_ms=None` (salidas con copia de
+    streams, que cortan en keyframes) sólo se comprueba el número de partes.
+    """
+    import csv
+
+    directory = os.path.dirname(list_path)
+    try:
+        with open(list_path, 'r', encoding='utf-8', newline='') as f:
+            rows = [row for row in csv.reader(f) if row]
+    except OSError as e:
+        raise RuntimeError(f"ffmpeg no escribió la lista de partes ({e})") from e
+    finally:
+        try:
+            os.remove(list_path)
+        except OSError:
+            pass
+    parts = [os.path.join(directory, row[0]) for row in rows]
+    durations = [] if tolerance_ms is None else await _gather_all(_probe_duration_async(ffmpeg_cmd, p) for p in parts)
+    for idx, ((start_ms, end_ms), dur) in enumerate(zip(segments, durations), start=1):
+        diff = _seconds_to_ms(dur) - (end_ms - start_ms)
+        if abs(diff) > tolerance_ms:
+            boundary = f"el corte en {_ms_to_seconds(end_ms):.3f}s" if diff > 0 else f"el corte en {_ms_to_seconds(start_ms):.3f}s o el final"
+            raise RuntimeError(f"La parte {idx} dura {dur:.3f}s en lugar de {_ms_to_seconds(end_ms - start_ms):.3f}s: "
+                               f"{boundary} no cayó en su sitio")
+    if len(parts) != len(segments):
+        raise RuntimeError(f"Se generaron {len(parts)} partes y se planificaron {len(segments)}")
+    return parts
+
+
+async def _split_precise_single_pass(ffmpeg_cmd: str, input_path: str, output_dir: str,
+                               segments: List[Tuple[int, int]], progress_cb=None) -> List[str]:
+    """Corte preciso decodificando la entrada una sola vez, de principio a fin.
+
+    Se usa el muxer `segment` de ffmpeg: un único proceso decodifica y recodifica todo el
+    fichero, se fuerzan fotogramas clave (IDR) exactamente en cada frontera en ms y el
+    muxer cierra el MP4 actual y abre el siguiente en ellas. Cada parte empieza en un
+    IDR y con timestamps reiniciados, así que es independiente. El coste total es
+    O(duración) sea cual sea el número de partes (antes, cada parte con `-i INPUT -ss START`
+    decodificaba desde el principio hasta START).
+
+    Las partes que se devuelven son las que ffmpeg escribió según `-segment_list`, con su
+    duración comprobada (`_collect_segment_parts`); si no cuadran con el plan se borran y
+    se lanza RuntimeError (el llamador corta entonces parte a parte).
+    """
+    from mediainfo import get_stream_info_async
+
+    logger = logging.getLogger(__name__)
+    try:
+        fps = ((await get_stream_info_async(input_path, ffmpeg_cmd)).get('video') or {}).get('fps')
+    except Exception:
+        fps = None
+    cut_times = ','.join(f"{_ms_to_seconds(start_ms):.3f}" for start_ms, _ in segments[1:])
+    pattern = os.path.join(output_dir, 'VID-%04d.mp4')
+    list_path = _segment_list_path(output_dir)
+    _clear_parts(output_dir)
+    cmd = [ffmpeg_cmd, '-y', '-i', input_path]
+    if segments and segments[0][0] > 0:
+        cmd += ['-ss', f"{_ms_to_seconds(segments[0][0]):.3f}"]
+    cmd += ['-t', f"{_ms_to_seconds(segments[-1][1] - segments[0][0]):.3f}",
+            '-c:v', 'libx264', '-preset', 'fast', '-crf', '23', '-forced-idr', '1', '-c:a', 'aac']
+    if cut_times:
+        cmd += ['-force_key_frames', cut_times, '-f', 'segment', '-segment_times', cut_times,
+                '-segment_time_delta', _frame_time_delta(fps)]
+    else:
+        cmd += ['-f', 'segment']
+    cmd += ['-reset_timestamps', '1', '-segment_start_number', '1',
+            '-segment_list', list_path, '-segment_list_type', 'csv', pattern]
+    logger.debug("[splitter][single-pass] %d partes, cortes en: %s", len(segments), cut_times)
+    proc = await _run(cmd, on_time=_time_reporter(progress_cb, 0, segments[-1][1] - segments[0][0]))
+    try:
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg falló en el corte preciso de una pasada:\n{proc.stderr[-4000:]}")
+        return await _collect_segment_parts(ffmpeg_cmd, list_path, segments)
+    except Exception:
+        # no dejar partes a medias que el corte parte a parte no sobrescribiría
+        _clear_parts(output_dir)
+        try:
+            os.remove(list_path)
+        except OSError:
+            pass
+        raise
+
+
+def _encoder_args(spec: dict, kind: str) -> List[str]:
+    """Opciones `-c:v`/`-c:a` de una salida declarada en un perfil (ver profiles.py)."""
+    flag = 'v' if kind == 'video' else 'a'
+    codec = spec.get('codec', 'libx264' if kind == 'video' else 'aac')
+    args = [f'-c:{flag}', codec]
+    if codec == 'copy':
+        return args
+    if spec.get('preset'):
+        args += ['-preset', str(spec['preset'])]
+    if spec.get('crf') is not None:
+        args += ['-crf', str(spec['crf'])]
+    if spec.get('bitrate'):
+        args += [f'-b:{flag}', str(spec['bitrate'])]
+    if spec.get('gop'):
+        args += ['-g', str(spec['gop'])]
+    return args
+
+
+async def _split_multi_output(ffmpeg_cmd: str, input_path: str, output_dir: str,
+                        segments: List[Tuple[int, int]], outputs_spec: List[dict], progress_cb=None) -> dict:
+    """Corte con varias salidas a partir de una única decodificación (perfiles de salida).
+
+    Un solo ffmpeg lee y decodifica el rango cortado una vez; `filter_complex` reparte el
+    vídeo con `split` y escala cada rama, y cada salida tiene su codificador: salidas
+    `segments` con el muxer `segment` (cortes en las mismas fronteras en ms, con IDR
+    forzados como en `_split_precise_single_pass`) y salidas `hls` con una variante por
+    escalón y una playlist maestra. Devuelve `{nombre: [rutas]}` (para `hls`,
+    `{'master': ruta, 'variants': [...]}`); `main` son las partes `VID-NNNN.mp4`.
+
+    Las partes de cada salida `segments` se toman de su `-segment_list` y se comprueban
+    como en el corte de una pasada; si alguna no cuadra se borran y el RuntimeError dice
+    qué salida y qué corte fallaron.
+    """
+    from mediainfo import get_stream_info_async
+
+    logger = logging.getLogger(__name__)
+    try:
+        src = (await get_stream_info_async(input_path, ffmpeg_cmd)).get('video') or {}
+    except Exception:
+        src = {}
+    src_w, src_h = src.get('width'), src.get('height')
+
+    def capped(height):
+        # no escalar hacia arriba
+        if height and src_h and height >= src_h:
+            return None
+        return height
+
+    start_ms, end_ms = segments[0][0], segments[-1][1]
+    cut_times = ','.join(f"{_ms_to_seconds(s - start_ms):.3f}" for s, _ in segments[1:])
+    cmd = [ffmpeg_cmd, '-y']
+    if start_ms > 0:
+        cmd += ['-ss', f"{_ms_to_seconds(start_ms):.3f}"]
+    cmd += ['-t', f"{_ms_to_seconds(end_ms - start_ms):.3f}", '-i', input_path]
+
+    # Ramas de vídeo que pasan por el grafo de filtros (todas salvo las de copia)
+    branches = []  # (altura o None) por rama
+    plan = []      # (salida, [índices de rama] o None si es copia)
+    for out in outputs_spec:
+        if out['kind'] == 'hls':
+            # escalones que superan la resolución original no aportan nada: se omiten
+            ladder = [r for r in out['ladder'] if not (src_h and r.get('height') and r['height'] > src_h)]
+            out['ladder'] = ladder or [min(out['ladder'], key=lambda r: r.get('height') or 0)]
+            idx = []
+            for rung in out['ladder']:
+                idx.append(len(branches))
+                branches.append(capped(rung.get('height')))
+            plan.append((out, idx))
+        elif (out.get('video') or {}).get('codec') == 'copy':
+            plan.append((out, None))
+        else:
+            plan.append((out, [len(branches)]))
+            branches.append(capped(out.get('height')))
+
+    labels = []
+    if branches:
+        graph = [f"[0:v:0]split={len(branches)}" + ''.join(f"[s{i}]" for i in range(len(branches)))] if len(branches) > 1 else []
+        for i, height in enumerate(branches):
+            source = f"[s{i}]" if len(branches) > 1 else "[0:v:0]"
+            graph.append(f"{source}{'scale=-2:%d' % height if height else 'null'}[o{i}]")
+        cmd += ['-filter_complex', ';'.join(graph)]
+        labels = [f"[o{i}]" for i in range(len(branches))]
+
+    results: dict = {}
+    segment_lists = []  # (nombre, carpeta, lista, tolerancia) de las salidas `segments`
+    for out, idx in plan:
+        out_dir = os.path.join(output_dir, out['dir']) if out.get('dir') else output_dir
+        os.makedirs(out_dir, exist_ok=True)
+        vspec = out.get('video') or {}
+        aspec = out.get('audio') or {}
+        if out['kind'] == 'segments':
+            vmap = '0:v:0' if idx is None else labels[idx[0]]
+            cmd += ['-map', vmap, '-map', '0:a:0?'] + _encoder_args(vspec, 'video') + _encoder_args(aspec, 'audio')
+            if idx is not None and cut_times:
+                cmd += ['-force_key_frames', cut_times]
+                if vspec.get('codec', 'libx264') == 'libx264':
+                    cmd += ['-forced-idr', '1']
+            cmd += ['-f', 'segment']
+            if cut_times:
+                cmd += ['-segment_times', cut_times, '-segment_time_delta', _frame_time_delta(src.get('fps'))]
+            list_path = _segment_list_path(out_dir, out['name'])
+            _clear_parts(out_dir)
+            cmd += ['-reset_timestamps', '1', '-segment_start_number', '1',
+                    '-segment_list', list_path, '-segment_list_type', 'csv', os.path.join(out_dir, 'VID-%04d.mp4')]
+            # con copia de vídeo los cortes caen en keyframes: sólo se comprueba el número de partes
+            segment_lists.append((out['name'], out_dir, list_path, None if idx is None else 80))
+            results[out['name']] = []  # se rellena con las partes escritas (orden del perfil)
+        else:
+            hls_time = int(out.get('hls_time', 4))
+            variants = []
+            for rung, bi in zip(out['ladder'], idx):
+                height = branches[bi] or src_h
+                name = f"{height}p" if height else f"v{bi}"
+                rung_dir = os.path.join(out_dir, name)
+                os.makedirs(rung_dir, exist_ok=True)
+                rate = str(rung.get('bitrate', '1500k'))
+                vargs = dict(vspec, bitrate=rate)
+                vargs.pop('crf', None)
+                cmd += ['-map', labels[bi], '-map', '0:a:0?'] + _encoder_args(vargs, 'video')
+                cmd += ['-maxrate', rate, '-bufsize', rate, '-sc_threshold', '0',
+                        '-force_key_frames', f"expr:gte(t,n_forced*{hls_time})"]
+                cmd += _encoder_args(dict(aspec, bitrate=rung.get('audio_bitrate', aspec.get('bitrate', '128k'))), 'audio')
+                cmd += ['-f', 'hls', '-hls_time', str(hls_time), '-hls_playlist_type', 'vod',
+                        '-hls_segment_filename', os.path.join(rung_dir, 'seg-%05d.ts'), os.path.join(rung_dir, 'index.m3u8')]
+                width = int(round(src_w * height / src_h / 2.0)) * 2 if (src_w and src_h and height) else None
+                variants.append({'playlist': os.path.join(rung_dir, 'index.m3u8'), 'height': height, 'width': width,
+                                 'bandwidth': _bitrate_to_bps(rate) + _bitrate_to_bps(rung.get('audio_bitrate', '128k'))})
+            results[out['name']] = {'master': os.path.join(out_dir, 'master.m3u8'), 'variants': variants}
+
+    logger.debug("[splitter][multi] salidas=%s ramas=%s cortes=%s", [o['name'] for o in outputs_spec], branches, cut_times)
+    proc = await _run(cmd, on_time=_time_reporter(progress_cb, 0, end_ms - start_ms))
+    try:
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg falló en el corte con varias salidas:\n{proc.stderr[-4000:]}")
+        for name, out_dir, list_path, tolerance in segment_lists:
+            try:
+                results[name] = await _collect_segment_parts(ffmpeg_cmd, list_path, segments, tolerance)
+            except RuntimeError as e:
+                raise RuntimeError(f"La salida '{name}' no cuadra con el plan: {e}") from e
+    except Exception:
+        for _name, out_dir, list_path, _tolerance in segment_lists:
+            _clear_parts(out_dir)
+            try:
+                os.remove(list_path)
+            except OSError:
+                pass
+        raise
+
+    for res in results.values():
+        if isinstance(res, dict):
+            _write_hls_master(res['master'], res['variants'])
+    return results
+
+
+def _bitrate_to_bps(value) -> int:
+    """'800k' / '2.5M' / 128000 -> bits por segundo."""
+    text = str(value).strip().lower()
+    mult = 1
+    if text.endswith('k'):
+        mult, text = 1000, text[:-1]
+    elif text.endswith('m'):
+        mult, text = 1000000, text[:-1]
+    try:
+        return int(float(text) * mult)
+    except ValueError:
+        return 0
+
+
+def _write_hls_master(master_path: str, variants: List[dict]) -> None:
+    """Escribe la playlist maestra HLS con una entrada por variante."""
+    base = os.path.dirname(master_path)
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+    for v in sorted(variants, key=lambda v: v['bandwidth']):
+        attrs = f"BANDWIDTH={v['bandwidth']}"
+        if v.get('width') and v.get('height'):
+            attrs += f",RESOLUTION={v['width']}x{v['height']}"
+        lines.append(f"#EXT-X-STREAM-INF:{attrs}")
+        lines.append(os.path.relpath(v['playlist'], base).replace(os.sep, '/'))
+    with open(master_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+HLS_FORMATS = ('hls-ts', 'hls-fmp4')
+
+
+async def _split_hls(ffmpeg_cmd: str, input_path: str, output_dir: str, segments: List[Tuple[int, int]],
+               segment_length: float, container: str, progress_cb=None) -> Tuple[List[str], str]:
+    """Corte directo a segmentos HLS (`container` 'ts' o 'fmp4') más `index.m3u8`, en una pasada.
+
+    Misma estrategia que el corte a MP4: copia de streams salvo con
+    PYVID_SPLIT_FORCE_PRECISE (o si la copia falla), en cuyo caso se recodifica forzando
+    fotogramas clave exactamente en las fronteras en ms de `segments`.
+
+    - TS: muxer `segment` con `-segment_times` (fronteras arbitrarias, también con copia:
+      cada corte cae en el primer keyframe desde la frontera) y `-segment_time_delta` de
+      medio fotograma, para que el IDR forzado en la frontera no se quede fuera del corte.
+    - fMP4: muxer `hls` con `init.mp4` (EXT-X-MAP). Recodificando no hay más keyframes que
+      los forzados y `-hls_time` mínimo corta en cada uno; con copia se corta cada
+      `segment_length` (los cortes ajustados al contenido sólo se respetan recodificando).
+
+    Recodificando, los segmentos deben seguir el plan: si alguno se sale de la tolerancia
+    (ver `_verify_hls`) se lanza RuntimeError. Devuelve `(partes, ruta del m3u8)`.
+    """
+    from mediainfo import get_stream_info_async
+
+    logger = logging.getLogger(__name__)
+    try:
+        fps = ((await get_stream_info_async(input_path, ffmpeg_cmd)).get('video') or {}).get('fps')
+    except Exception:
+        fps = None
+    start_ms, end_ms = segments[0][0], segments[-1][1]
+    cut_times = ','.join(f"{_ms_to_seconds(s - start_ms):.3f}" for s, _ in segments[1:])
+    playlist = os.path.join(output_dir, 'index.m3u8')
+    ext = 'ts' if container == 'ts' else 'm4s'
+    pattern = os.path.join(output_dir, f'VID-%04d.{ext}')
+
+    def command(precise: bool) -> List[str]:
+        cmd = [ffmpeg_cmd, '-y']
+        if start_ms > 0:
+            cmd += ['-ss', f"{_ms_to_seconds(start_ms):.3f}"]
+        cmd += ['-t', f"{_ms_to_seconds(end_ms - start_ms):.3f}", '-i', input_path, '-map', '0:v:0', '-map', '0:a:0?']
+        if precise:
+            cmd += ['-c:v', 'libx264', '-preset', 'fast', '-crf', '23', '-c:a', 'aac', '-sc_threshold', '0']
+            if cut_times:
+                cmd += ['-force_key_frames', cut_times, '-forced-idr', '1']
+            if container == 'fmp4':
+                cmd += ['-g', '100000']
+        else:
+            cmd += ['-c', 'copy']
+        if container == 'ts':
+            cmd += ['-f', 'segment']
+            if cut_times:
+                cmd += ['-segment_times', cut_times, '-segment_time_delta', _frame_time_delta(fps)]
+            if precise:
+                # sin desplazar los timestamps para evitar DTS negativos (los B-frames): ese
+                # desplazamiento alargaba el primer segmento en el m3u8; en TS no hacen falta
+                # (el muxer añade su propio retardo)
+                cmd += ['-avoid_negative_ts', 'disabled']
+            cmd += ['-segment_format', 'mpegts', '-segment_list', playlist, '-segment_list_type', 'm3u8',
+                    '-segment_start_number', '1', pattern]
+        else:
+            hls_time = '0.001' if precise else f"{segment_length:g}"
+            cmd += ['-f', 'hls', '-hls_time', hls_time, '-hls_playlist_type', 'vod', '-hls_segment_type', 'fmp4',
+                    '-hls_fmp4_init_filename', 'init.mp4', '-start_number', '1',
+                    '-hls_segment_filename', pattern, playlist]
+        return cmd
+
+    on_time = _time_reporter(progress_cb, 0, end_ms - start_ms)
+    precise = _force_precise_enabled()
+    _clear_parts(output_dir, ext)
+    proc = await _run(command(precise), on_time=on_time)
+    if proc.returncode != 0 and not precise:
+        logger.debug("ffmpeg: copia a HLS falló, se recodifica. stderr: %s", proc.stderr[-2000:])
+        precise = True
+        proc = await _run(command(True), on_time=on_time)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg falló al generar HLS:\n{proc.stderr[-4000:]}")
+    logger.debug("[splitter][hls] contenedor=%s %s cortes=%s", container, 'recode' if precise else 'copy', cut_times)
+    parts = [os.path.join(output_dir, name) for name, _ in _read_m3u8(playlist)]
+    bad = _verify_hls(playlist, segments, precise)
+    if bad and precise:
+        raise RuntimeError(f"HLS recodificado: {bad} segmento(s) no siguen los cortes planificados (ver el log)")
+    return parts, playlist
+
+
+def _read_m3u8(playlist: str) -> List[Tuple[str, float]]:
+    """Entradas `(uri, duración_s)` de una playlist de medios."""
+    entries = []
+    dur = None
+    with open(playlist, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('#EXTINF:'):
+                try:
+                    dur = float(line[8:].split(',')[0])
+                except ValueError:
+                    dur = None
+            elif line and not line.startswith('#'):
+                entries.append((line, dur))
+                dur = None
+    return entries
+
+
+def _verify_hls(playlist: str, segments: List[Tuple[int, int]], precise: bool, tolerance_ms: int = 80) -> int:
+    """Compara las duraciones de la playlist con los segmentos planificados y lo registra.
+
+    Los segmentos HLS no se regraban por separado (romperían la continuidad de timestamps
+    entre partes); con copia de streams es normal que los cortes caigan en keyframes.
+    Devuelve el número de partes fuera de tolerancia (un número de segmentos distinto del
+    planificado cuenta como una más); recodificando, `_split_hls` lo trata como error.
+    """
+    logger = logging.getLogger(__name__)
+    entries = _read_m3u8(playlist)
+    bad = 0
+    if len(entries) != len(segments):
+        bad += 1
+        logger.log(logging.WARNING if precise else logging.INFO,
+                   "HLS: %d segmentos generados, %d planificados", len(entries), len(segments))
+    for idx, ((uri, dur), (s, e)) in enumerate(zip(entries, segments), start=1):
+        if dur is None:
+            continue
+        diff = _seconds_to_ms(dur) - (e - s)
+        if abs(diff) > tolerance_ms:
+            bad += 1
+            logger.log(logging.WARNING if precise else logging.DEBUG,
+                       "Segmento HLS %d (%s) duración %dms != esperada %dms (%+dms)", idx, uri, e - s + diff, e - s, diff)
+    logger.info("Verificación HLS completa. %d segmentos (%d planificados); fuera de tolerancia: %d",
+                len(entries), len(segments), bad)
+    return bad
+
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def _write_manifest(output_dir: str, input_path: str, segments: List[Tuple[int, int]], outputs: dict,
+                    profile=None) -> Optional[str]:
+    """Guarda `manifest.json` en `output_dir` con la entrada, los segmentos (ms) y las salidas
+    generadas por nombre (rutas relativas a `output_dir`). Devuelve su ruta o None si falla."""
+    import json
+    import time
+
+    def rel(value):
+        if isinstance(value, str):
+            return os.path.relpath(value, output_dir).replace(os.sep, '/')
+        if isinstance(value, list):
+            return [rel(v) for v in value]
+        if isinstance(value, dict):
+            return {k: (rel(v) if k in ('master', 'playlist', 'variants') else v) for k, v in value.items()}
+        return value
+
+    manifest = {
+        'version': 1,
+        'created': int(time.time()),
+        'input': os.path.abspath(input_path),
+        'profile': profile if isinstance(profile, str) or profile is None else 'custom',
+        'segments': [[s, e] for s, e in segments],
+        'outputs': {name: rel(value) for name, value in outputs.items()},
+    }
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, path)
+        return path
+    except Exception:
+        logging.getLogger(__name__).debug("No se pudo escribir el manifiesto en %s", output_dir, exc_info=True)
+        return None
+
+
+def split_video(input_path: str, output_dir: str, segment_length: float,
+                snap_tolerance: Optional[float] = None, profile=None,
+                extra_profiles: Optional[dict] = None, output_format: Optional[str] = None,
+                progress_cb=None) -> List[str]:
+    """Versión síncrona de `split_video_async` (mismos argumentos y resultado)."""
+    return _run_sync(split_video_async(input_path, output_dir, segment_length, snap_tolerance, profile,
+                                       extra_profiles, output_format, progress_cb))
+
+
+@profiled('split_video')
+async def split_video_async(input_path: str, output_dir: str, segment_length: float,
+                            snap_tolerance: Optional[float] = None, profile=None,
+                            extra_profiles: Optional[dict] = None, output_format: Optional[str] = None,
+                            progress_cb=None) -> List[str]:
     """Divide `input_path` en fragmentos de `segment_length` segundos.
     La última parte contiene el resto si no cabe exactamente.
     Devuelve la lista de rutas de archivos escritos (MP4).
 
+    Si `snap_tolerance` (segundos) es > 0, cada corte se desplaza como mucho esa cantidad
+    hasta el cambio de escena o silencio más cercano (análisis en una pasada con NumPy,
+    cacheado por fichero).
+
+    `profile` (nombre de `profiles.OUTPUT_PROFILES`/`extra_profiles` o lista de salidas; por
+    defecto la variable PYVID_SPLIT_PROFILE) genera en la misma pasada salidas adicionales,
+    p. ej. un proxy 360p por parte o una escalera HLS. Todas quedan en `manifest.json`.
+
+    `output_format` (o PYVID_SPLIT_FORMAT): 'mp4' (por defecto, MP4 independientes),
+    'hls-ts' o 'hls-fmp4' (segmentos TS / MP4 fragmentado más `index.m3u8`, escritos
+    directamente en una pasada; ver `_split_hls`).
+
+    `progress_cb(hechos_ms, total_ms)` es opcional: se llama según avanza ffmpeg (o al
+    terminar cada parte cuando se corta parte a parte).
+
     Si moviepy está disponible se usa (recodificando con libx264/aac).
-    Si no, se intentará usar ffmpeg (copiando streams si es posible, con fallback a recodificación).
+    Si no, se intentará usar ffmpeg (copiando streams si es posible, con fallback a recodificación);
+    las partes se extraen en paralelo dentro del límite de `set_concurrency_limit`.
+
+    Cancelar la tarea mata los ffmpeg en marcha (el corte con moviepy, que corre en un
+    hilo, termina la parte en curso antes de parar).
+
+    Un corte repetido (misma huella de la entrada y mismas opciones) se sirve desde la
+    caché de cortes sin lanzar ffmpeg (ver splitcache.py).
     """
     if segment_length <= 0:
         raise ValueError("segment_length debe ser > 0")
 
-    # Intentar moviepy primero
+    from splitcache import get_split_cache, snapshot_outputs, detach_links
+
+    logger = logging.getLogger(__name__)
+    # subcarpetas que escriben las salidas del perfil: lo único que se recorre además de
+    # las partes de la raíz (la carpeta elegida puede ser, p. ej., toda la de vídeos)
+    subdirs = _profile_output_dirs(profile, extra_profiles)
+    cache = get_split_cache()
+    key = before = None
+    if cache is not None:
+        try:
+            key = await asyncio.to_thread(cache.key_for, input_path, _split_cache_options(
+                segment_length, snap_tolerance, profile, extra_profiles, output_format))
+            os.makedirs(output_dir, exist_ok=True)
+            served = await asyncio.to_thread(cache.serve, key, output_dir)
+            if served is not None:
+                if progress_cb is not None:
+                    progress_cb(1, 1)
+                return served
+            before = await asyncio.to_thread(snapshot_outputs, output_dir, subdirs)
+        except (OSError, ValueError):
+            logger.debug("splitcache: no disponible para %s", input_path, exc_info=True)
+            key = None
+        # sin caché no hay hardlinks nuestros que separar
+        if os.path.isdir(output_dir):
+            await asyncio.to_thread(detach_links, output_dir, subdirs)
+
+    outputs = await _split_video_uncached(input_path, output_dir, segment_length, snap_tolerance, profile,
+                                          extra_profiles, output_format, progress_cb)
+    if key is not None:
+        try:
+            await asyncio.to_thread(cache.store, key, output_dir, outputs, before, subdirs)
+        except OSError:
+            logger.debug("splitcache: no se pudo guardar el corte de %s", input_path, exc_info=True)
+    return outputs
+
+
+def _profile_output_dirs(profile, extra_profiles: Optional[dict]) -> List[str]:
+    """Subcarpetas (relativas a la de salida) que escriben las salidas del perfil."""
+    if profile is None:
+        profile = os.environ.get('PYVID_SPLIT_PROFILE') or None
+    if profile is None:
+        return []
+    from profiles import resolve_profile
     try:
-        from moviepy.editor import VideoFileClip
-        have_moviepy = True
-    except Exception as e:
-        have_moviepy = False
-        moviepy_exc = e
+        outputs_spec = resolve_profile(profile, extra_profiles)
+    except ValueError:
+        return []  # el corte lo rechazará con su propio error
+    dirs = []
+    for out in outputs_spec:
+        if out.get('dir'):
+            dirs.append(out['dir'])
+        elif out['kind'] == 'hls':
+            # escalera sin `dir`: una carpeta por variante en la raíz (ver _split_multi_output)
+            dirs.extend(f"{rung['height']}p" for rung in out['ladder'] if rung.get('height'))
+    return dirs
 
-    os.makedirs(output_dir, exist_ok=True)
-    base_name, _ = os.path.splitext(os.path.basename(input_path))
-    outputs: List[str] = []
 
-    logger = logging.getLogger(__name__)
+_moviepy_error: Optional[Exception] = None
+_moviepy_checked = False
 
-    if have_moviepy:
+
+def _moviepy_import_error() -> Optional[Exception]:
+    """None si `moviepy.editor` se puede importar (el corte usa moviepy); si no, el error.
+
+    moviepy 2.x no tiene `editor`: con él se corta con ffmpeg. El resultado se recuerda.
+    """
+    global _moviepy_error, _moviepy_checked
+    if not _moviepy_checked:
         try:
-            clip = VideoFileClip(input_path)
+            from moviepy.editor import VideoFileClip  # noqa: F401
         except Exception as e:
-            tb = traceback.format_exc()
-            raise RuntimeError(f"Error al abrir el archivo de vídeo con moviepy:\n{tb}") from e
+            _moviepy_error = e
+        _moviepy_checked = True
+    return _moviepy_error
+
+
+def _split_cache_options(segment_length: float, snap_tolerance: Optional[float], profile,
+                         extra_profiles: Optional[dict], output_format: Optional[str]) -> dict:
+    """Opciones de corte normalizadas para la clave de la caché (mismos valores por defecto que el corte)."""
+    if profile is None:
+        profile = os.environ.get('PYVID_SPLIT_PROFILE') or None
+    output_format = (output_format or os.environ.get('PYVID_SPLIT_FORMAT') or 'mp4').lower()
+    outputs_spec = None
+    if profile is not None:
+        from profiles import resolve_profile
+        outputs_spec = resolve_profile(profile, extra_profiles)
+    precise = _force_precise_enabled()
+    engine = 'ffmpeg'
+    if not precise and outputs_spec is None and output_format == 'mp4' and _moviepy_import_error() is None:
+        engine = 'moviepy'
+    return {'segment_ms': _seconds_to_ms(segment_length),
+            'snap_ms': _seconds_to_ms(snap_tolerance) if snap_tolerance else 0,
+            'format': output_format, 'outputs': outputs_spec, 'precise': precise, 'engine': engine}
 
+
+async def _split_video_uncached(input_path: str, output_dir: str, segment_length: float,
+                                snap_tolerance: Optional[float] = None, profile=None,
+                                extra_profiles: Optional[dict] = None, output_format: Optional[str] = None,
+                                progress_cb=None) -> List[str]:
+    logger = logging.getLogger(__name__)
+
+    if profile is None:
+        profile = os.environ.get('PYVID_SPLIT_PROFILE') or None
+    output_format = (output_format or os.environ.get('PYVID_SPLIT_FORMAT') or 'mp4').lower()
+    if output_format not in ('mp4',) + HLS_FORMATS:
+        raise ValueError(f"Formato de salida no soportado: {output_format}")
+    if output_format in HLS_FORMATS:
+        if profile is not None:
+            raise ValueError("Los perfiles de salida sólo generan partes MP4; usa una salida 'hls' en el perfil.")
+        ffmpeg_exe = _find_ffmpeg_executable()
+        if not ffmpeg_exe:
+            raise RuntimeError('La salida HLS necesita ffmpeg y no se encontró en el sistema.')
+        os.makedirs(output_dir, exist_ok=True)
         try:
-            duration = clip.duration
-            total_ms = _seconds_to_ms(duration)
-            segment_ms = _seconds_to_ms(segment_length)
-            index = 0
-            part_num = 1
-            # Usar índices y ms enteros para evitar acumulación
-            while index * segment_ms < total_ms:
-                start_ms = index * segment_ms
-                end_ms = min((index + 1) * segment_ms, total_ms)
-                seg_dur_ms = end_ms - start_ms
-                start = _ms_to_seconds(start_ms)
-                end = _ms_to_seconds(end_ms)
-                # Debug: imprimir tiempos en ms
+            duration = await _probe_duration_async(ffmpeg_exe, input_path)
+        except Exception as e:
+            raise RuntimeError(f"No se pudo determinar la duración del vídeo con ffmpeg/ffprobe: {e}") from e
+        segments = await asyncio.to_thread(_plan_split, input_path, duration, segment_length, snap_tolerance, ffmpeg_exe)
+        parts, playlist = await _split_hls(ffmpeg_exe, input_path, output_dir, segments, segment_length,
+                                     'ts' if output_format == 'hls-ts' else 'fmp4', progress_cb)
+        _write_manifest(output_dir, input_path, segments, {'main': parts, 'playlist': playlist})
+        return parts
+    if profile is not None:
+        from profiles import resolve_profile
+        outputs_spec = resolve_profile(profile, extra_profiles)
+        ffmpeg_exe = _find_ffmpeg_executable()
+        if not ffmpeg_exe:
+            raise RuntimeError('Los perfiles de salida necesitan ffmpeg y no se encontró en el sistema.')
+        os.makedirs(output_dir, exist_ok=True)
+        try:
+            duration = await _probe_duration_async(ffmpeg_exe, input_path)
+        except Exception as e:
+            raise RuntimeError(f"No se pudo determinar la duración del vídeo con ffmpeg/ffprobe: {e}") from e
+        segments = await asyncio.to_thread(_plan_split, input_path, duration, segment_length, snap_tolerance, ffmpeg_exe)
+        results = await _split_multi_output(ffmpeg_exe, input_path, output_dir, segments, outputs_spec, progress_cb)
+        try:
+            results['main'] = await verify_segments_async(input_path, results['main'], segment_length, segments=segments)
+        except Exception:
+            logger.exception('Error en verificación post-corte (perfil de salida)')
+        _write_manifest(output_dir, input_path, segments, results, profile)
+        return results['main']
+
+    # Cortes precisos forzados: una sola decodificación con ffmpeg (ni moviepy, que busca en
+    # el lector para cada subclip, ni un ffmpeg por parte que decodifica desde el inicio)
+    if _force_precise_enabled():
+        ffmpeg_exe = _find_ffmpeg_executable()
+        if ffmpeg_exe:
+            os.makedirs(output_dir, exist_ok=True)
+            try:
+                duration = await _probe_duration_async(ffmpeg_exe, input_path)
+            except Exception as e:
+                raise RuntimeError(f"No se pudo determinar la duración del vídeo con ffmpeg/ffprobe: {e}") from e
+            segments = await asyncio.to_thread(_plan_split, input_path, duration, segment_length, snap_tolerance, ffmpeg_exe)
+            try:
+                outputs = await _split_precise_single_pass(ffmpeg_exe, input_path, output_dir, segments, progress_cb)
+            except Exception as e:
+                logger.warning("Corte preciso de una pasada falló (%s); se corta parte a parte.", e)
+            else:
                 try:
-                    debug = False
-                    # si la función fue llamada con un kwarg debug, estará en locals() del scope superior; intenta leerlo
-                    # Pero por claridad, permitimos que el caller pase debug a través de una variable global opcional `__split_debug`.
-                    debug = globals().get('__split_debug', False)
+                    outputs = await verify_segments_async(input_path, outputs, segment_length, segments=segments)
                 except Exception:
-                    debug = False
-                if debug or logger.isEnabledFor(logging.DEBUG):
-                    logger.debug("[splitter][moviepy] part=%d start_ms=%d end_ms=%d dur_ms=%d", part_num, start_ms, end_ms, seg_dur_ms)
-
-                subclip = clip.subclip(start, end)
-                # Usar nombres cortos y secuenciales: VID-0001.mp4, VID-0002.mp4, ...
-                out_name = f"VID-{part_num:04d}.mp4"
-                out_path = os.path.join(output_dir, out_name)
-                # write_videofile puede tardar; se usan valores por defecto para codec
-                subclip.write_videofile(out_path, codec="libx264", audio_codec="aac", verbose=False, logger=None)
-                subclip.close()
-                outputs.append(out_path)
-                index += 1
-                part_num += 1
-        finally:
-            clip.close()
+                    logger.exception('Error en verificación post-corte (una pasada)')
+                _write_manifest(output_dir, input_path, segments, {'main': outputs})
+                return outputs
+
+    # Intentar moviepy primero
+    moviepy_exc = _moviepy_import_error()
+    have_moviepy = moviepy_exc is None
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    if have_moviepy:
+        outputs, segments = await asyncio.to_thread(_split_with_moviepy, input_path, output_dir, segment_length,
+                                                    snap_tolerance, _threadsafe_progress(progress_cb))
 
         # Verificación post-corte: corregir fragmentos problemáticos si es necesario
         try:
-            outputs = _verify_and_fix_segments(input_path, outputs, segment_length)
+            outputs = await verify_segments_async(input_path, outputs, segment_length, segments=segments)
         except Exception:
             # No abortar si la verificación falla; simplemente devolver los outputs generados
             logging.getLogger(__name__).exception('Error en verificación post-corte (moviepy)')
 
+        _write_manifest(output_dir, input_path, segments, {'main': outputs})
         return outputs
 
     # Si llegamos aquí, moviepy NO está disponible; intentar ffmpeg
@@ -210,50 +1030,345 @@ def split_video(input_path: str, output_dir: str, segment_length: float) -> List
 
     # Obtener duración usando ffprobe/ffmpeg
     try:
-        duration = _probe_duration_with_ffprobe(ffmpeg_exe, input_path)
+        duration = await _probe_duration_async(ffmpeg_exe, input_path)
     except Exception as e:
         raise RuntimeError(f"No se pudo determinar la duración del vídeo con ffmpeg/ffprobe: {e}") from e
 
-    total_ms = _seconds_to_ms(duration)
-    segment_ms = _seconds_to_ms(segment_length)
-    index = 0
-    part_num = 1
+    segments = await asyncio.to_thread(_plan_split, input_path, duration, segment_length, snap_tolerance, ffmpeg_exe)
+    done_ms = 0
+
+    async def extract_part(part_num: int, start_ms: int, end_ms: int) -> str:
+        nonlocal done_ms
+        seg_dur_ms = end_ms - start_ms
+        # Usar nombres cortos y secuenciales: VID-0001.mp4, VID-0002.mp4, ...
+        out_name = f"VID-{part_num:04d}.mp4"
+        out_path = os.path.join(output_dir, out_name)
+        # Debug: imprimir tiempos en ms si está activado
+        try:
+            debug = globals().get('__split_debug', False)
+        except Exception:
+            debug = False
+        if debug or logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[splitter][ffmpeg] part=%d start_ms=%d end_ms=%d dur_ms=%d", part_num, start_ms, end_ms, seg_dur_ms)
+
+        # Ejecutar ffmpeg para extraer segmento (pasamos segundos calculados desde ms)
+        await _run_ffmpeg_segment(ffmpeg_exe, input_path, _ms_to_seconds(start_ms), _ms_to_seconds(seg_dur_ms), out_path)
+        done_ms += seg_dur_ms
+        if progress_cb is not None:
+            progress_cb(done_ms, segments[-1][1] - segments[0][0])
+        return out_path
+
     try:
-        while index * segment_ms < total_ms:
-            start_ms = index * segment_ms
-            end_ms = min((index + 1) * segment_ms, total_ms)
+        outputs = await _gather_all(extract_part(n, s, e) for n, (s, e) in enumerate(segments, start=1))
+    except Exception as e:
+        # Si algo falla, intentar limpiar lo ya creado
+        tb = traceback.format_exc()
+        # No eliminar por defecto; devolver error con la traza
+        raise RuntimeError(f"Error al cortar con ffmpeg:\n{tb}") from e
+
+    # Verificación post-corte: corregir fragmentos problemáticos si es necesario
+    try:
+        outputs = await verify_segments_async(input_path, outputs, segment_length, segments=segments)
+    except Exception:
+        logging.getLogger(__name__).exception('Error en verificación post-corte (ffmpeg)')
+
+    _write_manifest(output_dir, input_path, segments, {'main': outputs})
+    return outputs
+
+
+def _split_with_moviepy(input_path: str, output_dir: str, segment_length: float,
+                        snap_tolerance: Optional[float], progress_cb=None) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """Corte con moviepy (síncrono; `split_video_async` lo ejecuta en un hilo). Devuelve `(partes, segmentos)`."""
+    from moviepy.editor import VideoFileClip
+
+    logger = logging.getLogger(__name__)
+    outputs: List[str] = []
+    try:
+        clip = VideoFileClip(input_path)
+    except Exception as e:
+        tb = traceback.format_exc()
+        raise RuntimeError(f"Error al abrir el archivo de vídeo con moviepy:\n{tb}") from e
+
+    try:
+        duration = clip.duration
+        # Usar índices y ms enteros para evitar acumulación
+        segments = _plan_split(input_path, duration, segment_length, snap_tolerance)
+        for part_num, (start_ms, end_ms) in enumerate(segments, start=1):
             seg_dur_ms = end_ms - start_ms
-            # Usar nombres cortos y secuenciales: VID-0001.mp4, VID-0002.mp4, ...
-            out_name = f"VID-{part_num:04d}.mp4"
-            out_path = os.path.join(output_dir, out_name)
-            # Debug: imprimir tiempos en ms si está activado
+            start = _ms_to_seconds(start_ms)
+            end = _ms_to_seconds(end_ms)
+            # Debug: imprimir tiempos en ms
             try:
+                debug = False
+                # si la función fue llamada con un kwarg debug, estará en locals() del scope superior; intenta leerlo
+                # Pero por claridad, permitimos que el caller pase debug a través de una variable global opcional `__split_debug`.
                 debug = globals().get('__split_debug', False)
             except Exception:
                 debug = False
             if debug or logger.isEnabledFor(logging.DEBUG):
-                logger.debug("[splitter][ffmpeg] part=%d start_ms=%d end_ms=%d dur_ms=%d", part_num, start_ms, end_ms, seg_dur_ms)
+                logger.debug("[splitter][moviepy] part=%d start_ms=%d end_ms=%d dur_ms=%d", part_num, start_ms, end_ms, seg_dur_ms)
 
-            # Ejecutar ffmpeg para extraer segmento (pasamos segundos calculados desde ms)
-            _run_ffmpeg_segment(ffmpeg_exe, input_path, _ms_to_seconds(start_ms), _ms_to_seconds(seg_dur_ms), out_path)
+            subclip = clip.subclip(start, end)
+            # Usar nombres cortos y secuenciales: VID-0001.mp4, VID-0002.mp4, ...
+            out_name = f"VID-{part_num:04d}.mp4"
+            out_path = os.path.join(output_dir, out_name)
+            # write_videofile puede tardar; se usan valores por defecto para codec
+            subclip.write_videofile(out_path, codec="libx264", audio_codec="aac", verbose=False, logger=None)
+            subclip.close()
             outputs.append(out_path)
-            index += 1
-            part_num += 1
-    except Exception as e:
-        # Si algo falla, intentar limpiar lo ya creado
-        tb = traceback.format_exc()
-        # No eliminar por defecto; devolver error con la traza
-        raise RuntimeError(f"Error al cortar con ffmpeg:\n{tb}") from e
+            if progress_cb is not None:
+                progress_cb(end_ms, segments[-1][1])
+    finally:
+        clip.close()
+    return outputs, segments
 
-    # Verificación post-corte: corregir fragmentos problemáticos si es necesario
+
+def _group_ranges(ranges: List[Tuple[int, int, int]], gap_ms: int, max_outputs: int) -> List[List[Tuple[int, int, int]]]:
+    """Agrupa rangos `(n, start_ms, end_ms)` ordenados por inicio: un rango entra en el grupo
+    actual si empieza a menos de `gap_ms` del final del grupo (contiguos, solapados o dentro
+    del mismo GOP aproximadamente) y el grupo no supera `max_outputs` salidas."""
+    groups: List[List[Tuple[int, int, int]]] = []
+    group_end = None
+    for r in sorted(ranges, key=lambda r: (r[1], r[2])):
+        if groups and group_end is not None and r[1] - group_end <= gap_ms and len(groups[-1]) < max_outputs:
+            groups[-1].append(r)
+            group_end = max(group_end, r[2])
+        else:
+            groups.append([r])
+            group_end = r[2]
+    return groups
+
+
+def extract_ranges(input_path: str, ranges: List[Tuple[int, int]], output_dir: str,
+                   group_gap_ms: int = 2000, max_outputs_per_group: int = 32,
+                   progress_cb=None) -> List[str]:
+    """Versión síncrona de `extract_ranges_async`."""
+    return _run_sync(extract_ranges_async(input_path, ranges, output_dir, group_gap_ms, max_outputs_per_group, progress_cb))
+
+
+async def extract_ranges_async(input_path: str, ranges: List[Tuple[int, int]], output_dir: str,
+                               group_gap_ms: int = 2000, max_outputs_per_group: int = 32,
+                               progress_cb=None) -> List[str]:
+    """Extrae rangos arbitrarios `(start_ms, end_ms)` de `input_path` a `CLIP-0001.mp4`, ...
+
+    Los ficheros se numeran en el orden de `ranges`. Los rangos cercanos o contiguos se
+    agrupan (ver `_group_ranges`) y cada grupo se procesa con UNA invocación de ffmpeg con
+    varias salidas: la entrada se abre y se busca una vez (`-ss` del inicio del grupo antes
+    de `-i`) y cada salida toma su trozo con `-ss`/`-t` relativos. Así una lista de 300 clips
+    no implica 300 lecturas de la entrada.
+
+    Usa la misma estrategia que `split_video`: copia de streams salvo con
+    PYVID_SPLIT_FORCE_PRECISE (recodificación exacta), y verificación posterior que reextrae
+    con precisión los clips cuya duración no cuadra. `progress_cb(hechos, total)` es opcional.
+    """
+    logger = logging.getLogger(__name__)
+    ffmpeg_exe = _find_ffmpeg_executable()
+    if not ffmpeg_exe:
+        raise RuntimeError('No se encontró ffmpeg para extraer rangos.')
     try:
-        outputs = _verify_and_fix_segments(input_path, outputs, segment_length)
+        total_ms = _seconds_to_ms(await _probe_duration_async(ffmpeg_exe, input_path))
     except Exception:
-        logging.getLogger(__name__).exception('Error en verificación post-corte (ffmpeg)')
+        total_ms = None
+
+    numbered = []
+    for n, (start_ms, end_ms) in enumerate(ranges, start=1):
+        start_ms = max(0, int(start_ms))
+        end_ms = int(end_ms) if total_ms is None else min(int(end_ms), total_ms)
+        if end_ms <= start_ms:
+            logger.warning("Rango %d ignorado (start_ms=%d end_ms=%d)", n, start_ms, end_ms)
+            continue
+        numbered.append((n, start_ms, end_ms))
+    if not numbered:
+        return []
+
+    os.makedirs(output_dir, exist_ok=True)
+    precise = _force_precise_enabled()
+    codec_args = (['-c:v', 'libx264', '-preset', 'fast', '-crf', '23', '-c:a', 'aac'] if precise
+                  else ['-c', 'copy', '-avoid_negative_ts', '1'])
+    out_by_n = {n: os.path.join(output_dir, f"CLIP-{n:04d}.mp4") for n, _, _ in numbered}
+    done = 0
+
+    async def extract_group(group: List[Tuple[int, int, int]]) -> None:
+        nonlocal done
+        group_start = min(r[1] for r in group)
+        cmd = [ffmpeg_exe, '-y', '-ss', f"{_ms_to_seconds(group_start):.3f}", '-i', input_path]
+        for n, start_ms, end_ms in group:
+            cmd += ['-ss', f"{_ms_to_seconds(start_ms - group_start):.3f}", '-t', f"{_ms_to_seconds(end_ms - start_ms):.3f}"]
+            cmd += codec_args + [out_by_n[n]]
+            logger.debug("[splitter][ranges] clip=%d start_ms=%d end_ms=%d group_start_ms=%d", n, start_ms, end_ms, group_start)
+        proc = await _run(cmd)
+        if proc.returncode != 0:
+            # Si falla el grupo, extraer sus rangos uno a uno con la lógica de split_video
+            logger.debug("ffmpeg: grupo de %d rangos falló, se extraen por separado. stderr: %s", len(group), proc.stderr[-2000:])
+            for n, start_ms, end_ms in group:
+                await _run_ffmpeg_segment(ffmpeg_exe, input_path, _ms_to_seconds(start_ms), _ms_to_seconds(end_ms - start_ms), out_by_n[n])
+        done += len(group)
+        if progress_cb is not None:
+            progress_cb(done, len(numbered))
 
+    await _gather_all(extract_group(g) for g in _group_ranges(numbered, group_gap_ms, max_outputs_per_group))
+    outputs = [out_by_n[n] for n, _, _ in numbered]
+    try:
+        outputs = await verify_segments_async(input_path, outputs, 0, segments=[(s, e) for _, s, e in numbered], fix_short=True)
+    except Exception:
+        logger.exception('Error en verificación post-extracción')
     return outputs
 
 
+# Codificadores con los que se normalizan las partes incompatibles al unir
+_VIDEO_ENCODERS = {'h264': 'libx264', 'hevc': 'libx265', 'mpeg4': 'mpeg4', 'vp9': 'libvpx-vp9'}
+_AUDIO_ENCODERS = {'aac': 'aac', 'mp3': 'libmp3lame', 'opus': 'libopus', 'ac3': 'ac3'}
+
+
+def _stream_signature(info: dict) -> tuple:
+    """Lo que debe coincidir entre partes para unirlas con el demuxer concat sin recodificar:
+    códec, resolución, SAR y timebase de vídeo, y códec/frecuencia/canales de audio."""
+    v = info.get('video') or {}
+    a = info.get('audio') or {}
+    return (v.get('codec'), v.get('width'), v.get('height'), v.get('sar'), v.get('timebase'), v.get('pix_fmt'),
+            a.get('codec'), a.get('sample_rate'), a.get('channels'))
+
+
+async def _normalize_for_join(ffmpeg_cmd: str, input_path: str, ref: dict, out_path: str) -> None:
+    """Recodifica `input_path` con los parámetros de stream de `ref` para poder concatenarlo."""
+    v = ref.get('video') or {}
+    a = ref.get('audio')
+    w, h = v.get('width'), v.get('height')
+    sar = (v.get('sar') or '1:1').replace(':', '/')
+    vf = f"scale={w}:{h}:force_original_aspect_ratio=decrease,pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,setsar={sar}"
+    cmd = [ffmpeg_cmd, '-y', '-i', input_path]
+    part_has_audio = await _part_has_audio(input_path, ffmpeg_cmd)
+    if a and not part_has_audio:
+        # la referencia tiene audio y esta parte no: rellenar con silencio
+        layout = 'mono' if a.get('channels') == 1 else 'stereo'
+        cmd += ['-f', 'lavfi', '-i', f"anullsrc=r={a.get('sample_rate') or 44100}:cl={layout}", '-shortest']
+    cmd += ['-map', '0:v:0', '-vf', vf]
+    if v.get('fps'):
+        cmd += ['-r', str(v['fps'])]
+    cmd += ['-c:v', _VIDEO_ENCODERS.get(v.get('codec'), 'libx264'), '-preset', 'fast', '-crf', '20']
+    if v.get('pix_fmt'):
+        cmd += ['-pix_fmt', v['pix_fmt']]
+    if v.get('timebase'):
+        cmd += ['-video_track_timescale', str(v['timebase'])]
+    if a:
+        cmd += ['-map', '1:a:0' if not part_has_audio else '0:a:0', '-c:a', _AUDIO_ENCODERS.get(a.get('codec'), 'aac')]
+        if a.get('sample_rate'):
+            cmd += ['-ar', str(a['sample_rate'])]
+        if a.get('channels'):
+            cmd += ['-ac', str(a['channels'])]
+    else:
+        cmd += ['-an']
+    cmd.append(out_path)
+    proc = await _run(cmd)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg no pudo normalizar {input_path} para unirlo: {proc.stderr[-2000:]}")
+
+
+async def _part_has_audio(path: str, ffmpeg_cmd: str) -> bool:
+    from mediainfo import get_stream_info_async
+    return bool((await get_stream_info_async(path, ffmpeg_cmd)).get('audio'))
+
+
+async def _concat_copy(ffmpeg_cmd: str, parts: List[str], list_path: str, output_path: str) -> None:
+    """Une `parts` con el demuxer concat y copia de streams."""
+    with open(list_path, 'w', encoding='utf-8') as f:
+        f.write('ffconcat version 1.0\n')
+        for part in parts:
+            escaped = os.path.abspath(part).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    cmd = [ffmpeg_cmd, '-y', '-f', 'concat', '-safe', '0', '-i', list_path, '-map', '0', '-c', 'copy',
+           '-movflags', '+faststart', output_path]
+    proc = await _run(cmd)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg concat falló: {proc.stderr[-2000:]}")
+
+
+def join_videos(inputs: List[str], output_path: str, tolerance_ms: int = 80, progress_cb=None) -> List[str]:
+    """Versión síncrona de `join_videos_async`."""
+    return _run_sync(join_videos_async(inputs, output_path, tolerance_ms, progress_cb))
+
+
+async def join_videos_async(inputs: List[str], output_path: str, tolerance_ms: int = 80, progress_cb=None) -> List[str]:
+    """Une `inputs` (en ese orden) en `output_path`. Operación inversa de `split_video`.
+
+    Los streams de cada parte se comparan (códec, resolución, SAR, timebase y audio, ver
+    `_stream_signature`) con los datos de la caché de metadatos. La firma más frecuente es
+    la de referencia: las partes que la cumplen se copian tal cual con el demuxer concat y
+    sólo las incompatibles se recodifican antes con esos parámetros. Si la referencia usa un
+    códec que no sabemos generar se recodifica todo.
+
+    Como en el corte, la duración del resultado se verifica contra la suma de las partes; si
+    la copia no cuadra (p. ej. timestamps rotos en alguna parte), se repite recodificando todas.
+    `progress_cb(hechos, total)` es opcional. Devuelve `[output_path]`.
+    """
+    from mediainfo import get_stream_info_async
+    import tempfile
+
+    logger = logging.getLogger(__name__)
+    if len(inputs) < 2:
+        raise ValueError('Se necesitan al menos dos vídeos para unir.')
+    ffmpeg_exe = _find_ffmpeg_executable()
+    if not ffmpeg_exe:
+        raise RuntimeError('No se encontró ffmpeg para unir los vídeos.')
+
+    infos = await _gather_all(get_stream_info_async(p, ffmpeg_exe) for p in inputs)
+    sigs = [_stream_signature(i) for i in infos]
+    counts = {}
+    for sig in sigs:
+        counts[sig] = counts.get(sig, 0) + 1
+    ref_sig = max(sigs, key=lambda sg: counts[sg])
+    ref = infos[sigs.index(ref_sig)]
+    can_encode = (ref.get('video') or {}).get('codec') in _VIDEO_ENCODERS and \
+        (ref.get('audio') is None or ref['audio'].get('codec') in _AUDIO_ENCODERS)
+    to_normalize = [i for i, sig in enumerate(sigs) if sig != ref_sig or not can_encode]
+    logger.debug("[splitter][join] %d partes, %d incompatibles con la referencia %s", len(inputs), len(to_normalize), ref_sig)
+
+    expected_ms = sum(_seconds_to_ms(i.get('duration') or 0) for i in infos)
+    out_dir = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(out_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix='.pv_join_', dir=out_dir)
+    try:
+        async def build(normalize_idx: List[int]) -> None:
+            parts = list(inputs)
+            total_steps = len(normalize_idx) + 1
+            done = 0
+
+            async def normalize(i: int) -> None:
+                nonlocal done
+                norm = os.path.join(work_dir, f"part-{i + 1:04d}.mp4")
+                await _normalize_for_join(ffmpeg_exe, inputs[i], ref, norm)
+                logger.debug("[splitter][join] parte %d recodificada: %s", i + 1, inputs[i])
+                parts[i] = norm
+                done += 1
+                if progress_cb is not None:
+                    progress_cb(done, total_steps)
+
+            await _gather_all(normalize(i) for i in normalize_idx)
+            await _concat_copy(ffmpeg_exe, parts, os.path.join(work_dir, 'list.ffconcat'), output_path)
+            if progress_cb is not None:
+                progress_cb(total_steps, total_steps)
+
+        await build(to_normalize)
+
+        # Verificación: la duración debe ser la suma de las partes
+        try:
+            real_ms = _seconds_to_ms(await _probe_duration_async(ffmpeg_exe, output_path))
+        except Exception:
+            real_ms = None
+        limit = tolerance_ms * len(inputs)
+        if real_ms is not None and expected_ms and abs(real_ms - expected_ms) > limit and len(to_normalize) < len(inputs):
+            logger.info("Unión %s duración %dms != esperada %dms (%+dms). Recodificando todas las partes...",
+                        os.path.basename(output_path), real_ms, expected_ms, real_ms - expected_ms)
+            to_normalize = list(range(len(inputs)))
+            await build(to_normalize)
+            real_ms = _seconds_to_ms(await _probe_duration_async(ffmpeg_exe, output_path))
+        logger.info("Verificación completa. Partes recodificadas: %d de %d (duración %s ms, esperada %d ms)",
+                    len(to_normalize), len(inputs), real_ms, expected_ms)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return [output_path]
+
+
 def _get_duration_seconds(path: str) -> float:
     """Devuelve la duración en segundos del archivo `path` usando ffprobe/ffmpeg.
     Lanza RuntimeError si no es posible obtenerla."""
@@ -263,15 +1378,20 @@ def _get_duration_seconds(path: str) -> float:
     return _probe_duration_with_ffprobe(ffmpeg_exe, path)
 
 
-def _recode_precise_segment(ffmpeg_cmd: str, input_path: str, start_seconds: float, dur_seconds: float, out_path: str) -> None:
-    """Recodifica desde el fichero original un segmento exacto (usando -i INPUT -ss START -t DUR).
+async def _recode_precise_segment(ffmpeg_cmd: str, input_path: str, start_seconds: float, dur_seconds: float, out_path: str) -> None:
+    """Recodifica desde el fichero original un segmento exacto (usando -ss START -i INPUT -t DUR).
     Reemplaza `out_path` si tiene éxito.
+
+    La búsqueda se hace en la entrada: ffmpeg salta al keyframe anterior a START y, al
+    recodificar, descarta los fotogramas hasta START (`-accurate_seek`), así que el corte
+    es exacto sin decodificar el fichero desde el principio para cada segmento.
     """
     logger = logging.getLogger(__name__)
     # Crear archivo temporal y escribir recodificación
     tmp_out = out_path + '.recode_tmp.mp4'
-    recode_cmd = [ffmpeg_cmd, '-y', '-i', input_path, '-ss', str(start_seconds), '-t', str(dur_seconds), '-c:v', 'libx264', '-preset', 'fast', '-crf', '23', '-c:a', 'aac', tmp_out]
-    proc = subprocess.run(recode_cmd, capture_output=True, text=True)
+    recode_cmd = [ffmpeg_cmd, '-y', '-accurate_seek', '-ss', str(start_seconds), '-i', input_path, '-t', str(dur_seconds),
+                  '-c:v', 'libx264', '-preset', 'fast', '-crf', '23', '-c:a', 'aac', tmp_out]
+    proc = await _run(recode_cmd)
     if proc.returncode == 0:
         try:
             os.replace(tmp_out, out_path)
@@ -292,11 +1412,21 @@ def _recode_precise_segment(ffmpeg_cmd: str, input_path: str, start_seconds: flo
         raise RuntimeError(f"ffmpeg recode falló para corregir segmento {out_path}: {proc.stderr}")
 
 
-def _verify_and_fix_segments(input_path: str, outputs: List[str], segment_length: float, tolerance_ms: int = 80) -> List[str]:
+@profiled('verify_segments')
+async def verify_segments_async(input_path: str, outputs: List[str], segment_length: float, tolerance_ms: int = 80,
+                                segments: Optional[List[Tuple[int, int]]] = None, fix_short: bool = False) -> List[str]:
     """Verifica las duraciones de `outputs` comparadas con la longitud esperada en ms (segment_length).
     Si algún fragmento excede la duración esperada por más de `tolerance_ms`, se considera "problema" y se
     reextrae ese fragmento desde el archivo original usando recodificación precisa.
 
+    Si se pasan `segments` (start_ms, end_ms) por parte, se usan como duración esperada en lugar
+    de la aritmética de `segment_length` (necesario cuando los cortes se ajustaron al contenido).
+    Con `fix_short` también se reextraen los fragmentos más cortos de lo esperado (extracción de
+    rangos con copia de streams, que empieza en el primer keyframe del rango).
+
+    Un fragmento que no se puede sondear o dura 0 (p. ej. un MP4 sin streams porque la copia
+    no encontró ningún keyframe en el rango) cuenta como fallido y también se reextrae.
+
     Devuelve la lista (posiblemente modificada) de paths resultantes.
     """
     logger = logging.getLogger(__name__)
@@ -308,20 +1438,22 @@ def _verify_and_fix_segments(input_path: str, outputs: List[str], segment_length
         ffmpeg_exe = None
 
     total_ms = None
-    try:
-        total_ms = _seconds_to_ms(_probe_duration_with_ffprobe(ffmpeg_exe, input_path)) if ffmpeg_exe else None
-    except Exception:
-        total_ms = None
+    if segments is None:
+        try:
+            total_ms = _seconds_to_ms(await _probe_duration_async(ffmpeg_exe, input_path)) if ffmpeg_exe else None
+        except Exception:
+            total_ms = None
 
     expected_seg_ms = _seconds_to_ms(segment_length)
 
-    # Iterar por cada archivo de salida y comprobar duración
-    for idx, out in enumerate(outputs, start=1):
+    # Comprobar la duración de cada archivo de salida (los sondeos corren en paralelo)
+    async def check(idx: int, out: str) -> None:
+        nonlocal fixed
         try:
             real_s = None
             # Obtener duración del fragmento
             try:
-                real_s = _probe_duration_with_ffprobe(ffmpeg_exe, out) if ffmpeg_exe else None
+                real_s = await _probe_duration_async(ffmpeg_exe, out) if ffmpeg_exe else None
             except Exception:
                 # Intentar con moviepy si ffmpeg no está disponible
                 try:
@@ -332,28 +1464,31 @@ def _verify_and_fix_segments(input_path: str, outputs: List[str], segment_length
                 except Exception:
                     real_s = None
 
-            if real_s is None:
-                logger.debug("No se pudo obtener duración para %s; omitiendo verificación.", out)
-                continue
-
-            real_ms = _seconds_to_ms(real_s)
+            real_ms = _seconds_to_ms(real_s) if real_s is not None else 0
             # calcular expected para este índice (la última parte puede ser más corta)
             # index base-0
-            start_ms_expected = (idx - 1) * expected_seg_ms
-            end_ms_expected = min(idx * expected_seg_ms, total_ms) if total_ms is not None else start_ms_expected + expected_seg_ms
+            if segments is not None and idx <= len(segments):
+                start_ms_expected, end_ms_expected = segments[idx - 1]
+            else:
+                start_ms_expected = (idx - 1) * expected_seg_ms
+                end_ms_expected = min(idx * expected_seg_ms, total_ms) if total_ms is not None else start_ms_expected + expected_seg_ms
             expected_ms = end_ms_expected - start_ms_expected
 
-            # Si la duración real excede la esperada por más del umbral, corregir
-            if real_ms > expected_ms + tolerance_ms:
-                logger.info("Segment %d (%s) duration %dms > expected %dms (+%dms). Re-extrayendo preciso...", idx, os.path.basename(out), real_ms, expected_ms, real_ms - expected_ms)
+            # Si la duración real excede la esperada por más del umbral (o no hay duración), corregir
+            broken = real_ms <= 0
+            if broken or real_ms > expected_ms + tolerance_ms or (fix_short and real_ms < expected_ms - tolerance_ms):
+                if broken:
+                    logger.info("Segment %d (%s) sin duración legible (salida vacía o dañada). Re-extrayendo preciso...", idx, os.path.basename(out))
+                else:
+                    logger.info("Segment %d (%s) duration %dms != expected %dms (%+dms). Re-extrayendo preciso...", idx, os.path.basename(out), real_ms, expected_ms, real_ms - expected_ms)
                 if not ffmpeg_exe:
                     logger.warning("No hay ffmpeg disponible para recodificar %s", out)
-                    continue
+                    return
                 # recodificar desde el fichero original con start = start_ms_expected
                 start_sec = _ms_to_seconds(start_ms_expected)
                 dur_sec = _ms_to_seconds(expected_ms)
                 try:
-                    _recode_precise_segment(ffmpeg_exe, input_path, start_sec, dur_sec, out)
+                    await _recode_precise_segment(ffmpeg_exe, input_path, start_sec, dur_sec, out)
                     fixed += 1
                 except Exception as e:
                     logger.error("Fallo al recodificar segmento %s: %s", out, e)
@@ -362,6 +1497,8 @@ def _verify_and_fix_segments(input_path: str, outputs: List[str], segment_length
         except Exception as e:
             logger.exception("Error verificando segmento %s: %s", out, e)
 
+    await _gather_all(check(idx, out) for idx, out in enumerate(outputs, start=1))
+
     logger.info("Verificación completa. Fragmentos regrabados: %d", fixed)
     return outputs
 
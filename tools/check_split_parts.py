@@ -0,0 +1,100 @@
+"""Comprobación del corte preciso sobre el vídeo de prueba del repositorio.
+
+Corta `test_out/test_input.mp4` (6 s; se genera como en integration_test_split.py si no
+existe) en partes de 2 s con PYVID_SPLIT_FORCE_PRECISE y comprueba que salen exactamente
+3 partes de 2 s (±80 ms), también en una carpeta con partes viejas de otro corte. También
+extrae con copia de streams rangos sin keyframe dentro (`extract_ranges`), que deben
+acabar reextraídos con su duración, y corta con los perfiles `segments+proxy` y
+`segments+hls` (partes `main` y, en el primero, también las del proxy) y a HLS preciso
+(`hls-ts`, `hls-fmp4`; las duraciones se leen del `index.m3u8`).
+Termina con código 1 si algo no cuadra.
+
+Usar: python tools/check_split_parts.py
+"""
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import splitter
+
+TOLERANCE_S = 0.08
+
+work_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'test_out'))
+input_path = os.path.join(work_dir, 'test_input.mp4')
+
+ff = splitter._find_ffmpeg_executable()
+if not ff:
+    print('No ffmpeg encontrado; abortando comprobación')
+    sys.exit(1)
+
+if not os.path.exists(input_path):
+    os.makedirs(work_dir, exist_ok=True)
+    cmd = [ff, '-y', '-f', 'lavfi', '-i', 'testsrc=size=320x240:rate=30', '-t', '6', '-pix_fmt', 'yuv420p', '-c:v', 'libx264', input_path]
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        print('ffmpeg falló al crear el vídeo:', proc.stderr)
+        sys.exit(1)
+
+# las partes se escriben en una carpeta temporal (test_out/ está en el repositorio)
+check_dir = tempfile.mkdtemp(prefix='pyvid-check-')
+# sin caché de cortes: se quiere comprobar ffmpeg, no servir un corte anterior
+os.environ['PYVID_SPLIT_CACHE'] = '0'
+failures = []
+
+
+def check(name, outputs, expected, durations=None):
+    if durations is None:
+        durations = [splitter._probe_duration_with_ffprobe(ff, p) for p in outputs]
+    ok = len(durations) == len(expected) and all(abs(d - e) <= TOLERANCE_S for d, e in zip(durations, expected))
+    print(f"{'OK ' if ok else 'MAL'} {name}: {len(outputs)} partes {[round(d, 3) for d in durations]} "
+          f"(esperadas {len(expected)} {expected})")
+    if not ok:
+        failures.append(name)
+
+
+def fresh_dir(name, stale=0):
+    path = os.path.join(check_dir, name)
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    for i in range(1, stale + 1):
+        with open(os.path.join(path, f"VID-{i:04d}.mp4"), 'wb') as f:
+            f.write(b'parte vieja')
+    return path
+
+
+try:
+    os.environ['PYVID_SPLIT_FORCE_PRECISE'] = '1'
+    try:
+        check('preciso', splitter.split_video(input_path, fresh_dir('precise'), 2), [2.0, 2.0, 2.0])
+        check('preciso sobre partes viejas', splitter.split_video(input_path, fresh_dir('precise_stale', stale=5), 2),
+              [2.0, 2.0, 2.0])
+        for fmt in splitter.HLS_FORMATS:
+            out = fresh_dir(fmt)
+            parts = splitter.split_video(input_path, out, 2, output_format=fmt)
+            check(f'preciso {fmt}', parts, [2.0, 2.0, 2.0],
+                  durations=[d for _uri, d in splitter._read_m3u8(os.path.join(out, 'index.m3u8'))])
+    finally:
+        del os.environ['PYVID_SPLIT_FORCE_PRECISE']
+
+    out = fresh_dir('proxy')
+    check('perfil segments+proxy', splitter.split_video(input_path, out, 2, profile='segments+proxy'), [2.0, 2.0, 2.0])
+    proxy_dir = os.path.join(out, 'proxy')
+    check('perfil segments+proxy (proxy)', sorted(os.path.join(proxy_dir, n) for n in os.listdir(proxy_dir)),
+          [2.0, 2.0, 2.0])
+    check('perfil segments+hls', splitter.split_video(input_path, fresh_dir('hls_profile'), 2, profile='segments+hls'),
+          [2.0, 2.0, 2.0])
+
+    # copia de streams: en el vídeo de prueba sólo hay keyframe en 0, los clips salen vacíos
+    # y la verificación debe reextraerlos
+    check('rangos con copia', splitter.extract_ranges(input_path, [(500, 1500), (2500, 3500), (4200, 5900)],
+                                                      fresh_dir('ranges')), [1.0, 1.0, 1.7])
+finally:
+    shutil.rmtree(check_dir, ignore_errors=True)
+
+if failures:
+    print('Fallaron:', ', '.join(failures))
+    sys.exit(1)
+print('Todo correcto.')
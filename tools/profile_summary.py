@@ -0,0 +1,117 @@
+"""Visor de los volcados de perfilado (ver profiling.py).
+
+Usar:
+  python tools/profile_summary.py                      # lista las acciones perfiladas
+  python tools/profile_summary.py --action split_video # sólo las de una acción
+  python tools/profile_summary.py show [N|prefijo]     # detalle de una (por defecto la última)
+  python tools/profile_summary.py show 3 --top 40 --sort tottime
+
+`show` imprime el resumen, las funciones más costosas (pstats) y, si hay volcado de
+tracemalloc, las líneas con más memoria viva al terminar la acción. La carpeta es
+PYVID_PROFILE_DIR o `~/.pyvideoplayer_profiles/` (`--dir` la cambia).
+"""
+import sys
+import os
+import json
+import time
+import pstats
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from profiling import default_profile_dir
+
+
+def load_summaries(directory, action=None):
+    items = []
+    try:
+        names = sorted(n for n in os.listdir(directory) if n.endswith('.json'))
+    except OSError:
+        return items
+    for name in names:
+        try:
+            with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if action and summary.get('action') != action:
+            continue
+        summary['_stem'] = name[:-5]
+        items.append(summary)
+    return items
+
+
+def fmt_bytes(n):
+    if n is None:
+        return '-'
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(n) < 1024 or unit == 'GB':
+            return f"{n:.0f} {unit}" if unit == 'B' else f"{n:.1f} {unit}"
+        n /= 1024.0
+
+
+def print_list(items):
+    if not items:
+        print('(no hay volcados)')
+        return
+    print(f"{'n':>3}  {'fecha':<19}  {'acción':<22} {'total':>9} {'cpu hilo':>9} {'pico mem':>10}")
+    for i, s in enumerate(items, start=1):
+        stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(s.get('started', 0)))
+        cpu = s.get('thread_cpu_s')
+        print(f"{i:>3}  {stamp:<19}  {s.get('action', '?'):<22} {s.get('wall_s', 0):>8.3f}s "
+              f"{(f'{cpu:.3f}s' if cpu is not None else '-'):>9} {fmt_bytes(s.get('peak_bytes')):>10}")
+
+
+def show(directory, summary, top, sort):
+    print(f"acción: {summary.get('action')}  ({summary['_stem']})")
+    print(f"total: {summary.get('wall_s', 0):.3f}s  cpu del hilo: {summary.get('thread_cpu_s')}  "
+          f"hilo: {summary.get('thread')}  pid: {summary.get('pid')}")
+    for nested in summary.get('nested') or []:
+        print(f"  anidada: {nested['action']} {nested['wall_s']:.3f}s")
+    if summary.get('parent'):
+        print(f"  anidada en {summary['parent']} (terminó antes; sólo tiempo)")
+    if summary.get('concurrent_with'):
+        print(f"  a la vez que {summary['concurrent_with']}, que tenía el cProfile (sólo tiempo)")
+    if summary.get('concurrent'):
+        print(f"  a la vez (su trabajo está en este perfil): {', '.join(summary['concurrent'])}")
+    if summary.get('pstats'):
+        print()
+        stats = pstats.Stats(os.path.join(directory, summary['pstats']))
+        stats.strip_dirs().sort_stats(sort).print_stats(top)
+    if summary.get('tracemalloc'):
+        print(f"memoria viva al terminar: {fmt_bytes(summary.get('current_bytes'))}  "
+              f"pico: {fmt_bytes(summary.get('peak_bytes'))}")
+        snapshot = tracemalloc.Snapshot.load(os.path.join(directory, summary['tracemalloc']))
+        for stat in snapshot.statistics('lineno')[:top]:
+            frame = stat.traceback[0]
+            print(f"  {fmt_bytes(stat.size):>10}  {stat.count:>7}  {frame.filename}:{frame.lineno}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(prog='profile_summary.py', description='Volcados de perfilado de PyVideoPlayer')
+    parser.add_argument('command', nargs='?', choices=('list', 'show'), default='list')
+    parser.add_argument('which', nargs='?', help='número de la lista o prefijo del volcado (show)')
+    parser.add_argument('--dir', default=os.environ.get('PYVID_PROFILE_DIR') or default_profile_dir())
+    parser.add_argument('--action', help='filtrar por acción')
+    parser.add_argument('--top', type=int, default=25)
+    parser.add_argument('--sort', default='cumulative', choices=('cumulative', 'tottime', 'calls'))
+    args = parser.parse_args()
+
+    items = load_summaries(args.dir, args.action)
+    if args.command == 'list':
+        print_list(items)
+        sys.exit(0)
+    if not items:
+        print('(no hay volcados)')
+        sys.exit(1)
+    chosen = items[-1]
+    if args.which:
+        if args.which.isdigit() and 1 <= int(args.which) <= len(items):
+            chosen = items[int(args.which) - 1]
+        else:
+            matches = [s for s in items if s['_stem'].startswith(args.which)]
+            if not matches:
+                print(f'No hay ningún volcado {args.which}')
+                sys.exit(1)
+            chosen = matches[-1]
+    show(args.dir, chosen, args.top, args.sort)
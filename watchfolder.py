@@ -0,0 +1,397 @@
+"""Carpetas vigiladas: cortar automáticamente los vídeos que van llegando, sin interfaz.
+
+Los grabadores dejan ficheros en una carpeta de ingesta; `FolderWatcher` detecta los
+nuevos cuando están completos y los corta con `splitter.split_video` según el perfil de
+opciones de cada carpeta.
+
+- Detección: cada pasada recorre las carpetas con `os.scandir` (una llamada por
+  directorio) y anota tamaño y mtime de los vídeos (extensiones de scanner.py). Un
+  fichero está completo cuando dos observaciones seguidas coinciden y no ha cambiado
+  en `stable_s` segundos. En Linux se usa inotify (por ctypes, sin dependencias) para
+  despertar en cuanto se cierra o se mueve un fichero en lugar de esperar a la
+  siguiente pasada; si no está disponible, se sondea cada `poll_s` segundos.
+- Perfiles por carpeta: `segment_length`, `output_dir` (admite `{name}`, el nombre del
+  fichero sin extensión, y `{rel}`, su ruta relativa a la carpeta vigilada sin
+  extensión; por defecto `<carpeta>/_cortes/{rel}`, que no se vigila: `cam1/0001.mp4` y
+  `cam2/0001.mp4` van a carpetas distintas),
+  `snap_tolerance`, `profile`, `format`, `max_jobs`, `stable_s`, `recursive`,
+  `include`/`exclude` (globs como en el escaneo de carpetas).
+- Concurrencia: como mucho `max_jobs` cortes a la vez en total y `max_jobs` de cada
+  carpeta por carpeta (cada corte ya reparte sus ffmpeg con `PYVID_MAX_JOBS`). Un
+  fichero cuya carpeta de salida está usando otro corte en marcha espera a que acabe.
+- Estado: `~/.pyvideoplayer_watch.sqlite` guarda cada fichero tratado con su tamaño,
+  mtime, resultado y error. Al reiniciar no se repite lo hecho ni lo fallido; un
+  fichero se vuelve a cortar si cambia (otro tamaño o mtime). Lo que estaba en marcha
+  cuando se paró el proceso se corta de nuevo.
+
+Configuración en `~/.pyvideoplayer.json`::
+
+    "watch_folders": [{"path": "/srv/ingesta", "segment_length": 300, "max_jobs": 1}],
+    "watch": {"max_jobs": 2, "poll_s": 10}
+
+Uso: `python watchfolder.py` (carpetas de los ajustes), `python watchfolder.py --folder
+DIR --segment-length 60` para una carpeta suelta, `--once` para una sola pasada
+(esperando a la estabilidad y a los cortes; útil en cron) y `--status` para ver el estado.
+"""
+import os
+import sys
+import json
+import time
+import fnmatch
+import select
+import signal
+import sqlite3
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from scanner import VIDEO_EXTENSIONS
+
+
+STATE_FILENAME = '.pyvideoplayer_watch.sqlite'
+
+
+def default_state_path() -> str:
+    return os.path.join(os.path.expanduser('~'), STATE_FILENAME)
+
+
+class StateStore:
+    """Estado persistente de los ficheros tratados (`ruta -> tamaño, mtime, estado`)."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or default_state_path()
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, '
+                         'status TEXT, outputs INTEGER, error TEXT, updated REAL)')
+            self._local.conn = conn
+        return conn
+
+    def get(self, path: str) -> Optional[Tuple[int, int, str]]:
+        row = self._conn().execute('SELECT size, mtime_ns, status FROM files WHERE path = ?', (path,)).fetchone()
+        return tuple(row) if row else None
+
+    def is_handled(self, path: str, size: int, mtime_ns: int) -> bool:
+        """True si `path`, con este tamaño y mtime, ya se cortó o falló (lo 'running' se repite)."""
+        row = self.get(path)
+        return row is not None and row[:2] == (size, mtime_ns) and row[2] in ('done', 'failed')
+
+    def mark(self, path: str, size: int, mtime_ns: int, status: str, outputs: int = 0,
+             error: Optional[str] = None) -> None:
+        conn = self._conn()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (path, size, mtime_ns, status, outputs, error, time.time()))
+
+    def rows(self) -> List[Tuple]:
+        return self._conn().execute('SELECT path, status, outputs, error, updated FROM files ORDER BY updated').fetchall()
+
+
+class WatchFolder:
+    """Carpeta vigilada y su perfil de opciones de corte."""
+
+    def __init__(self, path: str, segment_length: float = 60.0, output_dir: Optional[str] = None,
+                 snap_tolerance: Optional[float] = None, profile=None, output_format: Optional[str] = None,
+                 max_jobs: int = 1, stable_s: float = 10.0, recursive: bool = True,
+                 include: Optional[List[str]] = None, exclude: Optional[List[str]] = None):
+        if segment_length <= 0:
+            raise ValueError("segment_length debe ser > 0")
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.segment_length = float(segment_length)
+        self.output_dir = os.path.abspath(os.path.expanduser(output_dir or os.path.join(self.path, '_cortes', '{rel}')))
+        self.snap_tolerance = snap_tolerance
+        self.profile = profile
+        self.output_format = output_format
+        self.max_jobs = max(1, int(max_jobs))
+        self.stable_s = float(stable_s)
+        self.recursive = bool(recursive)
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        # parte fija de output_dir: si cae dentro de la carpeta, no se vigila
+        self.output_root = os.path.normpath(self.output_dir.split('{', 1)[0])
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'WatchFolder':
+        return cls(data['path'], segment_length=float(data.get('segment_length', 60)),
+                   output_dir=data.get('output_dir'), snap_tolerance=data.get('snap_tolerance'),
+                   profile=data.get('profile'), output_format=data.get('format'),
+                   max_jobs=int(data.get('max_jobs', 1)), stable_s=float(data.get('stable_s', 10)),
+                   recursive=bool(data.get('recursive', True)), include=data.get('include'),
+                   exclude=data.get('exclude'))
+
+    def output_for(self, path: str) -> str:
+        rel = os.path.splitext(os.path.relpath(path, self.path))[0]
+        out = self.output_dir.replace('{rel}', rel).replace('{name}', os.path.splitext(os.path.basename(path))[0])
+        return os.path.normpath(out)
+
+    def wants(self, rel_path: str, name: str) -> bool:
+        if name.startswith('.') or not name.lower().endswith(VIDEO_EXTENSIONS):
+            return False
+        if self.include and not any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(rel_path, p) for p in self.include):
+            return False
+        return not any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(rel_path, p) for p in self.exclude)
+
+    def iter_files(self, on_dir: Optional[Callable[[str], None]] = None):
+        """`(ruta, tamaño, mtime_ns)` de los vídeos de la carpeta (os.scandir, sin recursión de Python)."""
+        stack = [self.path]
+        while stack:
+            current = stack.pop()
+            if on_dir is not None:
+                on_dir(current)
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if (self.recursive and not entry.name.startswith('.')
+                                        and os.path.normpath(entry.path) != self.output_root):
+                                    stack.append(entry.path)
+                            elif entry.is_file():
+                                rel = os.path.relpath(entry.path, self.path).replace(os.sep, '/')
+                                if self.wants(rel, entry.name):
+                                    st = entry.stat()
+                                    yield entry.path, st.st_size, st.st_mtime_ns
+                        except OSError:
+                            continue
+            except OSError:
+                logging.getLogger(__name__).debug("watch: no se pudo leer %s", current, exc_info=True)
+
+
+class _Inotify:
+    """Avisos de inotify (Linux) por ctypes: sólo sirven para despertar el bucle antes de tiempo."""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or None, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1')
+        self._watched = set()
+
+    def watch(self, path: str) -> None:
+        if path in self._watched:
+            return
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        if self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask) >= 0:
+            self._watched.add(path)
+
+    def wait(self, timeout: float) -> bool:
+        """Esperar hasta `timeout` s a algún evento; True si lo hubo (se descartan: basta con rescanear)."""
+        ready, _, _ = select.select([self.fd], [], [], max(0.0, timeout))
+        if not ready:
+            return False
+        try:
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def _default_split(folder: WatchFolder, path: str) -> List[str]:
+    import splitter
+    return splitter.split_video(path, folder.output_for(path), folder.segment_length,
+                                snap_tolerance=folder.snap_tolerance, profile=folder.profile,
+                                output_format=folder.output_format)
+
+
+class FolderWatcher:
+    """Vigila `folders` y corta cada vídeo completo una sola vez (ver el docstring del módulo).
+
+    `split_fn(carpeta, ruta) -> partes` hace el corte (por defecto `splitter.split_video`).
+    """
+
+    def __init__(self, folders: List[WatchFolder], state: Optional[StateStore] = None, max_jobs: int = 2,
+                 poll_s: float = 10.0, use_inotify: bool = True,
+                 split_fn: Optional[Callable[[WatchFolder, str], List[str]]] = None):
+        self.folders = folders
+        self.state = state or StateStore()
+        self.max_jobs = max(1, int(max_jobs))
+        self.poll_s = float(poll_s)
+        self.split_fn = split_fn or _default_split
+        self._inotify = None
+        if use_inotify and sys.platform.startswith('linux'):
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError):
+                logging.getLogger(__name__).debug("watch: inotify no disponible; se sondea", exc_info=True)
+        # ruta -> (tamaño, mtime_ns, instante en que se vio así por primera vez)
+        self._seen: Dict[str, Tuple[int, int, float]] = {}
+        self._running: Dict[str, WatchFolder] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=self.max_jobs, thread_name_prefix='watch')
+        self.processed = 0
+        self.failed = 0
+
+    def _folder_running(self, folder: WatchFolder) -> int:
+        return sum(1 for f in self._running.values() if f is folder)
+
+    def _output_in_use(self, output_dir: str) -> bool:
+        # dos cortes en la misma carpeta de salida se pisarían las partes
+        return any(f.output_for(p) == output_dir for p, f in self._running.items())
+
+    def scan(self, now: Optional[float] = None) -> int:
+        """Una pasada por todas las carpetas: lanza los cortes de lo que ya está completo.
+
+        Devuelve cuántos ficheros nuevos siguen esperando a estabilizarse o a un hueco.
+        """
+        now = time.time() if now is None else now
+        waiting = 0
+        present = set()
+        on_dir = self._inotify.watch if self._inotify is not None else None
+        for folder in self.folders:
+            for path, size, mtime_ns in folder.iter_files(on_dir):
+                present.add(path)
+                with self._lock:
+                    if path in self._running:
+                        continue
+                if self.state.is_handled(path, size, mtime_ns):
+                    continue
+                prev = self._seen.get(path)
+                if prev is None or prev[:2] != (size, mtime_ns):
+                    # nuevo o todavía creciendo: empezar a contar
+                    self._seen[path] = (size, mtime_ns, now)
+                    waiting += 1
+                    continue
+                if now - prev[2] < folder.stable_s or now - mtime_ns / 1e9 < folder.stable_s:
+                    waiting += 1
+                    continue
+                with self._lock:
+                    if (len(self._running) >= self.max_jobs or self._folder_running(folder) >= folder.max_jobs
+                            or self._output_in_use(folder.output_for(path))):
+                        waiting += 1
+                        continue
+                    self._running[path] = folder
+                self._seen.pop(path, None)
+                self.state.mark(path, size, mtime_ns, 'running')
+                self._pool.submit(self._split, folder, path, size, mtime_ns)
+        # olvidar lo que ya no está (borrado o movido antes de completarse)
+        for path in [p for p in self._seen if p not in present]:
+            del self._seen[path]
+        return waiting
+
+    def _split(self, folder: WatchFolder, path: str, size: int, mtime_ns: int) -> None:
+        logger = logging.getLogger(__name__)
+        logger.info("watch: cortando %s -> %s", path, folder.output_for(path))
+        try:
+            outputs = self.split_fn(folder, path)
+        except Exception as e:
+            self.failed += 1
+            logger.warning("watch: falló el corte de %s: %s", path, e)
+            self.state.mark(path, size, mtime_ns, 'failed', error=str(e)[-2000:])
+        else:
+            self.processed += 1
+            logger.info("watch: %s -> %d partes", path, len(outputs))
+            self.state.mark(path, size, mtime_ns, 'done', outputs=len(outputs))
+        finally:
+            with self._lock:
+                self._running.pop(path, None)
+
+    def busy(self) -> bool:
+        with self._lock:
+            return bool(self._running)
+
+    def run(self, should_stop: Optional[Callable[[], bool]] = None, once: bool = False) -> None:
+        """Bucle principal. Con `once` termina cuando no queda nada pendiente ni en marcha."""
+        try:
+            while should_stop is None or not should_stop():
+                waiting = self.scan()
+                if once and not waiting and not self.busy():
+                    break
+                # con ficheros a medio estabilizar o cortes en marcha, volver a mirar pronto
+                timeout = self.poll_s
+                if waiting or self.busy():
+                    timeout = min(timeout, max(0.5, min(f.stable_s for f in self.folders) / 2.0))
+                if self._inotify is not None:
+                    self._inotify.wait(timeout)
+                else:
+                    time.sleep(timeout)
+        finally:
+            self._pool.shutdown(wait=True)
+            if self._inotify is not None:
+                self._inotify.close()
+
+
+def load_watch_settings(settings_path: Optional[str] = None) -> Tuple[List[WatchFolder], Dict[str, Any]]:
+    """Carpetas (`watch_folders`) y opciones globales (`watch`) de `~/.pyvideoplayer.json`."""
+    settings_path = settings_path or os.path.join(os.path.expanduser('~'), '.pyvideoplayer.json')
+    try:
+        with open(settings_path, 'r', encoding='utf-8') as f:
+            s = json.load(f)
+    except (OSError, ValueError):
+        return [], {}
+    folders = []
+    for item in s.get('watch_folders') or []:
+        try:
+            folders.append(WatchFolder.from_dict(item))
+        except (KeyError, TypeError, ValueError) as e:
+            logging.getLogger(__name__).warning("watch: carpeta mal configurada %s: %s", item, e)
+    options = s.get('watch') if isinstance(s.get('watch'), dict) else {}
+    return folders, options
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='watchfolder.py', description='Corte automático de carpetas vigiladas')
+    parser.add_argument('--folder', metavar='DIR', help='vigilar sólo esta carpeta (en lugar de watch_folders)')
+    parser.add_argument('--segment-length', type=float, default=60.0, metavar='SEGUNDOS')
+    parser.add_argument('--output-dir', metavar='DIR', help='carpeta de salida (admite {name} y {rel})')
+    parser.add_argument('--stable', type=float, default=10.0, metavar='SEGUNDOS', help='tiempo sin cambios para dar un fichero por completo')
+    parser.add_argument('--max-jobs', type=int, metavar='N', help='cortes simultáneos en total')
+    parser.add_argument('--poll', type=float, metavar='SEGUNDOS', help='intervalo de sondeo')
+    parser.add_argument('--state', metavar='FICHERO', help='base de datos de estado (por defecto ~/.pyvideoplayer_watch.sqlite)')
+    parser.add_argument('--no-inotify', action='store_true', help='sondear aunque haya inotify')
+    parser.add_argument('--once', action='store_true', help='una pasada: esperar a lo pendiente y terminar')
+    parser.add_argument('--status', action='store_true', help='mostrar los ficheros tratados y salir')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_arg_parser().parse_args(argv)
+    level = logging.DEBUG if os.environ.get('PYVID_DEBUG', '').lower() in ('1', 'true', 'yes') else logging.INFO
+    logging.basicConfig(level=level, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    state = StateStore(args.state)
+    if args.status:
+        for path, status, outputs, error, updated in state.rows():
+            stamp = time.strftime('%Y-%m-%d %H:%M', time.localtime(updated))
+            print(f"{stamp}  {status:<7}  {outputs or 0:>4}  {path}" + (f"  ({error.splitlines()[0]})" if error else ''))
+        return 0
+    if args.folder:
+        folders = [WatchFolder(args.folder, segment_length=args.segment_length, output_dir=args.output_dir,
+                               stable_s=args.stable)]
+        options: Dict[str, Any] = {}
+    else:
+        folders, options = load_watch_settings()
+    if not folders:
+        print("Error: no hay carpetas que vigilar (usa --folder o watch_folders en ~/.pyvideoplayer.json).", file=sys.stderr)
+        return 2
+    watcher = FolderWatcher(folders, state=state, max_jobs=args.max_jobs or int(options.get('max_jobs', 2)),
+                            poll_s=args.poll or float(options.get('poll_s', 10)), use_inotify=not args.no_inotify)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    logging.getLogger(__name__).info("watch: vigilando %s%s", ', '.join(f.path for f in folders),
+                                     ' (inotify)' if watcher._inotify is not None else '')
+    try:
+        watcher.run(should_stop=stop.is_set, once=args.once)
+    except KeyboardInterrupt:
+        pass
+    print(f"{watcher.processed} cortados, {watcher.failed} fallidos")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,320 @@
+"""Vista general de la forma de onda del audio, para navegar grabaciones largas.
+
+El audio se decodifica una sola vez (ffmpeg -> PCM s16le mono por una tubería) y se
+reduce con NumPy a una pirámide de picos mín/máx:
+
+- nivel 0: un par (mín, máx) por cada `bin_samples` muestras (por defecto 80 muestras a
+  8 kHz, 10 ms);
+- cada nivel siguiente agrupa `factor` (4) pares del anterior, hasta que quedan pocos.
+
+La pirámide se guarda en `~/.pyvideoplayer_waveforms/` en un fichero por huella de
+contenido (ver fingerprint.py; dos copias del mismo clip comparten fichero): una
+cabecera JSON de tamaño fijo y los niveles seguidos como float16 (4 bytes por par; una
+hora de audio ocupa unos 1.9 MB). Al abrirlo se proyecta en memoria (`np.memmap`), así
+que `Waveform.peaks` lee sólo el tramo del nivel que corresponde al zoom pedido y hacer
+zoom o desplazar la vista nunca vuelve a decodificar. La carpeta se limita por tamaño
+(LRU por fecha de modificación, que se actualiza en cada uso).
+
+Los ficheros sin audio se anotan en la caché de metadatos (clave `waveform`) para no
+lanzar ffmpeg cada vez. NumPy sólo se importa al usar este módulo.
+"""
+import os
+import json
+import hashlib
+import logging
+import subprocess
+from typing import Callable, List, Optional, Tuple
+
+from governor import get_governor
+from mediainfo import MediaInfoCache, get_cache
+from fingerprint import get_fingerprint
+
+
+WAVEFORM_VERSION = 1
+MAGIC = b'PVWF1\n'
+HEADER_BYTES = 4096
+_MIN_TOP_BINS = 64
+
+
+def default_waveform_dir() -> str:
+    return os.path.join(os.path.expanduser('~'), '.pyvideoplayer_waveforms')
+
+
+def _import_numpy():
+    try:
+        import numpy as np
+        return np
+    except Exception as e:
+        raise RuntimeError("La forma de onda necesita NumPy (python -m pip install numpy).") from e
+
+
+class Waveform:
+    """Pirámide de picos mín/máx de un fichero (float16, valores en -1..1)."""
+
+    def __init__(self, data, levels: List[Tuple[int, int]], sample_rate: int, bin_samples: int,
+                 factor: int, samples: int, path: Optional[str] = None):
+        self.data = data
+        self.levels = levels
+        self.sample_rate = sample_rate
+        self.bin_samples = bin_samples
+        self.factor = factor
+        self.samples = samples
+        # `path`: fichero de la pirámide; `source`: medio del que se calculó (lo fija WaveformStore)
+        self.path = path
+        self.source: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> int:
+        return int(self.samples * 1000 // self.sample_rate)
+
+    def bin_ms(self, level: int) -> float:
+        return self.bin_samples * self.factor ** level * 1000.0 / self.sample_rate
+
+    def level_for(self, ms_per_column: float) -> int:
+        """Nivel más grueso con al menos un par por columna."""
+        level = 0
+        while level + 1 < len(self.levels) and self.bin_ms(level + 1) <= ms_per_column:
+            level += 1
+        return level
+
+    def peaks(self, start_ms: float, end_ms: float, columns: int):
+        """Arrays float32 `(mínimos, máximos)` de `columns` columnas entre `start_ms` y `end_ms`.
+
+        Las columnas fuera del audio valen 0.
+        """
+        np = _import_numpy()
+        columns = max(1, int(columns))
+        mins = np.zeros(columns, dtype=np.float32)
+        maxs = np.zeros(columns, dtype=np.float32)
+        if end_ms <= start_ms or not self.levels:
+            return mins, maxs
+        ms_per_column = (end_ms - start_ms) / columns
+        level = self.level_for(ms_per_column)
+        offset, count = self.levels[level]
+        bin_ms = self.bin_ms(level)
+        col_start = start_ms + np.arange(columns) * ms_per_column
+        valid = (col_start >= 0) & (col_start < count * bin_ms)
+        if not valid.any():
+            return mins, maxs
+        first = int(np.argmax(valid))
+        last = columns - int(np.argmax(valid[::-1]))
+        b0 = int(col_start[first] // bin_ms)
+        b1 = min(count, int(np.ceil((start_ms + last * ms_per_column) / bin_ms)))
+        b1 = max(b1, b0 + 1)
+        section = np.asarray(self.data[offset + b0:offset + b1], dtype=np.float32)
+        # una columna con varios pares los reduce; con menos de uno por columna, lo repite
+        idx = np.clip((col_start[first:last] // bin_ms).astype(np.int64) - b0, 0, len(section) - 1)
+        mins[first:last] = np.minimum.reduceat(section[:, 0], idx)
+        maxs[first:last] = np.maximum.reduceat(section[:, 1], idx)
+        return mins, maxs
+
+    def close(self) -> None:
+        # el memmap se libera al soltar la última referencia
+        self.data = None
+
+
+def _reduce_pcm(stream, bin_samples: int, should_stop: Optional[Callable[[], bool]] = None):
+    """Lee PCM s16le mono de `stream` y devuelve (pares mín/máx del nivel 0 en float16, nº de muestras)."""
+    np = _import_numpy()
+    chunk_bytes = bin_samples * 2 * 4096
+    parts = []
+    rest = b''
+    samples = 0
+    while True:
+        if should_stop is not None and should_stop():
+            return None, samples
+        data = stream.read(chunk_bytes)
+        if not data:
+            break
+        data = rest + data
+        usable = (len(data) // (bin_samples * 2)) * bin_samples * 2
+        rest = data[usable:]
+        if usable == 0:
+            continue
+        block = np.frombuffer(data[:usable], dtype='<i2').reshape(-1, bin_samples)
+        pair = np.empty((len(block), 2), dtype=np.float16)
+        pair[:, 0] = block.min(axis=1) / 32768.0
+        pair[:, 1] = block.max(axis=1) / 32768.0
+        parts.append(pair)
+        samples += usable // 2
+    if len(rest) >= 2:
+        block = np.frombuffer(rest[:len(rest) // 2 * 2], dtype='<i2')
+        parts.append(np.array([[block.min() / 32768.0, block.max() / 32768.0]], dtype=np.float16))
+        samples += len(block)
+    base = np.concatenate(parts) if parts else np.zeros((0, 2), dtype=np.float16)
+    return base, samples
+
+
+def build_pyramid(base, factor: int = 4) -> list:
+    """Niveles de la pirámide a partir del nivel 0 (array (n, 2) de mín/máx)."""
+    np = _import_numpy()
+    levels = [base]
+    current = base
+    while len(current) > _MIN_TOP_BINS:
+        n = len(current)
+        pad = (-n) % factor
+        if pad:
+            # rellenar con el último par: no cambia ni el mínimo ni el máximo del grupo
+            current = np.concatenate([current, np.repeat(current[-1:], pad, axis=0)])
+        groups = current.reshape(-1, factor, 2)
+        nxt = np.empty((len(groups), 2), dtype=np.float16)
+        nxt[:, 0] = groups[:, :, 0].min(axis=1)
+        nxt[:, 1] = groups[:, :, 1].max(axis=1)
+        levels.append(nxt)
+        current = nxt
+    return levels
+
+
+def write_waveform_file(path: str, levels: list, sample_rate: int, bin_samples: int, factor: int, samples: int) -> None:
+    """Escribir la pirámide en `path` (cabecera JSON de HEADER_BYTES bytes + niveles float16 LE)."""
+    np = _import_numpy()
+    offsets = []
+    offset = 0
+    for level in levels:
+        offsets.append([offset, len(level)])
+        offset += len(level)
+    header = json.dumps({'v': WAVEFORM_VERSION, 'sample_rate': sample_rate, 'bin_samples': bin_samples,
+                         'factor': factor, 'samples': samples, 'levels': offsets}).encode('utf-8')
+    if len(MAGIC) + len(header) + 1 > HEADER_BYTES:
+        raise ValueError('cabecera de forma de onda demasiado grande')
+    tmp = path + '.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(MAGIC + header + b'\n' + b' ' * (HEADER_BYTES - len(MAGIC) - len(header) - 1))
+            for level in levels:
+                np.ascontiguousarray(level, dtype='<f2').tofile(f)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def open_waveform_file(path: str) -> Optional[Waveform]:
+    """Proyectar en memoria un fichero de forma de onda. None si no existe o no es válido."""
+    np = _import_numpy()
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(HEADER_BYTES)
+        if not head.startswith(MAGIC):
+            return None
+        meta = json.loads(head[len(MAGIC):].split(b'\n', 1)[0].decode('utf-8'))
+        if meta.get('v') != WAVEFORM_VERSION:
+            return None
+        levels = [(int(o), int(n)) for o, n in meta['levels']]
+        total = sum(n for _, n in levels)
+        if total == 0:
+            data = np.zeros((0, 2), dtype='<f2')
+        else:
+            data = np.memmap(path, dtype='<f2', mode='r', offset=HEADER_BYTES, shape=(total, 2))
+        return Waveform(data, levels, int(meta['sample_rate']), int(meta['bin_samples']),
+                        int(meta['factor']), int(meta['samples']), path=path)
+    except (OSError, ValueError, KeyError, TypeError):
+        logging.getLogger(__name__).debug("waveform: fichero no válido %s", path, exc_info=True)
+        return None
+
+
+class WaveformStore:
+    """Pirámides en disco por huella de contenido, acotadas a `max_bytes`."""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = 256 * 1024 * 1024,
+                 sample_rate: int = 8000, bin_samples: int = 80, factor: int = 4,
+                 cache: Optional[MediaInfoCache] = None):
+        self.cache_dir = cache_dir or default_waveform_dir()
+        self.max_bytes = int(max_bytes)
+        self.sample_rate = int(sample_rate)
+        self.bin_samples = int(bin_samples)
+        self.factor = int(factor)
+        self.cache = cache
+
+    def _cache(self) -> MediaInfoCache:
+        return self.cache or get_cache()
+
+    def file_for(self, path: str) -> str:
+        fp = get_fingerprint(path, self._cache())
+        raw = repr((fp, self.sample_rate, self.bin_samples, self.factor, WAVEFORM_VERSION))
+        return os.path.join(self.cache_dir, hashlib.sha1(raw.encode('utf-8')).hexdigest() + '.pvwf')
+
+    def lookup(self, path: str) -> Optional[Waveform]:
+        """Forma de onda de `path` si ya está calculada (sin decodificar)."""
+        try:
+            target = self.file_for(path)
+        except OSError:
+            return None
+        if not os.path.exists(target):
+            return None
+        try:
+            # marcar como usada (LRU)
+            os.utime(target, None)
+        except OSError:
+            pass
+        return open_waveform_file(target)
+
+    def has_no_audio(self, path: str) -> bool:
+        info = self._cache().get(path)
+        mark = info.get('waveform') if info else None
+        return isinstance(mark, dict) and mark.get('v') == WAVEFORM_VERSION and mark.get('audio') is False
+
+    def get(self, path: str, ffmpeg_exe: str, should_stop: Optional[Callable[[], bool]] = None) -> Optional[Waveform]:
+        """Forma de onda de `path`, calculándola si hace falta. None si no tiene audio o se canceló."""
+        waveform = self.lookup(path)
+        if waveform is None and not self.has_no_audio(path):
+            waveform = self.build(path, ffmpeg_exe, should_stop=should_stop)
+        if waveform is not None:
+            waveform.source = path
+        return waveform
+
+    def build(self, path: str, ffmpeg_exe: str, should_stop: Optional[Callable[[], bool]] = None) -> Optional[Waveform]:
+        logger = logging.getLogger(__name__)
+        target = self.file_for(path)
+        cmd = [ffmpeg_exe, '-v', 'error', '-nostdin', '-i', path, '-map', '0:a:0', '-vn', '-sn', '-dn',
+               '-ac', '1', '-ar', str(self.sample_rate), '-f', 's16le', 'pipe:1']
+        proc = get_governor().popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            base, samples = _reduce_pcm(proc.stdout, self.bin_samples, should_stop)
+        finally:
+            if proc.poll() is None and (should_stop is not None and should_stop()):
+                proc.kill()
+            proc.stdout.close()
+            proc.wait()
+        if base is None:
+            return None
+        if proc.returncode != 0 or samples == 0:
+            if samples == 0:
+                # sin stream de audio (o ilegible): no volver a intentarlo hasta que cambie el fichero
+                try:
+                    self._cache().update(path, waveform={'v': WAVEFORM_VERSION, 'audio': False})
+                except OSError:
+                    pass
+            logger.debug("waveform: ffmpeg terminó con %s para %s (%d muestras)", proc.returncode, path, samples)
+            return None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        write_waveform_file(target, build_pyramid(base, self.factor), self.sample_rate, self.bin_samples,
+                            self.factor, samples)
+        self.prune(keep=target)
+        return open_waveform_file(target)
+
+    def prune(self, keep: Optional[str] = None) -> None:
+        """Borrar las formas de onda usadas hace más tiempo hasta quedar por debajo de `max_bytes`."""
+        try:
+            entries = []
+            with os.scandir(self.cache_dir) as it:
+                for e in it:
+                    if e.name.endswith('.pvwf') and e.is_file():
+                        st = e.stat()
+                        entries.append((st.st_mtime, st.st_size, e.path))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if p == keep:
+                continue
+            try:
+                os.remove(p)
+                total -= size
+            except OSError:
+                pass
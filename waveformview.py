@@ -0,0 +1,164 @@
+"""Vista de la forma de onda bajo la barra de posición (ver waveform.py).
+
+Trabaja en la línea de tiempo del fichero cargado, igual que `position_slider`: la
+forma de onda se calcula sobre el original y se estira a la duración del reproductor,
+así que con un proxy (misma duración salvo redondeos) sigue alineada.
+
+- Rueda del ratón: zoom alrededor del cursor; doble clic: vista completa.
+- Clic y arrastre: `scrub_pressed` / `scrub_moved(ms)` / `scrub_released(ms)`, que el
+  reproductor conecta a su `ScrubController` igual que el slider.
+- Con zoom, la vista salta de página cuando la posición sale de ella.
+
+Las columnas se recalculan sólo cuando cambian la vista, el tamaño o la forma de onda
+(`Waveform.peaks` lee del nivel de la pirámide adecuado, sin decodificar nada); las
+actualizaciones de posición sólo redibujan la línea de reproducción.
+"""
+from PySide6.QtCore import Qt, QLineF, Signal
+from PySide6.QtGui import QColor, QPainter, QPen
+from PySide6.QtWidgets import QSizePolicy, QWidget
+
+
+class WaveformView(QWidget):
+    scrub_pressed = Signal()
+    scrub_moved = Signal(int)
+    scrub_released = Signal(int)
+
+    MIN_SPAN_MS = 500
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.waveform = None
+        self.duration_ms = 0
+        self.position_ms = 0
+        # vista visible, en ms de la línea de tiempo del reproductor
+        self.view_start = 0.0
+        self.view_end = 0.0
+        self._lines = None
+        self._lines_key = None
+        self._dragging = False
+        self.setMinimumHeight(40)
+        self.setMaximumHeight(56)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+        self.setToolTip('Forma de onda: rueda para zoom, doble clic para verla entera, clic o arrastre para buscar')
+
+    # --- estado ---
+    def set_waveform(self, waveform) -> None:
+        self.waveform = waveform
+        self._lines = self._lines_key = None
+        self.reset_zoom()
+
+    def set_duration(self, duration_ms: int) -> None:
+        if duration_ms != self.duration_ms:
+            self.duration_ms = max(0, int(duration_ms))
+            self.reset_zoom()
+
+    def reset_zoom(self) -> None:
+        self.view_start, self.view_end = 0.0, float(self.duration_ms)
+        self.update()
+
+    def is_zoomed(self) -> bool:
+        return self.view_start > 0 or self.view_end < self.duration_ms
+
+    def set_position(self, position_ms: int) -> None:
+        old_x = self._x_for(self.position_ms)
+        self.position_ms = position_ms
+        if self.is_zoomed() and not self._dragging and not (self.view_start <= position_ms <= self.view_end):
+            # seguir la reproducción página a página
+            span = self.view_end - self.view_start
+            self.view_start = max(0.0, min(float(position_ms), self.duration_ms - span))
+            self.view_end = self.view_start + span
+            self.update()
+        elif self._x_for(position_ms) != old_x:
+            self.update()
+
+    # --- coordenadas ---
+    def _x_for(self, ms: float) -> int:
+        span = self.view_end - self.view_start
+        if span <= 0:
+            return -1
+        return int((ms - self.view_start) * self.width() / span)
+
+    def _ms_for(self, x: float) -> int:
+        span = self.view_end - self.view_start
+        ms = self.view_start + span * x / max(1, self.width())
+        return int(min(max(0.0, ms), self.duration_ms))
+
+    # --- ratón ---
+    def wheelEvent(self, event):
+        if self.duration_ms <= 0:
+            return
+        steps = event.angleDelta().y() / 120.0
+        if not steps:
+            return
+        x = event.position().x()
+        anchor = self._ms_for(x)
+        span = self.view_end - self.view_start
+        span = min(float(self.duration_ms), max(float(self.MIN_SPAN_MS), span * (0.8 ** steps)))
+        # mantener bajo el cursor el mismo instante
+        start = anchor - span * x / max(1, self.width())
+        self.view_start = max(0.0, min(start, self.duration_ms - span))
+        self.view_end = self.view_start + span
+        self.update()
+        event.accept()
+
+    def mouseDoubleClickEvent(self, event):
+        self.reset_zoom()
+
+    def mousePressEvent(self, event):
+        if event.button() != Qt.LeftButton or self.duration_ms <= 0:
+            return
+        self._dragging = True
+        self.scrub_pressed.emit()
+        self.scrub_moved.emit(self._ms_for(event.position().x()))
+
+    def mouseMoveEvent(self, event):
+        if self._dragging:
+            self.scrub_moved.emit(self._ms_for(event.position().x()))
+
+    def mouseReleaseEvent(self, event):
+        if self._dragging:
+            self._dragging = False
+            self.scrub_released.emit(self._ms_for(event.position().x()))
+
+    # --- dibujo ---
+    def _peak_lines(self):
+        width, height = self.width(), self.height()
+        key = (id(self.waveform), self.duration_ms, self.view_start, self.view_end, width, height)
+        if key == self._lines_key:
+            return self._lines
+        lines = []
+        if self.waveform is not None and self.duration_ms > 0 and width > 0:
+            # línea de tiempo del reproductor -> la de la forma de onda
+            scale = self.waveform.duration_ms / float(self.duration_ms)
+            mins, maxs = self.waveform.peaks(self.view_start * scale, self.view_end * scale, width)
+            mid = height / 2.0
+            half = mid - 1
+            tops = (mid - maxs * half).tolist()
+            bottoms = (mid - mins * half).tolist()
+            lines = [QLineF(x + 0.5, t, x + 0.5, max(b, t + 1)) for x, (t, b) in enumerate(zip(tops, bottoms))]
+        self._lines, self._lines_key = lines, key
+        return lines
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        try:
+            painter.fillRect(self.rect(), QColor(24, 24, 24))
+            mid = self.height() // 2
+            painter.setPen(QPen(QColor(60, 60, 60)))
+            painter.drawLine(0, mid, self.width(), mid)
+            lines = self._peak_lines()
+            if lines:
+                painter.setPen(QPen(QColor(90, 170, 230)))
+                painter.drawLines(lines)
+            x = self._x_for(self.position_ms)
+            if 0 <= x <= self.width():
+                painter.setPen(QPen(QColor(240, 240, 240)))
+                painter.drawLine(x, 0, x, self.height())
+            if self.is_zoomed():
+                # barra de vista: qué parte del total se está mostrando
+                total = max(1, self.duration_ms)
+                x0 = int(self.view_start * self.width() / total)
+                x1 = max(x0 + 2, int(self.view_end * self.width() / total))
+                painter.fillRect(x0, self.height() - 3, x1 - x0, 3, QColor(200, 200, 200, 140))
+        finally:
+            painter.end()